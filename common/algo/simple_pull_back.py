@@ -1,5 +1,6 @@
 """简单回调"""
 from typing import List, Optional
+import numpy as np
 from common.model.kline import KLine, stBiK, KSide
 
 
@@ -116,3 +117,68 @@ def check_simple_pullback_in_last_3_bi(bi_list: List[stBiK]) -> bool:
         return True
 
     return False
+
+
+def strong_moves(side: np.ndarray, lowest: np.ndarray, highest: np.ndarray,
+                 strong_percent_threshold: float = 0.02) -> np.ndarray:
+    """
+    每一笔是否为强势运动, 与 detect_strong_move_in_last_3 中的幅度定义一致:
+      - UP笔: (highest - lowest) / lowest >= strong_percent_threshold
+      - DOWN笔: (highest - lowest) / highest >= strong_percent_threshold
+    side 为 KSide 的值(1 向上, -1 向下, 0 不确定), 如 BiColumns.side
+    """
+    up, down = side == KSide.UP.value, side == KSide.DOWN.value
+    base = np.where(up, lowest, highest)
+    base = np.where(base != 0, base, 1)
+    return (up | down) & ((highest - lowest) / base >= strong_percent_threshold)
+
+
+def simple_pullback_signals(
+        side: np.ndarray,
+        lowest: np.ndarray,
+        highest: np.ndarray,
+        strong_percent_threshold: float = 0.02,
+        max_pullback_bi_count: int = 2,
+        max_pullback_percent: float = 0.01,
+        lookback: int = 3
+) -> np.ndarray:
+    """
+    check_simple_pullback_in_last_3_bi 的向量化版本, 一次计算每一笔位置上的结果:
+    第 e 个元素等于 check_simple_pullback_in_last_3_bi(bi_list[:e + 1]), 可用于回测和画信号.
+    返回 int8 数组: 满足时为强势笔的方向(1 向上强势后的回调, -1 向下强势后的反弹), 否则为0.
+    最近 lookback 笔中只看最后一笔强势笔(与 detect_strong_move_in_last_3 从后往前找一致),
+    强势笔为 e-d 时, 其后的回调笔为 e-d+1 .. min(e-d+max_pullback_bi_count, e), 对每个 d 整列计算.
+    """
+    side = np.asarray(side)
+    lowest = np.asarray(lowest, dtype=np.float64)
+    highest = np.asarray(highest, dtype=np.float64)
+    n = len(side)
+    signals = np.zeros(n, dtype=np.int8)
+    if n < 3:
+        return signals
+    strong = strong_moves(side, lowest, highest, strong_percent_threshold)
+    later_strong = np.zeros(n, dtype=bool)  # e-d+1 .. e 中是否已有强势笔(有则轮不到 e-d)
+    for d in range(lookback):
+        e = np.arange(d, n)     # 笔的位置 e, 强势笔 s = e - d
+        s = e - d
+        candidate = strong[s] & ~later_strong[e]
+        later_strong[e] |= strong[s]
+        count = min(max_pullback_bi_count, d)
+        if count == 0:          # 强势笔就是最后一笔, 后面没有回调
+            continue
+        up = side[s] == KSide.UP.value
+        pull_side = np.where(up, KSide.DOWN.value, KSide.UP.value)
+        ok = candidate.copy()
+        pull_low, pull_high = lowest[s + 1], highest[s + 1]
+        for j in range(1, count + 1):
+            ok &= side[s + j] == pull_side
+            pull_low = np.minimum(pull_low, lowest[s + j])
+            pull_high = np.maximum(pull_high, highest[s + j])
+        move = highest[s] - lowest[s]
+        pull = np.where(up, highest[s] - pull_low, pull_high - lowest[s])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ok &= ~(pull / move > max_pullback_percent)
+        hit = e[ok]
+        signals[hit] = np.where(up[ok], 1, -1)
+    signals[:2] = 0     # 少于3笔时为 False
+    return signals
@@ -13,9 +13,11 @@ from common.algo.weibi import get_weibi_list
 from typing import List, Any
 from common.util import convert_kline_to_dataframe
 from common.model.obj import Direction
-from common.chanlun.c_bi import Cal_LOWER
-from common.chanlun.c_bi import (Cal_UPPER, cal_independent_klines, calculate_bi, _NCHDUAN, compute_bi_pivots,
-                                 compute_duan_pivots)
+from common.chanlun.c_bi import get_independents
+from common.chanlun.c_pipeline import get_pipeline
+from common.chanlun.float_compare import EPSINON
+from common.model.kline_columns import MergedBars, MergedPrice, BiColumns
+from common.algo.simple_pull_back import simple_pullback_signals
 from typing import Dict
 import logging
 import json
@@ -80,45 +82,28 @@ def write_extremes_to_file(fx_list, filename):
         json.dump(data_to_write, f, indent=4)
 
 
-def fn_calc_up_lower_upper(klines: List[KLine]):
-    lower: List[stFxK] = Cal_LOWER(klines)
-    upper: List[stFxK] = Cal_UPPER(klines)
+def fn_calc_up_lower_upper(klines: List[KLine], eps: float = EPSINON):
+    fractals = get_pipeline(klines, eps).fractals
     fenxin = {}
     logging.info(f"fn_calc_up_lower_upper begin.")
-    for i in range(len(lower)):
-        dt = datetime.fromtimestamp(klines[i].time)
-        if lower[i].side == KExtreme.BOTTOM:
-            fenxin[dt] = [dt, -1]
-            # logging.info(f"底的时间：[{dt.strftime('%Y-%m-%d %H:%M:%S')}]")
-    for i in range(len(upper)):
-        dt = datetime.fromtimestamp(klines[i].time)
-        if upper[i].side == KExtreme.TOP:
-            fenxin[dt] = [dt, 1]
-            # logging.info(f"顶的时间：[{dt.strftime('%Y-%m-%d %H:%M:%S')}]")
+    for side, value in ((KExtreme.BOTTOM, -1), (KExtreme.TOP, 1)):   # 先底后顶, 与原来的顺序一致
+        for i in fractals.index[fractals.side == side.value].tolist():
+            dt = datetime.fromtimestamp(klines[i].time)
+            fenxin[dt] = [dt, value]
     lower_count = sum(1 for value in fenxin.values() if value[-1] == 1)
     upper_count = sum(1 for value in fenxin.values() if value[-1] == -1)
-    logging.info(f"fn_calc_up_lower_upper end.K线数量：{len(lower)}, 顶: {lower_count}, 底: {upper_count}")
+    logging.info(f"fn_calc_up_lower_upper end.K线数量：{len(klines)}, 顶: {lower_count}, 底: {upper_count}")
     return fenxin
 
 
 def init_independents(combs: List[stCombineK]):
-    """初始化K线索引和独立K线索引的映射关系"""
-    independents: Dict[int, int] = {}
-    for i in range(len(combs)):
-        for j in range(combs[i].pos_begin, combs[i].pos_end+1):
-            independents[j] = i  # 表达出索引pos_begin至pos_end实际上是第i根独立K线
-    return independents
+    """初始化K线索引和独立K线索引的映射关系(int32 数组, 见 get_independents)"""
+    return get_independents(combs)
 
 
-def fn_calc_bi(klines: list[KLine]) -> List[Any]:
+def fn_calc_bi(klines: list[KLine], eps: float = EPSINON) -> List[Any]:
     """回调计算过程笔"""
-    lower: List[stFxK] = Cal_LOWER(klines)
-    upper: List[stFxK] = Cal_UPPER(klines)
-    combs = cal_independent_klines(klines)
-    merges = init_merges(combs, klines)
-    independents = init_independents(combs)
-
-    bi_list = calculate_bi(lower, upper, merges, independents)
+    bi_list = get_pipeline(klines, eps).bi_list
 
     items = []
     for w in bi_list:
@@ -131,16 +116,9 @@ def fn_calc_bi(klines: list[KLine]) -> List[Any]:
     return items
 
 
-def fn_calc_seg(klines: list[KLine]) -> List[Segment]:
+def fn_calc_seg(klines: list[KLine], eps: float = EPSINON) -> List[Segment]:
     """回调计算段"""
-    lower: List[stFxK] = Cal_LOWER(klines)
-    upper: List[stFxK] = Cal_UPPER(klines)
-    combs = cal_independent_klines(klines)
-    merges = init_merges(combs, klines)
-    independents = init_independents(combs)
-
-    bi_list = calculate_bi(lower, upper, merges, independents)
-    seg_list: List[Segment] = _NCHDUAN(bi_list, klines)
+    seg_list: List[Segment] = get_pipeline(klines, eps).seg_list
     items = []
     for w in seg_list:
         s_dt = datetime.fromtimestamp(klines[w.pos_begin].time)
@@ -152,16 +130,9 @@ def fn_calc_seg(klines: list[KLine]) -> List[Segment]:
     return items
 
 
-def fn_calc_bi_pivot(klines: list[KLine]) -> List[Pivot]:
+def fn_calc_bi_pivot(klines: list[KLine], eps: float = EPSINON) -> List[Pivot]:
     """回调计算笔中枢"""
-    lower: List[stFxK] = Cal_LOWER(klines)
-    upper: List[stFxK] = Cal_UPPER(klines)
-    combs = cal_independent_klines(klines)
-    merges = init_merges(combs, klines)
-    independents = init_independents(combs)
-
-    bi_list = calculate_bi(lower, upper, merges, independents)
-    pivots: List[Pivot] = compute_bi_pivots(bi_list)
+    pivots: List[Pivot] = get_pipeline(klines, eps).bi_pivots
     items = []
     for w in pivots:
         s_dt = datetime.fromtimestamp(klines[w.bg_pos_index].time)
@@ -177,17 +148,9 @@ def fn_calc_bi_pivot(klines: list[KLine]) -> List[Pivot]:
     return items
 
 
-def fn_calc_duan_pivot(klines: list[KLine]) -> List[Pivot]:
+def fn_calc_duan_pivot(klines: list[KLine], eps: float = EPSINON) -> List[Pivot]:
     """回调计算中枢"""
-    lower: List[stFxK] = Cal_LOWER(klines)
-    upper: List[stFxK] = Cal_UPPER(klines)
-    combs = cal_independent_klines(klines)
-    merges = init_merges(combs, klines)
-    independents = init_independents(combs)
-
-    bi_list = calculate_bi(lower, upper, merges, independents)
-    seg_list = _NCHDUAN(bi_list, klines)
-    pivots: List[Pivot] = compute_duan_pivots(seg_list)
+    pivots: List[Pivot] = get_pipeline(klines, eps).duan_pivots
     items = []
     for w in pivots:
         s_dt = datetime.fromtimestamp(klines[w.bg_pos_index].time)
@@ -204,17 +167,26 @@ def fn_calc_duan_pivot(klines: list[KLine]) -> List[Pivot]:
     return items
 
 
-def init_merges(combs, klines) -> List[KLine]:
-    merges = [k for k in klines]
-    for item in combs:
-        for i in range(item.pos_begin, item.pos_end + 1):
-            merges[i].low, merges[i].high = item.range_low, item.range_high
-    return merges
+def fn_calc_simple_pullback(klines: list[KLine], eps: float = EPSINON):
+    """回调计算简单回调信号: 每一笔的结束K线上为以这一笔结尾时 check_simple_pullback_in_last_3_bi 的结果,
+    1 为向上强势后的回调, -1 为向下强势后的反弹, 0 为没有"""
+    bis = BiColumns.from_objects(get_pipeline(klines, eps).bi_list)
+    signals = simple_pullback_signals(bis.side, bis.lowest, bis.highest)
+    bars = {}
+    for pos_end, value in zip(bis.pos_end.tolist(), signals.tolist()):
+        dt = datetime.fromtimestamp(klines[pos_end].time)
+        bars[dt] = [dt, value]
+    return bars
+
+
+def init_merges(combs, klines) -> List[MergedPrice]:
+    """按K线索引的合并后高低点, 不修改 klines(同一份K线由多个回调共用)"""
+    return MergedBars.from_objects(combs).merged_prices()
 
 
-def fn_calc_independent_klines(klines: list[KLine]):
+def fn_calc_independent_klines(klines: list[KLine], eps: float = EPSINON):
     """计算独立K线数量"""
-    combs = cal_independent_klines(klines)
+    combs = get_pipeline(klines, eps).combs
     independents = {}
     p = klines
     for i in range(len(combs)):
@@ -272,9 +244,10 @@ def fn_calc_atr(klines: list[KLine]):
     return bars
 
 
-def fn_calc_feek(klines: List[KLine]):
-    lower: List[stFxK] = Cal_LOWER(klines)
-    upper: List[stFxK] = Cal_UPPER(klines)
+def fn_calc_feek(klines: List[KLine], eps: float = EPSINON):
+    chan = get_pipeline(klines, eps)
+    lower: List[stFxK] = chan.lower
+    upper: List[stFxK] = chan.upper
     datas = convert_kline_to_dataframe(klines)
     fenxin = {}
     # logging.info(f"fn_calc_up_lower_upper begin.")
@@ -8,12 +8,15 @@
 如果方向向上，则取其中高点中的高点作为新K线高点，取其中低点中的高点作为新K线低点，由此合并出一根新K线。
 """
 from common.model.kline import KLine, stCombineK, KSide, stFxK, stBiK, KExtreme, Segment, Pivot
-from typing import List, Optional, Union
+from typing import List, Optional, Sequence, Union
 from common.chanlun.float_compare import *
+from common.chanlun.c_merge import merge_klines
+from common.chanlun.c_fractal import fractal_sides
+import numpy as np
 import copy
 import logging
 from datetime import datetime
-from typing import Tuple, Dict
+from typing import Tuple
 
 
 def _Cal_MERGE(pData: List[KLine]) -> int:
@@ -105,68 +108,48 @@ def _Cal_MERGE(pData: List[KLine]) -> int:
     return combs[:pLast - pBegin + 1]
 
 
-def Cal_LOWER(pData: List[KLine]) -> List[stFxK]:
+def _cal_fx_list(size: int, combs: List[stCombineK], sides, side: KExtreme) -> List[stFxK]:
+    """按K线索引的分型列表, 只填 side 一种分型"""
+    ret = [stFxK(index=i, side=KExtreme.NORMAL, low=0.0, high=0.0) for i in range(size)]
+    for pCur in np.flatnonzero(sides == side.value).tolist():
+        comb = combs[pCur]
+        fx = stFxK(index=comb.pos_extreme, side=side, low=comb.range_low, high=comb.range_high)
+        fx.left = combs[pCur - 1]
+        fx.right = combs[pCur + 1]
+        fx.extremal = comb
+        ret[comb.pos_extreme] = fx
+    return ret
+
+
+def _comb_sides(combs: List[stCombineK], eps: float = EPSINON):
+    return fractal_sides([c.range_low for c in combs], [c.range_high for c in combs], eps)
+
+
+def Cal_LOWER(pData: List[KLine], combs: Optional[List[stCombineK]] = None) -> List[stFxK]:
     """
     计算底分型
+    combs: 已经算好的独立K线, 为空时由 pData 计算
     """
-    combs = cal_independent_klines(pData)
-    ret = [stFxK(index=i, side=KExtreme.NORMAL, low=0.0, high=0.0) for i in range(len(pData))]
-
-    nCount = len(combs)
-    if nCount <= 2:  # 小于等于2的，直接退出
-        return ret
-    pPrev = 0
-    pCur = pPrev + 1
-    pNext = pCur + 1
-    pEnd = pPrev + nCount - 1
-
-    while pNext <= pEnd:
-        if (less_than_0(combs[pCur].range_high - combs[pPrev].range_high) and
-                less_than_0(combs[pCur].range_high - combs[pNext].range_high) and
-                less_than_0(combs[pCur].range_low - combs[pPrev].range_low) and
-                less_than_0(combs[pCur].range_low - combs[pNext].range_low)):
-            # ret[combs[pCur].pos_extreme] = [True, combs[pCur].data.low, combs[pCur].data.high]
-            ret[combs[pCur].pos_extreme] = stFxK(index=combs[pCur].pos_extreme, side=KExtreme.BOTTOM,
-                                                 low=combs[pCur].range_low, high=combs[pCur].range_high)
-            ret[combs[pCur].pos_extreme].left = combs[pPrev]
-            ret[combs[pCur].pos_extreme].right = combs[pNext]
-            ret[combs[pCur].pos_extreme].extremal = combs[pCur]
-            # ret[combs[pCur].pos_extreme].highest = max(combs[pPrev].range_high, combs[pNext].range_high)
-        pPrev += 1
-        pCur += 1
-        pNext += 1
-    return ret
+    if combs is None:
+        combs = cal_independent_klines(pData)
+    return _cal_fx_list(len(pData), combs, _comb_sides(combs), KExtreme.BOTTOM)
 
 
-def Cal_UPPER(pData: List[KLine]) -> List[stFxK]:
-    """计算顶分型"""
-    combs = cal_independent_klines(pData)   # combs是实际的独立K线的集合
-    ret = [stFxK(index=i, side=KExtreme.NORMAL, low=0.0, high=0.0) for i in range(len(pData))]
-    nCount = len(combs)
-
-    if nCount <= 2:
-        return ret
-
-    pPrev = 0
-    pCur = pPrev + 1
-    pNext = pCur + 1
-    pEnd = pPrev + nCount - 1
-    while pNext <= pEnd:
-        if (greater_than_0(combs[pCur].range_high - combs[pPrev].range_high) and
-                greater_than_0(combs[pCur].range_high - combs[pNext].range_high) and
-                greater_than_0(combs[pCur].range_low - combs[pPrev].range_low) and
-                greater_than_0(combs[pCur].range_low - combs[pNext].range_low)):
-            ret[combs[pCur].pos_extreme] = stFxK(index=combs[pCur].pos_extreme, side=KExtreme.TOP,
-                                                 low=combs[pCur].range_low, high=combs[pCur].range_high)
-            ret[combs[pCur].pos_extreme].left = combs[pPrev]
-            ret[combs[pCur].pos_extreme].right = combs[pNext]
-            ret[combs[pCur].pos_extreme].extremal = combs[pCur]
-            # ret[combs[pCur].pos_extreme].lowest = min(combs[pPrev].range_low, combs[pNext].range_low)
-
-        pPrev += 1
-        pCur += 1
-        pNext += 1
-    return ret
+def Cal_UPPER(pData: List[KLine], combs: Optional[List[stCombineK]] = None) -> List[stFxK]:
+    """计算顶分型, combs: 已经算好的独立K线, 为空时由 pData 计算"""
+    if combs is None:
+        combs = cal_independent_klines(pData)   # combs是实际的独立K线的集合
+    return _cal_fx_list(len(pData), combs, _comb_sides(combs), KExtreme.TOP)
+
+
+def Cal_LOWER_UPPER(pData: List[KLine], combs: Optional[List[stCombineK]] = None,
+                    eps: float = EPSINON) -> Tuple[List[stFxK], List[stFxK]]:
+    """同时计算底分型和顶分型(只合并一次K线, 只判断一次), 返回 (Cal_LOWER, Cal_UPPER) 的结果; combs 应由相同的 eps 合并"""
+    if combs is None:
+        combs = merge_klines(pData, eps).to_combs()
+    sides = _comb_sides(combs, eps)
+    return (_cal_fx_list(len(pData), combs, sides, KExtreme.BOTTOM),
+            _cal_fx_list(len(pData), combs, sides, KExtreme.TOP))
 
 
 def Cal_Fx(lower: List[stFxK], upper: List[stFxK]):
@@ -178,21 +161,23 @@ def Cal_Fx(lower: List[stFxK], upper: List[stFxK]):
     return temp
 
 
-def count_independent_kline(independents: Dict[int, int], b: int, e: int) -> int:
-    """计算独立K线数"""
+def count_independent_kline(independents: Sequence[int], b: int, e: int) -> int:
+    """计算独立K线数, independents 为 get_independents 的结果(K线索引 -> 独立K线索引)"""
     return independents[e] - independents[b] + 1
 
 
-def is_valid_fx(independents: Dict[int, int], b: int, e: int):
+def is_valid_fx(independents: Sequence[int], b: int, e: int):
     bmgt = count_independent_kline(independents, b, e)
     return bmgt >= 5
 
 
-def get_independents(combs: List[stCombineK]):
-    independents: Dict[int, int] = {}
-    for i in range(len(combs)):
-        for j in range(combs[i].pos_begin, combs[i].pos_end+1):
-            independents[j] = i  # 表达出索引pos_begin至pos_end实际上是第i根独立K线
+def get_independents(combs: List[stCombineK]) -> np.ndarray:
+    """
+    K线索引 -> 独立K线索引的 int32 数组(索引pos_begin至pos_end实际上是第i根独立K线).
+    已有 MergedBars 时用 MergedBars.independent_index, 结果相同.
+    在 Python 循环中逐个读取时, 先 tolist() 更快.
+    """
+    return np.repeat(np.arange(len(combs), dtype=np.int32), [c.pos_end - c.pos_begin + 1 for c in combs])
 
 
 def generate_bi(fractals: List[stFxK]) -> List[stBiK]:
@@ -229,7 +214,9 @@ def deal_same_top_bottom(next: int, temp: List[stFxK], base: int, up: bool, merg
     return next, c1
 
 
-def deal_not_last(next: int, c1: int, base: int, ind: Dict[int, int]) -> (int, int):
+def deal_not_last(next: int, c1: int, base: int, ind: Sequence[int]) -> (int, int):
+    if next < 0:    # 已经找到末尾, 没有分型可以比较(原来会以 -1 为K线索引查独立K线而出错)
+        return next
     if next > 0 and c1 > 0:
         if is_valid_fx(ind, next, base) and not is_valid_fx(ind, c1, base):
             pass
@@ -238,7 +225,7 @@ def deal_not_last(next: int, c1: int, base: int, ind: Dict[int, int]) -> (int, i
     return next
 
 
-def satisfy_the_number(next: int, temp: List[stFxK], up: bool, merge: List[KLine], ind: Dict[int, int]) -> (int, int):
+def satisfy_the_number(next: int, temp: List[stFxK], up: bool, merge: List[KLine], ind: Sequence[int]) -> (int, int):
     bs = next
     bs_next = next
     while True:
@@ -272,7 +259,7 @@ def satisfy_the_number(next: int, temp: List[stFxK], up: bool, merge: List[KLine
     return 0, next
 
 
-def get_node(base: int, temp: List[stFxK], merge: List[KLine], ind: Dict[int, int]):
+def get_node(base: int, temp: List[stFxK], merge: List[KLine], ind: Sequence[int]):
     norm = 5
     up = temp[base].side == KExtreme.TOP
     next = go_util_difference_fx(base, temp)
@@ -313,8 +300,11 @@ def next_(base: int, temp: List[stFxK]):
     return -1
 
 
-def calculate_bi(lower: List[stFxK], upper: List[stFxK], merge: List[KLine], ind: Dict[int, int]) -> List[stBiK]:
-    """计算笔"""
+def calculate_bi(lower: List[stFxK], upper: List[stFxK], merge: List[KLine], ind: Sequence[int]) -> List[stBiK]:
+    """
+    计算笔
+    merge: 按K线索引的合并后高低点, 只读取 low/high(例如 MergedBars.merged_prices 的结果)
+    """
     temp = Cal_Fx(lower, upper)
     old_: List[stFxK] = []
     i = 0
@@ -339,29 +329,30 @@ def calculate_bi(lower: List[stFxK], upper: List[stFxK], merge: List[KLine], ind
 def cal_independent_klines(pData: List[KLine]) -> List[stCombineK]:
     """
     计算出独立K线,返回独立K线对象列表
+    由数组实现的 merge_klines 计算, 结果与 _Cal_MERGE 一致(_Cal_MERGE 保留作为对照)
     """
-    combs = _Cal_MERGE(pData)
-    return combs
+    return merge_klines(pData).to_combs()
 
 
 def find_first_segment(cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine],
-                       max_pos: int, min_pos: int, seg: Segment) -> bool:
+                       max_pos: int, min_pos: int, seg: Segment, eps: float = EPSINON) -> bool:
     """
     线段一定被后一线段破坏、 且破坏前一线段
     由于第一根线段没有可破坏的线段，所以第一根线段 实际上是 从 第二根线段开始算
+    eps: 价格比较的容差(见 float_compare.tick_epsilon), 段的各函数相同
     """
     idx = vtDisivion[cur_pos].pos_begin
     if vtDisivion[cur_pos].side == KSide.UP:   # 向上
         max_idx = vtDisivion[max_pos].pos_begin
-        if greater_than_0(pData[idx].high - pData[max_idx].high):
+        if pData[idx].high - pData[max_idx].high > eps:
             max_pos = cur_pos
         if cur_pos - min_pos < 3:
             return False
         pre_idx = vtDisivion[cur_pos-2].pos_begin
-        if greater_than_0(pData[idx].high - pData[pre_idx].high):
+        if pData[idx].high - pData[pre_idx].high > eps:
             idx = vtDisivion[cur_pos-1].pos_begin
             pre_idx = vtDisivion[cur_pos-3].pos_begin
-            if greater_than_0(pData[idx].high - pData[pre_idx].high):
+            if pData[idx].high - pData[pre_idx].high > eps:
                 # 暂时成段
                 seg.start_index = min_pos
                 seg.end_index = cur_pos
@@ -370,15 +361,15 @@ def find_first_segment(cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine]
     else:
         # 第一段找最低的点作为向上段的起始点
         min_idx = vtDisivion[min_pos].pos_begin
-        if less_than_0(pData[idx].low - pData[min_idx].low):
+        if pData[idx].low - pData[min_idx].low < -eps:
             min_pos = cur_pos
         if cur_pos - max_pos < 3:
             return False
         pre_idx = vtDisivion[cur_pos-2].pos_begin
-        if less_than_0(pData[idx].low - pData[pre_idx].low):
+        if pData[idx].low - pData[pre_idx].low < -eps:
             idx = vtDisivion[cur_pos-1].pos_begin
             pre_idx = vtDisivion[cur_pos-3].pos_begin
-            if less_than_0(pData[idx].high - pData[pre_idx].high):
+            if pData[idx].high - pData[pre_idx].high < -eps:
                 seg.start_index = max_pos
                 seg.end_index = cur_pos
                 seg.up = False
@@ -387,29 +378,30 @@ def find_first_segment(cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine]
     return False
 
 
-def is_overlap(cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine]) -> bool:
+def is_overlap(cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine], eps: float = EPSINON) -> bool:
     if cur_pos < 3:
         return False
     # 判断连续三笔是否重叠
     idx = vtDisivion[cur_pos].pos_begin
     pre_idx = vtDisivion[cur_pos-3].pos_begin
     if vtDisivion[cur_pos].side == KSide.UP:    # 向下笔
-        if less_than_0(pData[idx].high - pData[pre_idx].low):
+        if pData[idx].high - pData[pre_idx].low < -eps:
             return False
     else:                                       # 向上笔
-        if greater_than_0(pData[idx].low - pData[pre_idx].high):
+        if pData[idx].low - pData[pre_idx].high > eps:
             return False
     return True
 
 
-def make_sure_low_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine]) -> int:
+def make_sure_low_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine],
+                          eps: float = EPSINON) -> int:
     status = -1
     while True:
         cur_idx = vtDisivion[cur_pos].pos_begin
         low_idx = vtDisivion[segment.end_index].pos_begin
         if vtDisivion[cur_pos].side == KSide.DOWN:
             # 更低
-            if less_than_0(pData[cur_idx].low - pData[low_idx].low):
+            if pData[cur_idx].low - pData[low_idx].low < -eps:
                 segment.end_index = cur_pos
             break
         if cur_pos - segment.end_index < 3:
@@ -417,22 +409,22 @@ def make_sure_low_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK
         i = segment.end_index + 3
         end_pos = segment.end_index + 1
         for i in range(segment.end_index + 3, cur_pos + 1, 2):
-            if not greater_than_0(pData[vtDisivion[i].pos_begin].high - pData[vtDisivion[end_pos].pos_begin].high):
+            if pData[vtDisivion[i].pos_begin].high - pData[vtDisivion[end_pos].pos_begin].high <= eps:
                 end_pos = i
                 continue
             # 判断是否需要合并K线
             fMaxPrice = pData[vtDisivion[segment.start_index + 2].pos_begin].high
             fMinPrice = pData[vtDisivion[segment.start_index + 1].pos_begin].low
             for k in range(segment.start_index + 3, segment.end_index, 2):
-                if less_than_0(fMinPrice - pData[vtDisivion[k].pos_begin].low):
-                    if less_than_0(fMaxPrice - pData[vtDisivion[k+1].pos_begin].high):
+                if fMinPrice - pData[vtDisivion[k].pos_begin].low < -eps:
+                    if fMaxPrice - pData[vtDisivion[k+1].pos_begin].high < -eps:
                         fMinPrice = pData[vtDisivion[k].pos_begin].low
                     fMaxPrice = pData[vtDisivion[k+1].pos_begin].high
                 else:
                     fMinPrice = pData[vtDisivion[k].pos_begin].low
                     fMaxPrice = pData[vtDisivion[k+1].pos_begin].high
 
-            if less_than_0(pData[vtDisivion[end_pos].pos_begin].high - fMinPrice):
+            if pData[vtDisivion[end_pos].pos_begin].high - fMinPrice < -eps:
                 # 存在缺口
                 status = 1
             else:
@@ -442,13 +434,14 @@ def make_sure_low_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK
     return status
 
 
-def make_sure_up_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine]) -> int:
+def make_sure_up_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine],
+                         eps: float = EPSINON) -> int:
     status = -1
     while True:
         cur_idx = vtDisivion[cur_pos].pos_begin
         end_idx = vtDisivion[segment.end_index].pos_begin
         if vtDisivion[cur_pos].side == KSide.UP:
-            if greater_than_0(pData[cur_idx].high - pData[end_idx].high):
+            if pData[cur_idx].high - pData[end_idx].high > eps:
                 segment.end_index = cur_pos
             break
 
@@ -457,21 +450,21 @@ def make_sure_up_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK]
 
         end_pos = segment.end_index + 1
         for i in range(segment.end_index + 3, cur_pos + 1, 2):
-            if not less_than_0(pData[vtDisivion[i].pos_begin].low - pData[vtDisivion[end_pos].pos_begin].low):
+            if pData[vtDisivion[i].pos_begin].low - pData[vtDisivion[end_pos].pos_begin].low >= -eps:
                 end_pos = i
                 continue
             fMaxPrice = pData[vtDisivion[segment.start_index + 1].pos_begin].high
             fMinPrice = pData[vtDisivion[segment.start_index + 2].pos_begin].low
             for k in range(segment.start_index+3, segment.end_index, 2):
-                if greater_than_0(fMaxPrice - pData[vtDisivion[k].pos_begin].high):
-                    if greater_than_0(fMinPrice - pData[vtDisivion[k+1].pos_begin].low):
+                if fMaxPrice - pData[vtDisivion[k].pos_begin].high > eps:
+                    if fMinPrice - pData[vtDisivion[k+1].pos_begin].low > eps:
                         fMaxPrice = pData[vtDisivion[k].pos_begin].high
                     fMinPrice = pData[vtDisivion[k+1].pos_begin].low
                 else:
                     fMaxPrice = pData[vtDisivion[k].pos_begin].high
                     fMinPrice = pData[vtDisivion[k+1].pos_begin].low
 
-            if greater_than_0(pData[vtDisivion[end_pos].pos_begin].low - fMaxPrice):
+            if pData[vtDisivion[end_pos].pos_begin].low - fMaxPrice > eps:
                 status = 1
             else:
                 status = 0
@@ -480,15 +473,17 @@ def make_sure_up_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK]
     return status
 
 
-def make_sure_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine]):
+def make_sure_segment(segment: Segment, cur_pos: int, vtDisivion: List[stBiK], pData: List[KLine],
+                      eps: float = EPSINON):
     if segment.up:
-        return make_sure_up_segment(segment, cur_pos, vtDisivion, pData)
-    return make_sure_low_segment(segment, cur_pos, vtDisivion, pData)
+        return make_sure_up_segment(segment, cur_pos, vtDisivion, pData, eps)
+    return make_sure_low_segment(segment, cur_pos, vtDisivion, pData, eps)
 
 
-def update_segment(cur_pos: int, seg: Segment, tmp_seg: Segment, vtDisivion: List[stBiK], ret: List[Segment], pData: List[KLine]):
+def update_segment(cur_pos: int, seg: Segment, tmp_seg: Segment, vtDisivion: List[stBiK], ret: List[Segment], pData: List[KLine],
+                   eps: float = EPSINON):
     if tmp_seg.start_index == tmp_seg.end_index:
-        status = make_sure_segment(seg, cur_pos, vtDisivion, pData)
+        status = make_sure_segment(seg, cur_pos, vtDisivion, pData, eps)
         if status == -1:
             return
         if status == 0:
@@ -507,18 +502,18 @@ def update_segment(cur_pos: int, seg: Segment, tmp_seg: Segment, vtDisivion: Lis
             tmp_seg.is_sure = False
             tmp_seg.up = not seg.up
     else:
-        status = make_sure_segment(tmp_seg, cur_pos, vtDisivion, pData)
+        status = make_sure_segment(tmp_seg, cur_pos, vtDisivion, pData, eps)
         if status == -1:
             if vtDisivion[cur_pos].side == KSide.UP and not tmp_seg.up:
                 if not tmp_seg.up:  # 这儿是否有逻辑漏洞？？？
-                    if greater_than_0(pData[vtDisivion[cur_pos].pos_begin].high -
-                                      pData[vtDisivion[tmp_seg.start_index].pos_begin].high):
+                    if (pData[vtDisivion[cur_pos].pos_begin].high -
+                            pData[vtDisivion[tmp_seg.start_index].pos_begin].high > eps):
                         seg.end_index = cur_pos
                         tmp_seg.start_index = tmp_seg.end_index = 0
             else:
                 if tmp_seg.up:
-                    if less_than_0(pData[vtDisivion[cur_pos].pos_begin].low -
-                                   pData[vtDisivion[tmp_seg.start_index].pos_begin].low):
+                    if (pData[vtDisivion[cur_pos].pos_begin].low -
+                            pData[vtDisivion[tmp_seg.start_index].pos_begin].low < -eps):
                         seg.end_index = cur_pos
                         tmp_seg.start_index = tmp_seg.end_index = 0
             return
@@ -549,9 +544,9 @@ def update_segment(cur_pos: int, seg: Segment, tmp_seg: Segment, vtDisivion: Lis
             tmp_seg.up = not seg.up
 
 
-def _NCHDUAN(vtDisivion: List[stBiK], pData: List[KLine]) -> List[Segment]:
+def _NCHDUAN(vtDisivion: List[stBiK], pData: List[KLine], eps: float = EPSINON) -> List[Segment]:
     # vtDisivion = copy.deepcopy(tDisivion)
-    """计算线段"""
+    """计算线段, eps 为价格比较的容差; 会翻转输入笔的方向, 不修改输入的线性实现见 c_segment.SegmentEngine"""
     for item in vtDisivion:
         item.side = KSide.UP if item.side == KSide.DOWN else KSide.DOWN
     ret: List[Segment] = []
@@ -562,23 +557,23 @@ def _NCHDUAN(vtDisivion: List[stBiK], pData: List[KLine]) -> List[Segment]:
     nSize = len(vtDisivion)
     for i in range(3, nSize):
         if status == 0:
-            if not is_overlap(i, vtDisivion, pData):
+            if not is_overlap(i, vtDisivion, pData, eps):
                 min_pos = max_pos = -1
                 continue
             if min_pos == -1:
                 min_pos = max_pos = i - 3
                 for k in range(i-2, i):
-                    if greater_than_0(pData[vtDisivion[k].pos_begin].high - pData[vtDisivion[max_pos].pos_begin].high):
+                    if pData[vtDisivion[k].pos_begin].high - pData[vtDisivion[max_pos].pos_begin].high > eps:
                         max_pos = k
-                    if less_than_0(pData[vtDisivion[k].pos_begin].low - pData[vtDisivion[min_pos].pos_begin].low):
+                    if pData[vtDisivion[k].pos_begin].low - pData[vtDisivion[min_pos].pos_begin].low < -eps:
                         min_pos = k
-            if not find_first_segment(i, vtDisivion, pData, max_pos, min_pos, seg):
+            if not find_first_segment(i, vtDisivion, pData, max_pos, min_pos, seg, eps):
                 continue
 
             status = 1
             min_pos = max_pos = 1
             continue
-        update_segment(i, seg, tmp_seg, vtDisivion, ret, pData)
+        update_segment(i, seg, tmp_seg, vtDisivion, ret, pData, eps)
 
     if seg.start_index != seg.end_index:
         ret.append(copy.deepcopy(seg))
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_fractal.py
+@desc: 顶底分型的向量化判断
+先算出独立K线相邻两根 high/low 之差的符号码(float_compare.diff_signs, 容差只在这里用一次), 再一次得到顶和底:
+  顶: 中间一根的高点、低点都比左右两根高 eps 以上(greater_than_0)
+  底: 中间一根的高点、低点都比左右两根低 eps 以上(less_than_0)
+"""
+from typing import Sequence
+
+import numpy as np
+
+from common.model.kline import KExtreme
+from common.model.kline_columns import MergedBars, FractalColumns
+from common.chanlun.float_compare import EPSINON, diff_signs
+
+
+def fractal_sides(lows: Sequence[float], highs: Sequence[float], eps: float = EPSINON) -> np.ndarray:
+    """每根独立K线是顶(1)、底(-1)还是都不是(0), 与 Cal_UPPER/Cal_LOWER 的判断相同; 首尾两根总是0"""
+    sides = np.zeros(len(lows), dtype=np.int8)
+    if len(lows) < 3:
+        return sides
+    dh, dl = diff_signs(highs, eps), diff_signs(lows, eps)
+    # 中间一根与左边一根的差为 d[i-1], 与右边一根的差为 -d[i]
+    top = (dh[:-1] == 1) & (dh[1:] == -1) & (dl[:-1] == 1) & (dl[1:] == -1)
+    bottom = (dh[:-1] == -1) & (dh[1:] == 1) & (dl[:-1] == -1) & (dl[1:] == 1)
+    inner = sides[1:-1]
+    inner[top] = KExtreme.TOP.value
+    inner[bottom] = KExtreme.BOTTOM.value
+    return sides
+
+
+def cal_fractals(merged: MergedBars, eps: float = EPSINON) -> FractalColumns:
+    """
+    全部顶底分型, 按K线索引顺序排列.
+    倒数第二根独立K线上的分型, 右侧的独立K线还可能变化, invalid=True.
+    eps 应与合并 merged 时的容差相同.
+    """
+    sides = fractal_sides(merged.low, merged.high, eps)
+    pos = np.flatnonzero(sides)
+    return FractalColumns(index=merged.extreme[pos], side=sides[pos], low=merged.low[pos], high=merged.high[pos],
+                          invalid=pos == len(merged) - 2, comb=pos)
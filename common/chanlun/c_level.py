@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_level.py
+@desc: 多级别的缠论结构: 笔 → 段 → 高一级别的段 → ...
+第 N 级别的段作为第 N+1 级别的笔, 用同样的 SegmentEngine / PivotEngine 计算段和中枢.
+各级别共用一份按K线索引的合并高低点(merges): 段的起止也是K线索引, 所以高级别不需要另外加载大周期的K线.
+每个级别只输入下一级别新确认的段, 还没有确认的段在检查点上试算(与 ChanStream 相同), 可以逐根K线增量更新:
+    levels = ChanLevels(stream.merges, depth=3)
+    stream.input(k)
+    levels.update(stream.bi_list, stream.sure_bi_count)
+第1级别的段、中枢与 seg_list、bi_pivots 一致; 第2级别的中枢与 duan_pivots 只有 up 不同
+(Segment 没有设置 side, compute_duan_pivots 的中枢 up 总是 False, 这里按段的方向设置).
+"""
+from typing import List, Sequence
+
+from common.model.kline import KLine, KSide, stBiK, Segment, Pivot
+from common.chanlun.float_compare import EPSINON
+from common.chanlun.c_segment import SegmentEngine
+from common.chanlun.c_pivot import PivotEngine, PivotEvent
+
+
+def segment_to_stroke(seg: Segment) -> stBiK:
+    """把段转为高一级别的笔"""
+    bi = stBiK()
+    bi.side = KSide.UP if seg.up else KSide.DOWN
+    bi.pos_begin = seg.pos_begin
+    bi.pos_end = seg.pos_end
+    bi.lowest = seg.lowest
+    bi.highest = seg.highest
+    return bi
+
+
+class ChanLevel:
+    """一个级别: 输入本级别的笔(第1级别为笔, 以上为低一级别的段), 得到段和中枢"""
+
+    def __init__(self, level: int, merges: Sequence[KLine], eps: float = EPSINON):
+        self.level = level
+        self.strokes: Sequence[stBiK] = []
+        self.sure_stroke_count = 0      # strokes 中前多少笔已经确认
+        self.segments: List[Segment] = []
+        self.sure_segment_count = 0     # segments 中前多少段已经确认
+        self.pivots: List[Pivot] = []
+        self._segment_engine = SegmentEngine(merges, eps)
+        self._pivot_engine = PivotEngine()
+
+    @property
+    def pivot_events(self) -> List[PivotEvent]:
+        """确认的笔上产生的中枢事件(形成、延伸、升级、结束)"""
+        return self._pivot_engine.events
+
+    def update(self, strokes: Sequence[stBiK], sure: int):
+        """strokes: 本级别的全部笔, 前 sure 笔已经确认"""
+        segment_engine, pivot_engine = self._segment_engine, self._pivot_engine
+        for i in range(segment_engine.bi_count, sure):
+            segment_engine.push(strokes[i])
+        for i in range(pivot_engine.count, sure):
+            pivot_engine.push(strokes[i])
+        tail = [strokes[i] for i in range(sure, len(strokes))]
+        self.strokes, self.sure_stroke_count = strokes, sure
+        # segments 去掉了第一段, 确认的段也少一个
+        self.sure_segment_count = max(len(segment_engine.sure_segments) - 1, 0)
+        self.segments = segment_engine.trial(tail)
+        self.pivots = pivot_engine.trial(tail)
+
+
+class ChanLevels:
+    """从第1级别的笔逐级计算到 depth 级别"""
+
+    def __init__(self, merges: Sequence[KLine], depth: int = 3, eps: float = EPSINON):
+        self.levels = [ChanLevel(n + 1, merges, eps) for n in range(depth)]
+        # 第 n 级别确认的段转成的高一级别的笔, 只转换一次
+        self._sure_strokes: List[List[stBiK]] = [[] for _ in range(depth)]
+
+    def __getitem__(self, n: int) -> ChanLevel:
+        return self.levels[n]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def update(self, bi_list: Sequence[stBiK], sure: int):
+        """bi_list: 第1级别的笔, 前 sure 笔已经确认"""
+        strokes = bi_list
+        for n, level in enumerate(self.levels):
+            level.update(strokes, sure)
+            cache, segments, sure = self._sure_strokes[n], level.segments, level.sure_segment_count
+            for i in range(len(cache), sure):
+                cache.append(segment_to_stroke(segments[i]))
+            strokes = cache + [segment_to_stroke(seg) for seg in segments[sure:]]
+
+
+def build_levels(bi_list: Sequence[stBiK], merges: Sequence[KLine], depth: int = 3,
+                 eps: float = EPSINON) -> List[ChanLevel]:
+    """由全部的笔一次计算各级别"""
+    levels = ChanLevels(merges, depth, eps)
+    levels.update(bi_list, len(bi_list))
+    return levels.levels
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_merge.py
+@desc: 基于数组的K线包含合并, 结果与 c_bi._Cal_MERGE 完全一致
+输入连续的 high/low 数组, 输出平行的数组: 合并后的高低点、起始、结束、极值位置、方向.
+不为每根K线创建 stCombineK, 也没有 deepcopy; 比较用符号码(见 float_compare.sign_code), 不再调用 greater_than_0 等函数.
+比较的对象是最后一根独立K线, 它的高(低)点刚取自前一根K线时(多数K线如此), 用 diff_signs 预先算出的
+相邻K线的符号码, 否则当场计算.
+结果为列式容器 MergedBars(见 kline_columns), 需要对象时由 to_combs 生成(每根独立K线一个对象).
+与 _Cal_MERGE 的一致性由 tests/test_c_merge.py 检查(仓库根目录下运行 python -m pytest tests).
+"""
+from typing import List, Sequence
+
+import numpy as np
+
+from common.model.kline import KLine, KSide
+from common.model.kline_columns import MergedBars
+from common.chanlun.float_compare import EPSINON, diff_signs
+
+_UP, _DOWN = KSide.UP.value, KSide.DOWN.value
+
+
+def merge_bars(highs: Sequence[float], lows: Sequence[float], eps: float = EPSINON) -> MergedBars:
+    """
+    包含合并, 逻辑与 _Cal_MERGE 相同:
+    _Cal_MERGE 中 pPrev 指向的K线与最后一根独立K线的高低点、位置总是相同, 这里只保存最后一根独立K线.
+    eps: 价格比较的容差, 默认与 float_compare 相同, 按品种设置见 tick_epsilon
+    """
+    hs = np.asarray(highs, dtype=np.float64)
+    ls = np.asarray(lows, dtype=np.float64)
+    # 相邻K线高低点的符号码, 最后一根独立K线的高(低)点刚取自前一根K线时直接使用
+    sh, sl = diff_signs(hs, eps).tolist(), diff_signs(ls, eps).tolist()
+    hs, ls = hs.tolist(), ls.tolist()   # 逐个访问 list 比访问 ndarray 元素快得多
+    size = len(hs)
+    out_low, out_high, out_begin, out_end, out_extreme, out_dir = [], [], [], [], [], []
+    if size:
+        out_low.append(ls[0])
+        out_high.append(hs[0])
+        out_begin.append(0)
+        out_end.append(0)
+        out_extreme.append(0)
+        out_dir.append(_DOWN)
+    if size >= 2:
+        # 最后一根独立K线, high_fresh/low_fresh: 它的高/低点取自前一根K线
+        last_low, last_high, last_begin, last_end, last_extreme, last_dir = ls[0], hs[0], 0, 0, 0, _DOWN
+        high_fresh = low_fresh = True
+        for cur in range(1, size):
+            low, high = ls[cur], hs[cur]
+            if high_fresh:
+                ch = sh[cur - 1]
+            else:
+                dh = high - last_high
+                ch = 1 if dh > eps else (-1 if dh < -eps else 0)
+            if low_fresh:
+                cl = sl[cur - 1]
+            else:
+                dl = low - last_low
+                cl = 1 if dl > eps else (-1 if dl < -eps else 0)
+            if ch == cl != 0:
+                # 独立K线, 先保存上一根
+                out_low[-1], out_high[-1], out_end[-1], out_extreme[-1] = last_low, last_high, last_end, last_extreme
+                last_low, last_high, last_begin, last_end, last_extreme = low, high, cur, cur, cur
+                last_dir = _UP if ch > 0 else _DOWN
+                high_fresh = low_fresh = True
+                out_low.append(low)
+                out_high.append(high)
+                out_begin.append(cur)
+                out_end.append(cur)
+                out_extreme.append(cur)
+                out_dir.append(last_dir)
+                continue
+            right = ch > 0 or cl < 0
+            if cur == 1:    # 第二根K线不分方向
+                if right:
+                    last_high, last_extreme = high, cur
+                else:
+                    last_low, last_extreme = low, last_begin
+                high_fresh, low_fresh = right, not right
+            elif right:     # 右包含
+                if last_dir == _UP:
+                    if ch != 0:
+                        last_extreme = cur
+                    last_high = high
+                    high_fresh, low_fresh = True, False
+                else:
+                    if cl != 0:
+                        last_extreme = cur
+                    last_low = low
+                    high_fresh, low_fresh = False, True
+            else:           # 左包含
+                if last_begin == last_end:
+                    last_extreme = last_begin
+                if last_dir == _UP:
+                    last_low = low
+                    high_fresh, low_fresh = False, True
+                else:
+                    last_high = high
+                    high_fresh, low_fresh = True, False
+            last_end = cur
+        out_low[-1], out_high[-1], out_end[-1], out_extreme[-1] = last_low, last_high, last_end, last_extreme
+    return MergedBars(low=out_low, high=out_high, begin=out_begin, end=out_end, extreme=out_extreme,
+                      direction=out_dir)
+
+
+def merge_klines(pData: List[KLine], eps: float = EPSINON) -> MergedBars:
+    """由 KLine 列表做包含合并"""
+    return merge_bars([k.high for k in pData], [k.low for k in pData], eps)
+
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_pipeline.py
+@desc: 缠论计算流水线(合并K线 → 分型 → 笔 → 段 → 中枢)的结果缓存
+同一份K线上的多个回调(笔、段、笔中枢、段中枢……)共用一个 ChanPipeline, 每一步只计算一次.
+ChanPipeline 按K线列表的对象和版本(根数、最后一根K线)缓存在一个有上限的LRU中.
+输入的K线不会被修改, 合并后的高低点保存在只读的 MergedPrice 中.
+价格比较的容差 eps 默认为 EPSINON, 按品种的最小变动价位设置时用 float_compare.tick_epsilon.
+盘中跟读时笔、段、中枢由 ChanStream 逐根增量计算, bind_stream 把它的结果放入缓存, 回调不必从头计算.
+"""
+import copy
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from common.model.kline import KLine, stCombineK, stFxK, stBiK, Segment, Pivot
+from common.model.kline_columns import (MergedBars, MergedPrice, FractalColumns, BiColumns, SegmentColumns,
+                                        PivotColumns, save_columns)
+from common.chanlun.c_bi import Cal_LOWER_UPPER
+from common.chanlun.c_merge import merge_klines
+from common.chanlun.c_fractal import cal_fractals
+from common.chanlun.c_sparse import calculate_bi_sparse
+from common.chanlun.c_segment import calculate_segments
+from common.chanlun.c_pivot import calculate_pivots
+from common.chanlun.c_level import ChanLevel, build_levels
+from common.chanlun.c_stream import ChanStream
+from common.chanlun.float_compare import EPSINON
+
+PIPELINE_CACHE_SIZE = 8     # 最多缓存几份K线的计算结果
+
+
+class ChanPipeline:
+    """一份K线的缠论计算结果, 各步在第一次使用时计算"""
+
+    def __init__(self, klines: List[KLine], eps: float = EPSINON):
+        self.klines = klines
+        self.eps = eps
+        self._levels: Dict[int, List[ChanLevel]] = {}
+
+    @classmethod
+    def from_stream(cls, klines: List[KLine], stream: ChanStream) -> "ChanPipeline":
+        """
+        由已经输入了 klines 的 ChanStream 取笔、段、中枢(与从头计算一致), 其余各步仍在第一次使用时计算.
+        取的是快照: 流以后输入新K线时, 正在延伸的中枢会在原对象上修改, 所以中枢复制一份
+        """
+        pipeline = cls(klines, stream.eps)
+        pipeline.__dict__.update(bi_list=stream.bi_list, seg_list=list(stream.seg_list),
+                                 bi_pivots=[copy.copy(p) for p in stream.bi_pivots],
+                                 duan_pivots=[copy.copy(p) for p in stream.duan_pivots])
+        return pipeline
+
+    @cached_property
+    def merged(self) -> MergedBars:
+        """独立K线(列式)"""
+        return merge_klines(self.klines, self.eps)
+
+    @cached_property
+    def combs(self) -> List[stCombineK]:
+        """独立K线"""
+        return self.merged.to_combs()
+
+    @cached_property
+    def fractals(self) -> FractalColumns:
+        """顶底分型(稀疏, 按K线索引排序)"""
+        return cal_fractals(self.merged, self.eps)
+
+    @cached_property
+    def _lower_upper(self) -> Tuple[List[stFxK], List[stFxK]]:
+        return Cal_LOWER_UPPER(self.klines, self.combs, self.eps)
+
+    @property
+    def lower(self) -> List[stFxK]:
+        """底分型(按K线索引)"""
+        return self._lower_upper[0]
+
+    @property
+    def upper(self) -> List[stFxK]:
+        """顶分型(按K线索引)"""
+        return self._lower_upper[1]
+
+    @cached_property
+    def merges(self) -> List[MergedPrice]:
+        """按K线索引的合并后高低点(只读, 同一独立K线共用一个对象)"""
+        return self.merged.merged_prices()
+
+    @cached_property
+    def independents(self) -> np.ndarray:
+        """K线索引 -> 独立K线索引(int32), 两根K线之间的独立K线数为两者之差 + 1"""
+        return self.merged.independent_index()
+
+    @cached_property
+    def bi_list(self) -> List[stBiK]:
+        return calculate_bi_sparse(self.fractals, self.merged)
+
+    @cached_property
+    def seg_list(self) -> List[Segment]:
+        return calculate_segments(self.bi_list, self.merges, self.eps)
+
+    @cached_property
+    def bi_pivots(self) -> List[Pivot]:
+        return calculate_pivots(self.bi_list)
+
+    @cached_property
+    def duan_pivots(self) -> List[Pivot]:
+        return calculate_pivots(self.seg_list)
+
+    def levels(self, depth: int = 3) -> List[ChanLevel]:
+        """多级别结构, 第1级别的笔为 bi_list, 第 N+1 级别的笔为第 N 级别的段"""
+        if depth not in self._levels:
+            self._levels[depth] = build_levels(self.bi_list, self.merges, depth, self.eps)
+        return self._levels[depth]
+
+    def columns(self) -> Dict[str, object]:
+        """各步结果的列式容器, 用于保存或长期持有(比对象列表省内存)"""
+        return {
+            "merged": self.merged,
+            "fractals": self.fractals,
+            "bi": BiColumns.from_objects(self.bi_list),
+            "segments": SegmentColumns.from_objects(self.seg_list),
+            "bi_pivots": PivotColumns.from_objects(self.bi_pivots),
+            "duan_pivots": PivotColumns.from_objects(self.duan_pivots),
+        }
+
+    def save(self, file_path: str):
+        """把各步结果保存为 npz, 由 kline_columns.load_columns 读取"""
+        save_columns(file_path, self.columns())
+
+
+_cache: "OrderedDict[int, Tuple[tuple, ChanPipeline]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version(klines: List[KLine]) -> tuple:
+    if not klines:
+        return 0,
+    last = klines[-1]
+    return len(klines), last.time, last.open, last.high, last.low, last.close, last.volume
+
+
+def get_pipeline(klines: List[KLine], eps: float = EPSINON) -> ChanPipeline:
+    """
+    取K线列表对应的计算流水线. 同一个列表对象且根数、最后一根K线、容差都没变时返回缓存的流水线;
+    列表被追加或改动了最后一根K线时重新计算. 缓存持有列表的引用, 所以列表对象的 id 不会被重用.
+    """
+    key, version = id(klines), (_version(klines), eps)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == version and entry[1].klines is klines:
+            _cache.move_to_end(key)
+            return entry[1]
+        pipeline = ChanPipeline(klines, eps)
+        _put(key, version, pipeline)
+        return pipeline
+
+
+def bind_stream(klines: List[KLine], stream: ChanStream) -> bool:
+    """
+    盘中跟读: stream 输入的K线与 klines 相同(根数、第一根和最后一根一致)时, 用它的结果作为 klines 的流水线放入缓存,
+    之后的 get_pipeline(klines, stream.eps) 直接返回; 不相同时返回False
+    """
+    if not klines or _version(klines) != _version(stream.klines) or klines[0].time != stream.klines[0].time:
+        return False
+    pipeline = ChanPipeline.from_stream(klines, stream)
+    with _lock:
+        _put(id(klines), (_version(klines), stream.eps), pipeline)
+    return True
+
+
+def _put(key: int, version: tuple, pipeline: ChanPipeline):
+    _cache[key] = (version, pipeline)
+    _cache.move_to_end(key)
+    while len(_cache) > PIPELINE_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def clear_pipeline_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_pivot.py
+@desc: 中枢的状态机, 逐笔(段)输入, 结果与 compute_bi_pivots / compute_duan_pivots 完全一致
+compute_bi_pivots 的循环每次从 base 调用 process_down_up, 中枢结束后 base 退回到中枢的最后一笔再重新判断.
+这里把这个循环拆成两种状态, 每输入一笔只做需要的比较:
+  1) 没有正在延伸的中枢: 判断 base 与 base+2 是否重叠, 重叠则形成中枢, 否则 base 加1
+  2) 中枢正在延伸: 判断下一笔同向笔是否与中枢区间重叠, 重叠则延伸, 否则中枢结束, base 退到中枢的最后一笔
+同时产生事件: 形成、延伸、升级(延伸到9笔)、结束.
+"""
+import copy
+from enum import Enum
+from typing import List, Optional, Sequence, Union
+
+from common.model.kline import KSide, stBiK, Segment, Pivot
+from common.chanlun.c_bi import intervals_overlap
+
+LEVEL_UP_COUNT = 9      # 中枢延伸到9笔(段)时升级
+
+
+class PivotEventType(Enum):
+    NEW = 1         # 形成
+    EXTEND = 2      # 延伸
+    LEVEL_UP = 3    # 升级
+    FINISH = 4      # 结束(下一笔同向笔离开中枢区间)
+
+
+class PivotEvent:
+    """中枢事件, index 为引起事件的笔(段)的序号, pivot 为事件发生时中枢的副本(之后的延伸不会改变它)"""
+
+    def __init__(self, kind: PivotEventType, pivot: Pivot, index: int):
+        self.kind = kind
+        self.pivot = pivot
+        self.index = index
+
+    def __str__(self):
+        return f"[{self.index}]{self.kind.name}:{self.pivot}"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class PivotEngine:
+    """
+    用法:
+        engine = PivotEngine()
+        for bi in bi_list:
+            events = engine.push(bi)
+        engine.pivots
+    """
+
+    def __init__(self):
+        self._lows: List[float] = []
+        self._highs: List[float] = []
+        self._ups: List[bool] = []
+        self._begins: List[int] = []
+        self._ends: List[int] = []
+        self.base = 1       # 从第二笔开始尝试
+        self._pivots: List[Pivot] = []
+        self._open: Optional[Pivot] = None  # 正在延伸的中枢, 是 _pivots 的最后一个
+        self._next = 0      # 正在延伸的中枢下一个要判断的笔
+        self.events: List[PivotEvent] = []
+
+    @property
+    def count(self) -> int:
+        """已经输入的笔(段)数"""
+        return len(self._ups)
+
+    @property
+    def pivots(self) -> List[Pivot]:
+        """全部中枢, 最后一个可能还在延伸; 少于5笔时为空(与 compute_bi_pivots 一致)"""
+        return self._pivots
+
+    def push(self, item: Union[stBiK, Segment]) -> List[PivotEvent]:
+        """输入下一笔(段), 返回这一笔引起的事件"""
+        self._lows.append(item.lowest)
+        self._highs.append(item.highest)
+        self._ups.append(item.side == KSide.UP)
+        self._begins.append(item.pos_begin)
+        self._ends.append(item.pos_end)
+        size = len(self.events)
+        if len(self._ups) >= 5:
+            self._advance()
+        return self.events[size:]
+
+    def extend(self, items: Sequence[Union[stBiK, Segment]]):
+        for item in items:
+            self.push(item)
+
+    def checkpoint(self) -> tuple:
+        """保存当前状态, rollback 时回到这里"""
+        return (len(self._ups), self.base, len(self._pivots), copy.copy(self._open), self._next, len(self.events))
+
+    def rollback(self, point: tuple):
+        """回到 checkpoint 保存的状态, 之后输入的笔(段)、形成的中枢和事件都被丢弃"""
+        n, self.base, pivot_count, pivot, self._next, event_count = point
+        for values in (self._lows, self._highs, self._ups, self._begins, self._ends):
+            del values[n:]
+        del self._pivots[pivot_count:]
+        del self.events[event_count:]
+        self._open = None
+        if pivot is not None:
+            # 在原对象上恢复, 调用方持有的 pivots 中的对象仍然有效
+            self._open = self._pivots[-1]
+            self._open.__dict__.update(pivot.__dict__)
+
+    def trial(self, items: Sequence[Union[stBiK, Segment]]) -> List[Pivot]:
+        """在当前状态上试算 items(例如还没有确认的笔), 返回试算得到的全部中枢, 然后回到当前状态"""
+        point = self.checkpoint()
+        self.extend(items)
+        pivots = self._pivots[:]
+        if point[3] is not None:
+            # 检查点上正在延伸的中枢在试算中可能被修改, 回退时会在原对象上恢复, 返回副本
+            pivots[point[2] - 1] = copy.copy(pivots[point[2] - 1])
+        self.rollback(point)
+        return pivots
+
+    def _emit(self, kind: PivotEventType, index: int):
+        self.events.append(PivotEvent(kind, copy.copy(self._open), index))
+
+    def _advance(self):
+        """用已经输入的笔往前走, 直到需要下一笔为止"""
+        lows, highs, last = self._lows, self._highs, len(self._ups) - 1
+        while True:
+            pivot = self._open
+            if pivot is None:
+                base = self.base
+                if base + 2 > last:
+                    return
+                if not intervals_overlap(lows[base], highs[base], lows[base + 2], highs[base + 2]):
+                    self.base = base + 1
+                    continue
+                pivot = self._open = Pivot()
+                pivot.up = self._ups[base]
+                pivot.lowly_value = max(lows[base], lows[base + 2])
+                pivot.highly_value = min(highs[base], highs[base + 2])
+                pivot.bg_pos_index = self._begins[base]
+                pivot.ed_pos_index = self._ends[base + 2]
+                self._pivots.append(pivot)
+                self._next = base + 4
+                self._emit(PivotEventType.NEW, base + 2)
+                continue
+            i = self._next
+            if i > last:
+                return
+            if not intervals_overlap(pivot.lowly_value, pivot.highly_value, lows[i], highs[i]):
+                self._emit(PivotEventType.FINISH, i)
+                self._open = None
+                self.base = i - 2   # 退回到中枢的最后一笔
+                continue
+            pivot.ed_pos_index = self._ends[i]
+            self._next = i + 2
+            self._emit(PivotEventType.EXTEND, i)
+            if i - self.base + 1 == LEVEL_UP_COUNT:
+                self._emit(PivotEventType.LEVEL_UP, i)
+
+
+def calculate_pivots(items: Sequence[Union[stBiK, Segment]]) -> List[Pivot]:
+    """计算中枢, 与 compute_bi_pivots(笔) / compute_duan_pivots(段) 一致"""
+    engine = PivotEngine()
+    engine.extend(items)
+    return engine.pivots
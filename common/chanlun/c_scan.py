@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_scan.py
+@desc: 批量扫描导出目录下全部品种的缠论结构(不启动界面)
+对 base_path 下每个 xx#xxL9.txt 计算 合并K线 → 分型 → 笔 → 段 → 中枢(ChanPipeline, 结果与 c_bi 一致),
+各品种分配到进程池中计算, 每个品种一行摘要: 最后一笔的方向和区间、最后一个笔中枢的区间、
+check_simple_pullback_in_last_3_bi 的结果, 全部写入一个列式的 npz 文件(每列一个数组), 用 load_scan 读取.
+用法:
+    python -m common.chanlun.c_scan D:/new_tdx/T0002/export -o data/output/chan_scan.npz
+    python -m common.chanlun.c_scan --conf conf/a1_kline_chart/a6_fen_xing/a6_fen_xing.yaml
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import yaml
+
+from common.config import OUTPUT_PATH
+from common.model.kline import KLine, KSide
+from common.utils.kline_cache import load_kline_array, temp_file_path
+from common.utils.symbol_catalog import STOCK_FILE_PATTERN, read_header
+from common.chanlun.c_pipeline import ChanPipeline
+from common.algo.simple_pull_back import check_simple_pullback_in_last_3_bi
+
+SCAN_FILE = os.path.join(OUTPUT_PATH, "chan_scan.npz")
+
+# 摘要的列: 列名 -> 类型. 时间为文件中的墙上时间距1970-01-01的秒数, 没有笔/中枢时为0, 价格为nan
+SCAN_COLUMNS = {
+    "file_name": "U64",
+    "code": "U16",
+    "name": "U32",
+    "kline_count": "i8",
+    "last_time": "i8",          # 最后一根K线的时间
+    "bi_count": "i8",
+    "bi_side": "i1",            # 最后一笔的方向: 1 向上, -1 向下, 0 没有笔
+    "bi_begin_time": "i8",
+    "bi_end_time": "i8",
+    "bi_low": "f8",
+    "bi_high": "f8",
+    "seg_count": "i8",
+    "pivot_count": "i8",        # 笔中枢个数
+    "pivot_up": "i1",           # 最后一个笔中枢的方向: 1 向上, -1 向下, 0 没有中枢
+    "pivot_begin_time": "i8",
+    "pivot_end_time": "i8",
+    "pivot_low": "f8",
+    "pivot_high": "f8",
+    "pullback": "?",            # check_simple_pullback_in_last_3_bi
+    "error": "U128",            # 计算失败时的错误信息, 成功时为空
+}
+
+
+def array_to_klines(arr: np.ndarray) -> List[KLine]:
+    """通达信K线数组转为算法使用的KLine列表"""
+    klines: List[KLine] = []
+    for t, o, h, lo, c, v in zip(arr["time"].tolist(), arr["open"].tolist(), arr["high"].tolist(),
+                                 arr["low"].tolist(), arr["close"].tolist(), arr["volume"].tolist()):
+        k = KLine()
+        k.time, k.open, k.high, k.low, k.close, k.volume = t, o, h, lo, c, v
+        klines.append(k)
+    return klines
+
+
+def _empty_row(file_name: str) -> dict:
+    row = {key: np.zeros((), dtype).item() for key, dtype in SCAN_COLUMNS.items()}
+    for key in ("bi_low", "bi_high", "pivot_low", "pivot_high"):
+        row[key] = float("nan")
+    row["file_name"] = file_name
+    return row
+
+
+def scan_file(file_path: str, count: int = 0) -> dict:
+    """计算一个品种的摘要(一行), count>0 时只用最后 count 根K线. 出错时记录在 error 列中, 不抛出异常"""
+    row = _empty_row(os.path.basename(file_path))
+    try:
+        header = read_header(file_path)
+        if header:
+            row["code"], row["name"] = header
+        arr = load_kline_array(file_path)
+        if arr is None:
+            row["error"] = "不是通达信格式"
+            return row
+        if count > 0:
+            arr = arr[-count:]
+        times = arr["time"]
+        row["kline_count"] = len(arr)
+        row["last_time"] = int(times[-1]) if len(arr) else 0
+
+        pipeline = ChanPipeline(array_to_klines(arr))
+        bi_list = pipeline.bi_list
+        row["bi_count"] = len(bi_list)
+        if bi_list:
+            bi = bi_list[-1]
+            row["bi_side"] = 1 if bi.side == KSide.UP else -1 if bi.side == KSide.DOWN else 0
+            row["bi_begin_time"], row["bi_end_time"] = int(times[bi.pos_begin]), int(times[bi.pos_end])
+            row["bi_low"], row["bi_high"] = bi.lowest, bi.highest
+        row["seg_count"] = len(pipeline.seg_list)
+        pivots = pipeline.bi_pivots
+        row["pivot_count"] = len(pivots)
+        if pivots:
+            pivot = pivots[-1]
+            row["pivot_up"] = 1 if pivot.up else -1
+            row["pivot_begin_time"] = int(times[pivot.bg_pos_index])
+            row["pivot_end_time"] = int(times[pivot.ed_pos_index])
+            row["pivot_low"], row["pivot_high"] = pivot.lowly_value, pivot.highly_value
+        row["pullback"] = check_simple_pullback_in_last_3_bi(bi_list)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {str(e)}"[:128]
+    return row
+
+
+def list_stock_files(base_path: str) -> List[str]:
+    """目录下全部品种文件(xx#xxL9.txt), 按文件名排序"""
+    return sorted(name for name in os.listdir(base_path) if STOCK_FILE_PATTERN.match(name))
+
+
+def scan_directory(base_path: str, count: int = 0, max_workers: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """用进程池扫描目录下全部品种, 返回列式的摘要(列名 -> 数组, 按文件名排序)"""
+    paths = [os.path.join(base_path, name) for name in list_stock_files(base_path)]
+    rows: List[dict] = []
+    if paths:
+        workers = min(max_workers or os.cpu_count() or 1, len(paths))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(len(paths) // (workers * 4), 1)
+            for row in pool.map(scan_file, paths, [count] * len(paths), chunksize=chunksize):
+                if row["error"]:
+                    logging.warning(f"扫描失败: {row['file_name']}, {row['error']}")
+                rows.append(row)
+    return {key: np.array([row[key] for row in rows], dtype=dtype) for key, dtype in SCAN_COLUMNS.items()}
+
+
+def save_scan(file_path: str, columns: Dict[str, np.ndarray]):
+    """保存为 npz(先写临时文件再替换)"""
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    tmp_path = temp_file_path(file_path)
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **columns)
+    os.replace(tmp_path, file_path)
+
+
+def load_scan(file_path: str) -> Dict[str, np.ndarray]:
+    """读取 save_scan 保存的摘要"""
+    with np.load(file_path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _base_path_from_conf(conf_path: str) -> str:
+    with open(conf_path, 'r', encoding='utf-8') as f:
+        conf = yaml.safe_load(f) or {}
+    return (conf.get("conf") or {}).get("base_path", "")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量扫描导出目录下全部品种的缠论结构")
+    parser.add_argument("base_path", nargs="?", default="", help="通达信导出目录")
+    parser.add_argument("--conf", default="", help="从图表配置文件的 conf.base_path 读取导出目录")
+    parser.add_argument("-o", "--output", default=SCAN_FILE, help="摘要文件(npz)")
+    parser.add_argument("-n", "--count", type=int, default=0, help="每个品种只用最后多少根K线, 0为全部")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="进程数, 默认为CPU核数")
+    args = parser.parse_args(argv)
+
+    base_path = args.base_path or (_base_path_from_conf(args.conf) if args.conf else "")
+    if not base_path or not os.path.isdir(base_path):
+        parser.error(f"导出目录不存在: {base_path}")
+    start = time.time()
+    columns = scan_directory(base_path, args.count, args.workers)
+    save_scan(args.output, columns)
+    failed = int(np.count_nonzero(columns["error"]))
+    logging.info(f"扫描完成: {len(columns['file_name'])} 个品种, 失败 {failed} 个, "
+                 f"耗时 {time.time() - start:.1f}s, 输出: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_segment.py
+@desc: 线段的状态机, 逐笔输入, 结果与 c_bi._NCHDUAN 完全一致(_NCHDUAN 保留作为对照)
+与 _NCHDUAN 的区别:
+  1) 不翻转输入笔的方向. _NCHDUAN 翻转后 side 为 KSide.UP 的笔, 就是起点为顶的笔(原方向向下)
+  2) 每笔只在输入时读取一次起点的高低点(pData[bi.pos_begin].high/low), 保存为列表
+  3) make_sure_up_segment/make_sure_low_segment 每次从段的终点往后重新扫描特征序列, 找第一处破坏;
+     这里按 (段的方向, 段的终点) 保存扫描到的位置, 以后只检查新加入的笔, 整个过程对笔数是线性的
+  4) 可以保存检查点并回退(checkpoint/rollback), 供增量计算时在尾部的笔上试算
+"""
+import copy
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from common.model.kline import KLine, KSide, stBiK, Segment
+from common.chanlun.float_compare import EPSINON
+
+_SCAN_CACHE_SIZE = 4    # 保存几个段的特征序列扫描位置(正在确认的段和临时段)
+
+
+class SegmentEngine:
+    """
+    用法:
+        engine = SegmentEngine(merges)
+        for bi in bi_list:
+            engine.push(bi)
+        engine.segments()
+    merges: 按K线索引的合并后高低点(与 _NCHDUAN 的 pData 相同), 只读取笔起点的 low/high
+    """
+
+    def __init__(self, merges: Sequence[KLine], eps: float = EPSINON):
+        self.merges = merges
+        self.eps = eps
+        # 每笔的起点: 高低点、是否为顶, 以及填写段用到的 lowest/highest/pos_begin
+        self._highs: List[float] = []
+        self._lows: List[float] = []
+        self._tops: List[bool] = []
+        self._lowest: List[float] = []
+        self._highest: List[float] = []
+        self._begin: List[int] = []
+        # _NCHDUAN 循环中的状态
+        self.status = 0
+        self.min_pos = -1
+        self.max_pos = -1
+        self.seg = Segment()
+        self.tmp_seg = Segment()
+        self._ret: List[Segment] = []   # 确认的段(已填写高低点和K线位置)
+        # (段是否向上, 段的终点) -> (下一个要检查的笔, 特征序列的前一个位置, 是否已经找到破坏)
+        self._scans: Dict[Tuple[bool, int], Tuple[int, int, bool]] = {}
+
+    @property
+    def bi_count(self) -> int:
+        return len(self._tops)
+
+    @property
+    def sure_segments(self) -> List[Segment]:
+        """确认的段(包括 _NCHDUAN 最后去掉的第一段)"""
+        return self._ret
+
+    def pending_segments(self) -> List[Segment]:
+        """还没有确认的段和临时段, 与 _NCHDUAN 结尾加入的一致"""
+        return [self._filled(copy.copy(s)) for s in (self.seg, self.tmp_seg) if s.start_index != s.end_index]
+
+    def segments(self) -> List[Segment]:
+        """全部段, 与 _NCHDUAN 的返回值一致(去掉第一段)"""
+        return (self._ret + self.pending_segments())[1:]
+
+    def push(self, bi: stBiK):
+        """输入下一笔"""
+        k = self.merges[bi.pos_begin]
+        self._highs.append(k.high)
+        self._lows.append(k.low)
+        self._tops.append(bi.side == KSide.DOWN)
+        self._lowest.append(bi.lowest)
+        self._highest.append(bi.highest)
+        self._begin.append(bi.pos_begin)
+        i = len(self._tops) - 1
+        if i >= 3:
+            self._step(i)
+
+    def extend(self, bis: Sequence[stBiK]):
+        for bi in bis:
+            self.push(bi)
+
+    def checkpoint(self) -> tuple:
+        """保存当前状态, rollback 时回到这里"""
+        return (len(self._tops), len(self._ret), self.status, self.min_pos, self.max_pos,
+                copy.copy(self.seg), copy.copy(self.tmp_seg), dict(self._scans))
+
+    def rollback(self, point: tuple):
+        """回到 checkpoint 保存的状态, 之后输入的笔都被丢弃"""
+        n, ret_size, self.status, self.min_pos, self.max_pos, seg, tmp_seg, scans = point
+        for values in (self._highs, self._lows, self._tops, self._lowest, self._highest, self._begin):
+            del values[n:]
+        del self._ret[ret_size:]
+        self.seg, self.tmp_seg = copy.copy(seg), copy.copy(tmp_seg)
+        self._scans = dict(scans)
+
+    def trial(self, bis: Sequence[stBiK]) -> List[Segment]:
+        """在当前状态上试算 bis(例如还没有确认的笔), 返回 segments() 的结果, 然后回到当前状态"""
+        point = self.checkpoint()
+        self.extend(bis)
+        segments = self.segments()
+        self.rollback(point)
+        return segments
+
+    def _filled(self, seg: Segment) -> Segment:
+        """由笔填写段的高低点和K线位置, 与 _NCHDUAN 结尾一致"""
+        if seg.up:
+            seg.lowest = self._lowest[seg.start_index]
+            seg.highest = self._highest[seg.end_index]
+        else:
+            seg.lowest = self._lowest[seg.end_index]
+            seg.highest = self._highest[seg.start_index]
+        seg.pos_begin = self._begin[seg.start_index]
+        seg.pos_end = self._begin[seg.end_index]
+        return seg
+
+    def _confirm(self, seg: Segment):
+        sure = copy.copy(seg)
+        sure.is_sure = True
+        self._ret.append(self._filled(sure))
+
+    def _step(self, i: int):
+        """处理第 i 笔, 与 _NCHDUAN 的循环体一致"""
+        highs, lows, eps = self._highs, self._lows, self.eps
+        if self.status == 0:
+            if not self._is_overlap(i):
+                self.min_pos = self.max_pos = -1
+                return
+            if self.min_pos == -1:
+                self.min_pos = self.max_pos = i - 3
+                for k in range(i - 2, i):
+                    if highs[k] - highs[self.max_pos] > eps:
+                        self.max_pos = k
+                    if lows[k] - lows[self.min_pos] < -eps:
+                        self.min_pos = k
+            if not self._find_first_segment(i):
+                return
+            self.status = 1
+            self.min_pos = self.max_pos = 1
+            return
+        self._update_segment(i)
+
+    def _is_overlap(self, i: int) -> bool:
+        """与 is_overlap 一致: 第 i 笔与第 i-3 笔是否重叠"""
+        if self._tops[i]:
+            return not self._highs[i] - self._lows[i - 3] < -self.eps
+        return not self._lows[i] - self._highs[i - 3] > self.eps
+
+    def _find_first_segment(self, i: int) -> bool:
+        """与 find_first_segment 一致"""
+        highs, lows, eps, seg = self._highs, self._lows, self.eps, self.seg
+        if self._tops[i]:
+            if i - self.min_pos < 3:
+                return False
+            if highs[i] - highs[i - 2] > eps and highs[i - 1] - highs[i - 3] > eps:
+                seg.start_index, seg.end_index, seg.up = self.min_pos, i, True
+                return True
+        else:
+            if i - self.max_pos < 3:
+                return False
+            if lows[i] - lows[i - 2] < -eps and highs[i - 1] - highs[i - 3] < -eps:
+                seg.start_index, seg.end_index, seg.up = self.max_pos, i, False
+                return True
+        return False
+
+    def _scan(self, up: bool, end_index: int, cur_pos: int) -> Optional[int]:
+        """
+        make_sure_up_segment/make_sure_low_segment 中的特征序列扫描:
+        从 end_index + 3 到 cur_pos 每隔一笔, 找第一笔破坏前一个位置的低点(向上段)或高点(向下段),
+        返回破坏前的位置 end_pos; 没有破坏时返回 None. 扫描的进度按段保存, 每笔只检查一次.
+        """
+        key = (up, end_index)
+        i, end_pos, found = self._scans.get(key, (end_index + 3, end_index + 1, False))
+        if not found:
+            values, eps = (self._lows, -self.eps) if up else (self._highs, self.eps)
+            while i <= cur_pos:
+                if (values[i] - values[end_pos] < eps) if up else (values[i] - values[end_pos] > eps):
+                    found = True
+                    break
+                end_pos = i
+                i += 2
+            self._scans.pop(key, None)
+            self._scans[key] = (i, end_pos, found)
+            while len(self._scans) > _SCAN_CACHE_SIZE:
+                del self._scans[next(iter(self._scans))]
+        return end_pos if found and i <= cur_pos else None
+
+    def _make_sure_low_segment(self, segment: Segment, cur_pos: int) -> int:
+        """与 make_sure_low_segment 一致"""
+        highs, lows, eps = self._highs, self._lows, self.eps
+        if not self._tops[cur_pos]:
+            # 更低
+            if lows[cur_pos] - lows[segment.end_index] < -eps:
+                segment.end_index = cur_pos
+            return -1
+        if cur_pos - segment.end_index < 3:
+            return -1
+        end_pos = self._scan(False, segment.end_index, cur_pos)
+        if end_pos is None:
+            return -1
+        max_price = highs[segment.start_index + 2]
+        min_price = lows[segment.start_index + 1]
+        for k in range(segment.start_index + 3, segment.end_index, 2):
+            if min_price - lows[k] < -eps:
+                if max_price - highs[k + 1] < -eps:
+                    min_price = lows[k]
+                max_price = highs[k + 1]
+            else:
+                min_price = lows[k]
+                max_price = highs[k + 1]
+        # 存在缺口为1
+        return 1 if highs[end_pos] - min_price < -eps else 0
+
+    def _make_sure_up_segment(self, segment: Segment, cur_pos: int) -> int:
+        """与 make_sure_up_segment 一致"""
+        highs, lows, eps = self._highs, self._lows, self.eps
+        if self._tops[cur_pos]:
+            if highs[cur_pos] - highs[segment.end_index] > eps:
+                segment.end_index = cur_pos
+            return -1
+        if cur_pos - segment.end_index < 3:
+            return -1
+        end_pos = self._scan(True, segment.end_index, cur_pos)
+        if end_pos is None:
+            return -1
+        max_price = highs[segment.start_index + 1]
+        min_price = lows[segment.start_index + 2]
+        for k in range(segment.start_index + 3, segment.end_index, 2):
+            if max_price - highs[k] > eps:
+                if min_price - lows[k + 1] > eps:
+                    max_price = highs[k]
+                min_price = lows[k + 1]
+            else:
+                max_price = highs[k]
+                min_price = lows[k + 1]
+        return 1 if lows[end_pos] - max_price > eps else 0
+
+    def _make_sure_segment(self, segment: Segment, cur_pos: int) -> int:
+        if segment.up:
+            return self._make_sure_up_segment(segment, cur_pos)
+        return self._make_sure_low_segment(segment, cur_pos)
+
+    def _update_segment(self, cur_pos: int):
+        """与 update_segment 一致"""
+        seg, tmp_seg, eps = self.seg, self.tmp_seg, self.eps
+        if tmp_seg.start_index == tmp_seg.end_index:
+            status = self._make_sure_segment(seg, cur_pos)
+            if status == 0:
+                # 不存在缺口
+                self._confirm(seg)
+                seg.start_index = seg.end_index
+                seg.end_index = cur_pos
+                seg.is_sure = False
+                seg.up = not seg.up
+            elif status == 1:
+                # 存在缺口
+                tmp_seg.start_index = seg.end_index
+                tmp_seg.end_index = cur_pos
+                tmp_seg.is_sure = False
+                tmp_seg.up = not seg.up
+            return
+
+        status = self._make_sure_segment(tmp_seg, cur_pos)
+        if status == -1:
+            if self._tops[cur_pos] and not tmp_seg.up:
+                if self._highs[cur_pos] - self._highs[tmp_seg.start_index] > eps:
+                    seg.end_index = cur_pos
+                    tmp_seg.start_index = tmp_seg.end_index = 0
+            elif tmp_seg.up:
+                if self._lows[cur_pos] - self._lows[tmp_seg.start_index] < -eps:
+                    seg.end_index = cur_pos
+                    tmp_seg.start_index = tmp_seg.end_index = 0
+            return
+
+        self._confirm(seg)
+        seg.is_sure = False
+        if status == 0:
+            # 不存在缺口
+            tmp_seg.is_sure = True
+            self._confirm(tmp_seg)
+            seg.start_index = tmp_seg.end_index
+            seg.end_index = cur_pos
+            seg.up = not tmp_seg.up
+            tmp_seg.start_index = tmp_seg.end_index = 0
+        elif status == 1:
+            # 存在缺口
+            seg.start_index = tmp_seg.start_index
+            seg.end_index = tmp_seg.end_index
+            seg.up = tmp_seg.up
+            tmp_seg.start_index = seg.end_index
+            tmp_seg.end_index = cur_pos
+            tmp_seg.up = not seg.up
+
+
+def calculate_segments(bi_list: Sequence[stBiK], merges: Sequence[KLine], eps: float = EPSINON) -> List[Segment]:
+    """计算线段, 与 _NCHDUAN([copy.copy(bi) for bi in bi_list], merges, eps) 一致, 不修改 bi_list"""
+    engine = SegmentEngine(merges, eps)
+    engine.extend(bi_list)
+    return engine.segments()
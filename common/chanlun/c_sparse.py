@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_sparse.py
+@desc: 稀疏的分型和笔
+cal_fractals(见 c_fractal) 按K线索引顺序只输出顶和底(FractalColumns);
+calculate_bi_sparse 直接在这个稀疏序列上走 calculate_bi 的查找, 结果与 calculate_bi 一致.
+计算量与分型(转折点)的个数成正比, 不再与K线根数成正比.
+
+与 c_bi 中按K线索引的查找的对应关系:
+  next_(某个分型的K线索引 + 1)        -> 稀疏序列中的下一个位置
+  merge[分型的K线索引].low/high       -> 分型所在独立K线的高低点, 即分型自身的 lowest/highest
+  count_independent_kline(ind, b, e) -> 两个分型所在独立K线索引的差 + 1
+"""
+from typing import List, Tuple
+
+from common.model.kline import stFxK, stBiK, KExtreme
+from common.model.kline_columns import MergedBars, FractalColumns
+from common.chanlun.c_bi import generate_bi
+
+_TOP = KExtreme.TOP.value
+_NORM = 5   # 一笔至少需要的独立K线数
+
+
+class _SparseWalk:
+    """calculate_bi 中 get_node 等函数在稀疏分型上的等价实现, 位置为分型在序列中的序号, -1 表示没有"""
+
+    def __init__(self, fractals: FractalColumns):
+        self.side = fractals.side.tolist()
+        self.low = fractals.low.tolist()
+        self.high = fractals.high.tolist()
+        self.comb = fractals.comb.tolist()
+        self.size = len(self.side)
+
+    def succ(self, p: int) -> int:
+        return p + 1 if p + 1 < self.size else -1
+
+    def count(self, b: int, e: int) -> int:
+        return self.comb[e] - self.comb[b] + 1
+
+    def go_util_difference_fx(self, base: int) -> int:
+        nxt = self.succ(base)
+        while nxt >= 0 and self.side[nxt] == self.side[base]:
+            nxt = self.succ(nxt)
+        return nxt
+
+    def deal_same_top_bottom(self, nxt: int, base: int, up: bool, c1: int) -> Tuple[int, int]:
+        while nxt >= 0 and self.side[nxt] == self.side[base]:
+            nxt = self.succ(nxt)
+            if nxt < 0:
+                break
+            if up:
+                if self.low[nxt] < self.low[c1]:
+                    c1 = nxt
+            else:
+                if self.high[nxt] > self.high[c1]:
+                    c1 = nxt
+        return nxt, c1
+
+    def satisfy_the_number(self, nxt: int, up: bool) -> Tuple[bool, int]:
+        """返回 (是否找到末尾, 位置)"""
+        bs = bs_next = nxt
+        side, low, high = self.side, self.low, self.high
+        while True:
+            bs_next = self.succ(bs_next)
+            if bs_next < 0:
+                return True, nxt
+            if side[bs_next] == side[nxt]:
+                if up:
+                    if low[bs_next] < low[nxt]:
+                        nxt = bs = bs_next
+                else:
+                    if high[bs_next] > high[nxt]:
+                        nxt = bs = bs_next
+                continue
+            if self.count(bs, bs_next) < _NORM:
+                continue
+            if up:
+                if high[bs_next] < high[nxt] or (not low[bs_next] > high[nxt]):
+                    continue
+            else:
+                if low[bs_next] > low[nxt] or (not high[bs_next] < low[nxt]):
+                    continue
+            break
+        return False, nxt
+
+    def get_node(self, base: int) -> Tuple[bool, int]:
+        """返回 (是否找到末尾, 位置); 位置为-1表示没有找到"""
+        up = self.side[base] == _TOP
+        nxt = self.go_util_difference_fx(base)
+        while nxt >= 0:
+            if self.count(base, nxt) < _NORM:
+                nxt = self.succ(nxt)
+                nxt, _ = self.deal_same_top_bottom(nxt, base, up, nxt)
+                # deal_not_last: 这里 nxt 和 c1 都是 base 之后的分型, 不改变 nxt
+                if nxt < 0:
+                    break
+            else:
+                at_end, nxt = self.satisfy_the_number(nxt, up)
+                if not at_end:
+                    break
+                return True, nxt
+        return False, nxt
+
+
+def calculate_bi_sparse(fractals: FractalColumns, merged: MergedBars) -> List[stBiK]:
+    """
+    由稀疏分型计算笔, 与 calculate_bi(Cal_LOWER, Cal_UPPER, merges, independents) 一致.
+    fractals 须由 cal_fractals(merged) 得到(需要分型所在独立K线的索引).
+    """
+    walk = _SparseWalk(fractals)
+    nodes: List[int] = []
+    p = 0
+    while p < walk.size:
+        at_end, right = walk.get_node(p)
+        if at_end or right < 0:
+            if at_end:
+                nodes.append(right)
+            break
+        if not nodes:
+            nodes.append(p)
+        nodes.append(right)
+        p = right
+    return generate_bi(_node_fractals(fractals, merged, nodes))
+
+
+def _node_fractals(fractals: FractalColumns, merged: MergedBars, nodes: List[int]) -> List[stFxK]:
+    """生成笔端点的 stFxK(只有端点才创建对象), left/extremal/right 与 Cal_LOWER/Cal_UPPER 一样指向独立K线"""
+    result = []
+    for p in nodes:
+        fx = fractals.to_objects(p, p + 1)[0]
+        c = int(fractals.comb[p])
+        fx.left, fx.extremal, fx.right = merged.to_objects(c - 1, c + 2)
+        result.append(fx)
+    return result
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+@file: c_stream.py
+@desc: 逐根K线增量计算缠论的 合并K线 → 分型 → 笔 → 段 → 中枢, 结果与 c_bi 中从头计算的结果一致.
+每输入一根K线只重算还没有确认的尾部:
+  1) 合并K线: 只有最后一根独立K线会变化
+  2) 分型: 倒数第二根独立K线上的分型, 右侧独立K线还会变化, invalid=True; 更早的分型 invalid=False, 不再变化
+  3) 笔: 笔的端点由 get_node 逐个向后查找, 查找过程只读到不再变化的区域时, 该端点确认;
+     以后只从最后一个确认的端点往后查找
+  4) 段: 确认的笔输入 SegmentEngine, 尾部的笔在检查点之后试算再回退; is_sure 的段不再变化
+  5) 中枢: 确认的笔(段)输入 PivotEngine, 尾部的笔(段)用 PivotEngine.trial 试算
+"""
+from typing import List, Optional, Sequence
+
+from common.model.kline import KLine, stCombineK, KSide, stFxK, stBiK, KExtreme, Segment, Pivot
+from common.chanlun.float_compare import EPSINON, sign_code
+from common.chanlun.c_bi import get_node, next_, generate_bi
+from common.chanlun.c_pivot import PivotEngine
+from common.chanlun.c_segment import SegmentEngine
+
+
+class _Reach(list):
+    """记录读到的最大下标的列表, 用来判断一次查找有没有读到还会变化的区域"""
+
+    def __init__(self):
+        super().__init__()
+        self.reach = -1
+
+    def __getitem__(self, i):
+        if isinstance(i, int):
+            pos = i if i >= 0 else i + len(self)
+            if pos > self.reach:
+                self.reach = pos
+        return super().__getitem__(i)
+
+
+class _Joined(Sequence):
+    """两个列表首尾相接的只读视图, 避免每根K线都拼接一次全部的笔"""
+
+    def __init__(self, head: list, tail: list):
+        self.head = head
+        self.tail = tail
+
+    def __len__(self):
+        return len(self.head) + len(self.tail)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        n = len(self.head)
+        return self.head[i] if i < n else self.tail[i - n]
+
+
+class ChanStream:
+    """
+    增量计算缠论的笔、段、中枢, 用法:
+        stream = ChanStream()
+        for k in klines:
+            stream.input(k)
+        stream.bi_list, stream.seg_list, stream.bi_pivots, stream.duan_pivots
+    输入的K线不会被修改. eps 为价格比较的容差, 按品种设置见 float_compare.tick_epsilon.
+    """
+
+    def __init__(self, eps: float = EPSINON):
+        self.eps = eps
+        self.klines: List[KLine] = []
+        self.combs: List[stCombineK] = []   # 独立K线, 与 cal_independent_klines 一致
+        self.fractals: List[stFxK] = _Reach()     # 按K线索引的分型, 与 Cal_Fx(Cal_LOWER, Cal_UPPER) 一致
+        self._merges: List[KLine] = _Reach()    # 按K线索引的合并后高低点, 同一独立K线共用一个对象
+        self._independents: List[int] = []     # K线索引 -> 独立K线索引, 与 get_independents 一致
+        # 笔
+        self._nodes: List[int] = []     # 确认的笔端点(K线索引)
+        self._sure_bis: List[stBiK] = []
+        self._tail_bis: List[stBiK] = []
+        # 段
+        self._seg_engine = SegmentEngine(self._merges, eps)
+        self._seg_list: List[Segment] = []
+        self._sure_seg_count = 0    # _seg_list 中前多少段已经确认
+        # 中枢
+        self._bi_pivot_engine = PivotEngine()
+        self._duan_pivot_engine = PivotEngine()
+        self._bi_pivots: List[Pivot] = []
+        self._duan_pivots: List[Pivot] = []
+
+    def extend(self, klines: List[KLine]):
+        for k in klines:
+            self.input(k)
+
+    def input(self, kline: KLine):
+        """输入一根新K线并更新全部结果"""
+        self.klines.append(kline)
+        index = len(self.klines) - 1
+        self.fractals.append(stFxK(index=index, side=KExtreme.NORMAL, low=0.0, high=0.0))
+        appended = self._merge(kline, index)
+        self._update_fractals(appended)
+        self._update_bi()
+        self._update_segments()
+        self._bi_pivots = self._update_pivots(self._bi_pivot_engine, _Joined(self._sure_bis, self._tail_bis),
+                                              len(self._sure_bis))
+        # 段中枢在去掉第一段的段列表上计算, 与 compute_duan_pivots(_NCHDUAN(...)) 一致
+        self._duan_pivots = self._update_pivots(self._duan_pivot_engine, self._seg_list, self._sure_seg_count)
+
+    @staticmethod
+    def _update_pivots(engine: PivotEngine, items: Sequence, sure: int) -> List[Pivot]:
+        """items 的前 sure 个已经确认, 输入 engine; 其余的试算"""
+        for i in range(engine.count, sure):
+            engine.push(items[i])
+        return engine.trial([items[i] for i in range(sure, len(items))])
+
+    @property
+    def bi_list(self) -> List[stBiK]:
+        """笔, 与 calculate_bi 一致"""
+        return self._sure_bis + self._tail_bis
+
+    @property
+    def merges(self) -> List[KLine]:
+        """按K线索引的合并后高低点, 可以传给 c_level.ChanLevels"""
+        return self._merges
+
+    @property
+    def sure_bi_count(self) -> int:
+        """bi_list 中前多少笔已经确认"""
+        return len(self._sure_bis)
+
+    @property
+    def seg_list(self) -> List[Segment]:
+        """段, 与 _NCHDUAN 一致(去掉第一段)"""
+        return self._seg_list
+
+    @property
+    def bi_pivots(self) -> List[Pivot]:
+        return self._bi_pivots
+
+    @property
+    def duan_pivots(self) -> List[Pivot]:
+        return self._duan_pivots
+
+    def _frontier(self) -> int:
+        """K线索引小于它的分型和合并高低点不会再变化"""
+        return self.combs[-2].pos_begin if len(self.combs) >= 2 else 0
+
+    def _merge(self, kline: KLine, index: int) -> bool:
+        """合并K线, 与 _Cal_MERGE 一致; 新增独立K线时返回True"""
+        combs = self.combs
+        if not combs:
+            self._new_comb(stCombineK(kline.low, kline.high, index, index, index, KSide.DOWN))
+            return True
+        last = combs[-1]    # _Cal_MERGE 中的 pPrev 与 pLast 的高低点和位置总是相同
+        low, high = kline.low, kline.high
+        dh, dl = sign_code(high - last.range_high, self.eps), sign_code(low - last.range_low, self.eps)
+        if dh == 1 and dl == 1:
+            self._new_comb(stCombineK(low, high, index, index, index, KSide.UP))
+            return True
+        if dh == -1 and dl == -1:
+            self._new_comb(stCombineK(low, high, index, index, index, KSide.DOWN))
+            return True
+
+        right = dh == 1 or dl == -1
+        if index == 1:      # 第二根K线不分方向
+            if right:
+                self._contains(last.range_low, high, index, index)
+            else:
+                self._contains(low, last.range_high, last.pos_begin, index)
+        elif right:
+            if last.isUp == KSide.UP:
+                pos_index = last.pos_extreme if dh == 0 else index
+                self._contains(last.range_low, high, pos_index, index)
+            else:
+                pos_index = last.pos_extreme if dl == 0 else index
+                self._contains(low, last.range_high, pos_index, index)
+        else:
+            pos_index = last.pos_begin if last.pos_begin == last.pos_end else last.pos_extreme
+            if last.isUp == KSide.UP:
+                self._contains(low, last.range_high, pos_index, index)
+            else:
+                self._contains(last.range_low, high, pos_index, index)
+        return False
+
+    def _new_comb(self, comb: stCombineK):
+        self.combs.append(comb)
+        self._merges.append(KLine(high=comb.range_high, low=comb.range_low))
+        self._independents.append(len(self.combs) - 1)
+
+    def _contains(self, low: float, high: float, pos_extreme: int, pos_end: int):
+        last = self.combs[-1]
+        last.range_low, last.range_high = low, high
+        last.pos_extreme, last.pos_end = pos_extreme, pos_end
+        merged = self._merges[last.pos_begin]
+        merged.low, merged.high = low, high
+        self._merges.append(merged)
+        self._independents.append(len(self.combs) - 1)
+
+    def _update_fractals(self, appended: bool):
+        n = len(self.combs)
+        if appended and n >= 4:
+            fx = self.fractals[self.combs[-3].pos_extreme]
+            fx.invalid = False  # 右侧的独立K线已经固定
+        if n >= 3:
+            self._set_fractal(n - 2)
+
+    def _set_fractal(self, c: int):
+        """判断第 c 根独立K线是否是顶底分型, 与 Cal_LOWER/Cal_UPPER 一致"""
+        prev, cur, nxt = self.combs[c - 1], self.combs[c], self.combs[c + 1]
+        side = KExtreme.NORMAL
+        eps = self.eps
+        codes = {sign_code(cur.range_high - prev.range_high, eps), sign_code(cur.range_high - nxt.range_high, eps),
+                 sign_code(cur.range_low - prev.range_low, eps), sign_code(cur.range_low - nxt.range_low, eps)}
+        if codes == {-1}:
+            side = KExtreme.BOTTOM
+        elif codes == {1}:
+            side = KExtreme.TOP
+        index = cur.pos_extreme
+        if side == KExtreme.NORMAL:
+            if self.fractals[index].side != KExtreme.NORMAL:
+                self.fractals[index] = stFxK(index=index, side=KExtreme.NORMAL, low=0.0, high=0.0)
+            return
+        fx = stFxK(index=index, side=side, low=cur.range_low, high=cur.range_high)
+        fx.left, fx.right, fx.extremal = prev, nxt, cur
+        self.fractals[index] = fx
+
+    def _update_bi(self):
+        """从最后一个确认的端点往后走 calculate_bi 的查找"""
+        temp, merges = self.fractals, self._merges
+        frontier = self._frontier()
+        nodes = self._nodes
+        if not nodes:
+            first = next_(0, temp)
+            if first < 0:
+                self._tail_bis = []
+                return
+            if first < frontier:
+                nodes.append(first)
+            tail = [first] if first >= frontier else []
+        else:
+            tail = []
+        node = nodes[-1] if nodes else tail[0]
+        sure = bool(nodes) and not tail
+        last: Optional[stFxK] = None
+        while True:
+            temp.reach = merges.reach = -1
+            right = get_node(node, temp, merges, self._independents)
+            if right < 0:
+                if right < -1:
+                    last = temp[-right]
+                break
+            if sure and max(temp.reach, merges.reach) < frontier:
+                self._sure_bis.extend(generate_bi([temp[node], temp[right]]))
+                nodes.append(right)
+            else:
+                sure = False
+                tail.append(right)
+            node = right
+
+        if len(nodes) + len(tail) == 1:
+            # calculate_bi 中第一个端点没有找到下一个端点时, 只保留末尾返回的分型, 不成笔
+            self._tail_bis = []
+            return
+        fxs = [temp[i] for i in nodes[-1:] + tail]
+        if last is not None:
+            fxs.append(last)
+        self._tail_bis = generate_bi(fxs)
+
+    def _update_segments(self):
+        """确认的笔输入段的状态机, 尾部的笔输入后取出结果再回退"""
+        engine = self._seg_engine
+        engine.extend(self._sure_bis[engine.bi_count:])
+        # 段列表去掉了第一段, 确认的段也少一个
+        self._sure_seg_count = max(len(engine.sure_segments) - 1, 0)
+        self._seg_list = engine.trial(self._tail_bis)
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 from enum import Enum
+from typing import Optional, Sequence
+
+import numpy as np
 
 
 EPSINON = 0.00001
+TICK_EPSILON_RATIO = 0.1    # 按最小变动价位设置容差时, 容差为最小变动价位的比例
 
 def equ_than_0(f):
     return -EPSINON <= f <= EPSINON
@@ -29,6 +33,36 @@ def float_true(f):
     return not equ_than_0(f)
 
 
+def tick_epsilon(tick_size: Optional[float]) -> float:
+    """
+    按品种的最小变动价位得到价格比较的容差, 没有最小变动价位时为 EPSINON.
+    价格的差总是最小变动价位的整数倍, 取它的一部分作为容差, 只吸收浮点误差.
+    """
+    if not tick_size or tick_size <= 0:
+        return EPSINON
+    return tick_size * TICK_EPSILON_RATIO
+
+
+def sign_code(f: float, eps: float = EPSINON) -> int:
+    """符号码: greater_than_0 为 1, less_than_0 为 -1, equ_than_0 为 0"""
+    return 1 if f > eps else (-1 if f < -eps else 0)
+
+
+def sign_codes(diff: Sequence[float], eps: float = EPSINON) -> np.ndarray:
+    """一次算出一组差值的符号码(int8), 与逐个 sign_code 相同"""
+    diff = np.asarray(diff, dtype=np.float64)
+    return (diff > eps).astype(np.int8) - (diff < -eps).astype(np.int8)
+
+
+def diff_signs(values: Sequence[float], eps: float = EPSINON) -> np.ndarray:
+    """
+    相邻两个值的差的符号码, 第 i 个为 sign_code(values[i+1] - values[i]), 长度比 values 少1.
+    a - b 与 -(b - a) 的浮点结果相同, 所以 sign_code(values[i] - values[i+1]) 就是 -第 i 个.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return sign_codes(values[1:] - values[:-1], eps)
+
+
 class Trait(Enum):
     NEWLY = 11
     OLDEN = 12
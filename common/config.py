@@ -35,6 +35,7 @@ PICKLE_QUOTE_BQ_KEY = "bq"  # 经纪人队列保存为pickle的特殊名称，
 SQLITE_DB_NAME = os.path.join(work_path, "db/dztec.db")  # 共享的sqlite数据库文件
 CONF_PATH = os.path.join(work_path, "conf")
 TMP_PATH = os.path.join(work_path, "data/tmp")
+KLINE_CACHE_PATH = os.path.join(work_path, "data/kline_cache")  # K线二进制缓存目录(按导出文件生成.npy)
 
 # redis key 和 mq的routing_key一样 (mq输出因子calc.output.exchange交换机 对应的routing_key)
 REDIS_MQ_STOCK_FACTOR_OPEN_HK = "stock_factor_open_hk"      # 港股盘中因子
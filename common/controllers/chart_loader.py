@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台加载 - 切换品种时在 QThreadPool 中读取文件和计算算法, 不阻塞界面线程
+分两步通知界面: 先发K线(candles_loaded), 算法结果算完后再发叠加层(overlays_loaded).
+每次切换生成新的代次(generation), 旧任务在各个检查点发现代次已变就直接退出.
+"""
+import logging
+from typing import Any, Callable, Dict
+from PySide6 import QtCore
+from common.services.chart_service import ChartService
+
+
+class ChartLoadSignals(QtCore.QObject):
+    """后台任务的信号(QRunnable 不是 QObject, 不能直接定义信号)"""
+    candles_loaded = QtCore.Signal(int, dict)   # (代次, 只有K线的图表数据)
+    overlays_loaded = QtCore.Signal(int, dict)  # (代次, 带算法结果的图表数据)
+    failed = QtCore.Signal(int, str)            # (代次, 错误信息)
+
+
+class ChartLoadTask(QtCore.QRunnable):
+    """加载一个品种的图表数据并计算算法"""
+
+    def __init__(self, generation: int, is_current: Callable[[int], bool], chart_service: ChartService,
+                 config: Dict[str, Any], file_name: str):
+        """
+        Args:
+            generation: 本次加载的代次
+            is_current: 判断代次是否仍是最新的(用户又切换了品种时返回False)
+            chart_service: 图表服务
+            config: 图表配置(调用方复制的副本, 任务里会改写其中的文件名)
+            file_name: 要加载的文件名
+        """
+        super().__init__()
+        self.generation = generation
+        self.is_current = is_current
+        self.chart_service = chart_service
+        self.config = config
+        self.file_name = file_name
+        self.signals = ChartLoadSignals()
+        self.logger = logging.getLogger(__name__)
+
+    def _cancelled(self) -> bool:
+        return not self.is_current(self.generation)
+
+    def run(self):
+        try:
+            if self._cancelled():
+                return
+            chart_data = self.chart_service.update_chart_file(self.config, self.file_name)
+            if self._cancelled():
+                return
+            self.signals.candles_loaded.emit(self.generation, chart_data)
+
+            # 在副本上计算算法, 已经交给界面的K线数据不再改动
+            klines = self.chart_service.build_klines(chart_data)
+            overlay_data = self.chart_service.clone_chart_data(chart_data)
+            self.chart_service.apply_algorithms_to_data(klines, overlay_data, self._cancelled,
+                                                        self.chart_service.chart_epsilon(self.config))
+            if self._cancelled():
+                self.logger.info(f"加载已取消: {self.file_name}")
+                return
+            self.signals.overlays_loaded.emit(self.generation, overlay_data)
+        except Exception as e:
+            self.logger.error(f"后台加载失败: {self.file_name}, 错误: {str(e)}")
+            self.signals.failed.emit(self.generation, str(e))
@@ -4,12 +4,17 @@
 控制器层 - 协调UI和业务逻辑
 实现MVC模式中的Controller角色
 """
+import os
+import copy
 import logging
+import functools
 from typing import Dict, List, Any, Optional
 from PySide6 import QtCore
 from common.services.data_service import DataService, StockInfo
 from common.services.algorithm_service import AlgorithmService
 from common.services.chart_service import ChartService
+from common.services.prefetch_service import PrefetchService
+from common.controllers.chart_loader import ChartLoadTask
 from common.klinechart.chart.object import PlotIndex, PlotItemInfo
 from common.model.kline import KLine
 
@@ -19,6 +24,9 @@ class MainController(QtCore.QObject):
     
     # 定义信号
     data_loaded = QtCore.Signal(dict)  # 数据加载完成信号
+    candles_loaded = QtCore.Signal(dict)   # 后台切换品种: K线已加载(算法结果稍后)
+    overlays_loaded = QtCore.Signal(dict)  # 后台切换品种: 算法结果已计算
+    history_loaded = QtCore.Signal(dict, int)  # 向前翻页: 新的图表数据, 左边新加载的K线数
     chart_updated = QtCore.Signal()    # 图表更新信号
     error_occurred = QtCore.Signal(str)  # 错误发生信号
     
@@ -37,6 +45,24 @@ class MainController(QtCore.QObject):
         self._stock_list: List[StockInfo] = []
         self._current_chart_data: Optional[Dict[PlotIndex, PlotItemInfo]] = None
         
+        # 后台加载: 每次切换品种代次加1, 旧代次的结果丢弃
+        self._thread_pool = QtCore.QThreadPool(self)
+        self._thread_pool.setMaxThreadCount(2)     # 旧任务退出前新任务也能开始
+        self._load_generation = 0
+        self._load_task: Optional[ChartLoadTask] = None
+        self._load_stock: Optional[StockInfo] = None
+        self._loading = False   # 后台切换品种还没送达算法结果
+        
+        # 预取键盘精灵中相邻候选的数据
+        self.prefetch_service = PrefetchService.from_conf(config.get("conf", {}), self._prefetch_load,
+                                                          stamp=self._file_stamp)
+        self._candidates: List[str] = []    # 最近一次搜索结果的文件名(按显示顺序)
+        
+        # 盘中跟读: 每隔 follow_seconds 秒读取导出文件新追加的K线, 0表示关闭
+        self._follow_timer = QtCore.QTimer(self)
+        self._follow_timer.timeout.connect(self.poll_data)
+        self._follow_seconds = config.get("conf", {}).get("follow_seconds", 0)
+        
         # 连接信号
         self._connect_signals()
     
@@ -54,6 +80,9 @@ class MainController(QtCore.QObject):
             # 加载初始图表数据
             self._load_initial_chart_data()
             
+            if self._follow_seconds and self._follow_seconds > 0:
+                self._follow_timer.start(int(self._follow_seconds * 1000))
+            
             self.logger.info("控制器初始化完成")
             
         except Exception as e:
@@ -73,6 +102,7 @@ class MainController(QtCore.QObject):
     def _load_initial_chart_data(self):
         """加载初始图表数据"""
         try:
+            self.chart_service.start_follow(self.config)
             chart_data = self.chart_service.load_chart_data(self.config)
             self._current_chart_data = chart_data
             self.data_loaded.emit(chart_data)
@@ -82,7 +112,7 @@ class MainController(QtCore.QObject):
     
     def switch_stock(self, stock_code: str):
         """
-        切换股票
+        切换股票, 在后台线程加载, 先显示K线再显示算法结果
         
         Args:
             stock_code: 股票代码
@@ -93,22 +123,93 @@ class MainController(QtCore.QObject):
                 self.error_occurred.emit(f"未找到股票: {stock_code}")
                 return
             
-            # 更新图表数据
-            chart_data = self.chart_service.update_chart_file(self.config, stock_info.file_name)
-            self._current_chart_data = chart_data
+            # 取消还在排队或计算中的上一次加载
+            self._load_generation += 1
+            self._thread_pool.clear()
             
-            # 发送信号通知UI更新
-            self.data_loaded.emit(chart_data)
+            self._loading = False
+            config = copy.deepcopy(self.config)
+            self.chart_service.set_chart_file(config, stock_info.file_name)
+            self.chart_service.start_follow(config)     # 先定位跟读位置再加载, 之间追加的K线下次跟读时读到
+            cached = self.prefetch_service.get(stock_info.file_name)
+            if cached:
+                # 已预取: 直接从内存显示
+                self.chart_service.set_chart_file(self.config, stock_info.file_name)
+                self._load_stock = stock_info
+                self._current_chart_data = cached
+                self.overlays_loaded.emit(cached)
+                self.main_window.setWindowTitle(f"{stock_code} - {stock_info.name}")
+                self.logger.info(f"切换到股票(预取): {stock_code} - {stock_info.name}")
+                self.prefetch_service.prefetch_around(self._candidates, stock_info.file_name)
+                return
             
-            # 更新窗口标题
-            self.main_window.setWindowTitle(f"{stock_code} - {stock_info.name}")
+            task = ChartLoadTask(self._load_generation, self._is_current_load, self.chart_service,
+                                 config, stock_info.file_name)
+            task.signals.candles_loaded.connect(self._on_candles_loaded)
+            task.signals.overlays_loaded.connect(self._on_overlays_loaded)
+            task.signals.failed.connect(self._on_load_failed)
+            self._load_task = task
+            self._load_stock = stock_info
+            self._loading = True
+            self._thread_pool.start(task)
             
-            self.logger.info(f"切换到股票: {stock_code} - {stock_info.name}")
+            self.logger.info(f"开始切换股票: {stock_code} - {stock_info.name}")
             
         except Exception as e:
             self.logger.error(f"切换股票失败: {stock_code}, 错误: {str(e)}")
             self.error_occurred.emit(f"切换股票失败: {str(e)}")
     
+    def _is_current_load(self, generation: int) -> bool:
+        """后台任务检查自己是否仍是最新的一次加载"""
+        return generation == self._load_generation
+    
+    def _on_candles_loaded(self, generation: int, chart_data: dict):
+        """后台任务: K线已加载(界面线程)"""
+        if not self._is_current_load(generation):
+            return
+        self.config = self._load_task.config
+        self._current_chart_data = chart_data
+        self.candles_loaded.emit(chart_data)
+        
+        # 更新窗口标题
+        stock_info = self._load_stock
+        self.main_window.setWindowTitle(f"{stock_info.code} - {stock_info.name}")
+        self.logger.info(f"切换到股票: {stock_info.code} - {stock_info.name}")
+    
+    def _on_overlays_loaded(self, generation: int, chart_data: dict):
+        """后台任务: 算法结果已计算(界面线程)"""
+        if not self._is_current_load(generation):
+            return
+        self._loading = False
+        self._current_chart_data = chart_data
+        self.overlays_loaded.emit(chart_data)
+        file_name = self._load_stock.file_name
+        try:
+            self.prefetch_service.put(file_name, chart_data, self._file_stamp(file_name))  # 翻回来时直接显示
+        except OSError:
+            pass
+        self.prefetch_service.prefetch_around(self._candidates, file_name)
+    
+    def _prefetch_load(self, file_name: str) -> Dict[PlotIndex, PlotItemInfo]:
+        """预取线程中加载并计算一个品种"""
+        return self.chart_service.load_chart_with_algorithms(copy.deepcopy(self.config), file_name)
+    
+    def _file_stamp(self, file_name: str) -> int:
+        """文件的mtime, 文件被重新导出后预取的数据作废"""
+        base_path = self.config.get("conf", {}).get("base_path", "")
+        return os.stat(os.path.join(base_path, file_name)).st_mtime_ns
+    
+    def shutdown(self):
+        """窗口关闭时调用: 停止预取线程和盘中跟读, 正在进行的后台加载结果丢弃"""
+        self._load_generation += 1
+        self._follow_timer.stop()
+        self.prefetch_service.shutdown()
+    
+    def _on_load_failed(self, generation: int, error_message: str):
+        if self._is_current_load(generation):
+            self._loading = False
+            self.error_occurred.emit(f"切换股票失败: {error_message}")
+    
     def search_stocks(self, keyword: str) -> List[StockInfo]:
         """
         搜索股票
@@ -120,7 +221,9 @@ class MainController(QtCore.QObject):
             匹配的股票列表
         """
         try:
-            return self.data_service.search_stocks(self._stock_list, keyword)
+            results = self.data_service.search_stocks(self._stock_list, keyword)
+            self._candidates = [stock.file_name for stock in results]
+            return results
         except Exception as e:
             self.logger.error(f"搜索股票失败: {keyword}, 错误: {str(e)}")
             return []
@@ -135,7 +238,8 @@ class MainController(QtCore.QObject):
             if self._current_chart_data:
                 # 重新计算算法
                 klines = self._extract_klines_from_chart_data(self._current_chart_data)
-                self.chart_service.apply_algorithms_to_data(klines, self._current_chart_data)
+                self.chart_service.apply_algorithms_to_data(klines, self._current_chart_data,
+                                                            eps=self.price_epsilon())
                 
                 # 通知UI更新
                 self.chart_updated.emit()
@@ -144,11 +248,40 @@ class MainController(QtCore.QObject):
             self.logger.error(f"刷新数据失败: {str(e)}")
             self.error_occurred.emit(f"刷新数据失败: {str(e)}")
     
+    def price_epsilon(self) -> float:
+        """当前品种的价格比较容差(配置中的最小变动价位)"""
+        return self.chart_service.chart_epsilon(self.config)
+    
+    def poll_data(self):
+        """盘中跟读(定时器): 导出文件有新的K线时更新图表, 后台切换品种还没完成时留到下一次"""
+        if not self._current_chart_data or self._loading:
+            return
+        try:
+            chart_data = self.chart_service.poll_chart_data(self.config, self._current_chart_data)
+            if chart_data:
+                self._current_chart_data = chart_data
+                self.data_loaded.emit(chart_data)
+        except Exception as e:
+            self.logger.error(f"盘中跟读失败: {str(e)}")
+    
+    def load_history(self):
+        """向前翻页: 图表已经移到最左边时, 加载更早的K线(后台切换品种还没完成时不加载)"""
+        if not self._current_chart_data or self._loading:
+            return
+        try:
+            chart_data, count = self.chart_service.load_history(self.config, self._current_chart_data)
+            if not count:
+                self.logger.info("没有更早的K线")
+                return
+            self._current_chart_data = chart_data
+            self.history_loaded.emit(chart_data, count)
+        except Exception as e:
+            self.logger.error(f"向前加载K线失败: {str(e)}")
+            self.error_occurred.emit(f"向前加载K线失败: {str(e)}")
+    
     def _extract_klines_from_chart_data(self, chart_data: Dict[PlotIndex, PlotItemInfo]) -> List[KLine]:
         """从图表数据中提取K线数据"""
-        # 这里需要根据实际的数据结构来实现
-        # 目前返回空列表作为占位符
-        return []
+        return self.chart_service.build_klines(chart_data)
     
     def get_current_chart_data(self) -> Optional[Dict[PlotIndex, PlotItemInfo]]:
         """获取当前图表数据"""
@@ -176,23 +309,32 @@ class ChartController(QtCore.QObject):
         self.chart_service = chart_service
         self.logger = logging.getLogger(__name__)
     
-    def update_chart_data(self, chart_data: Dict[PlotIndex, PlotItemInfo]):
+    def update_chart_data(self, chart_data: Dict[PlotIndex, PlotItemInfo], apply_algorithms: bool = True,
+                          eps: Optional[float] = None, prepended: int = 0):
         """
         更新图表数据
         
         Args:
             chart_data: 图表数据
+            apply_algorithms: 是否在界面线程计算算法, 后台已经算好(或稍后送达)时为False
+            eps: 价格比较的容差(见 MainController.price_epsilon)
+            prepended: 向前翻页时左边新加的K线数, 大于0时保持原来的显示位置, 否则移到最右边
         """
         try:
+            right_ix = self.chart_widget.get_right_ix()
+            
             # 清空现有数据
             self.chart_widget.clear_all()
             
             # 更新数据
             self.chart_widget.update_all_history_data(
                 chart_data, 
-                self._algorithm_callback
+                functools.partial(self._algorithm_callback, eps=eps) if apply_algorithms else None
             )
             
+            if prepended > 0:
+                self.chart_widget.move_to_ix(right_ix + prepended)
+            
             # 更新视图
             self.update_view()
             
@@ -214,10 +356,11 @@ class ChartController(QtCore.QObject):
         except Exception as e:
             self.logger.error(f"更新图表视图失败: {str(e)}")
     
-    def _algorithm_callback(self, klines: List[KLine], data: Dict[PlotIndex, PlotItemInfo]):
+    def _algorithm_callback(self, klines: List[KLine], data: Dict[PlotIndex, PlotItemInfo],
+                            eps: Optional[float] = None):
         """算法回调函数"""
         try:
-            self.chart_service.apply_algorithms_to_data(klines, data)
+            self.chart_service.apply_algorithms_to_data(klines, data, eps=eps)
         except Exception as e:
             self.logger.error(f"算法回调执行失败: {str(e)}")
     
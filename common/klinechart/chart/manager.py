@@ -5,7 +5,7 @@ from typing import Dict, Tuple, List
 import numpy as np
 import pandas as pd
 
-from .object import PlotItemInfo, TIndex
+from .object import PlotItemInfo, TIndex, bar_rows
 from .object import PlotIndex, ItemIndex, ChartItemInfo, MinMaxIdxTuple, MinMaxPriceTuple
 
 from .base import to_int
@@ -116,7 +116,7 @@ class BarManager:
         for info in chart_items.values():
             if not info.bars:
                 continue
-            bar_list = list(info.bars.values())[min_ix:max_ix + 1]
+            bar_list = bar_rows(info.bars, min_ix, max_ix + 1)
 
             if info.type == "Arrow":    # 对于 "Arrow" 和 "Straight" 类型，跳过不处理。
                 continue  # 对于画箭头型的，大小不在区域范围内
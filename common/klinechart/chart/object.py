@@ -2,8 +2,9 @@
 Basic data structure used for general trading function in the trading platform.
 """
 from __future__ import annotations
+from collections.abc import Mapping
 from datetime import datetime
-from typing import List, Dict, NewType, Tuple
+from typing import List, Dict, NewType, Tuple, Optional
 from enum import Enum
 
 
@@ -42,6 +43,11 @@ class DataItem(list):
         self.extend(arr)
         return self
 
+    def init_values(self, values):
+        """直接使用已解析好的值, 如[datetime, 开, 高, 低, 收, 量]"""
+        self.extend(values)
+        return self
+
     def init_line(self, lines):
         arr = [lines[i] if i > 0 else datetime.strptime(lines[0], "%Y-%m-%d %H:%M:%S") for i in
                range(0, len(lines))]
@@ -49,6 +55,57 @@ class DataItem(list):
         return self
 
 
+class LazyBarDict(Mapping):
+    """
+    按时间索引的K线, 与 Dict[datetime, DataItem] 用法相同.
+    值按列保存(开, 高, 低, 收, 量), 取某一根时才生成 DataItem 并缓存, 界面只画可见的K线, 加载时不为每根K线建对象.
+    """
+
+    def __init__(self, times: List[datetime], columns: List[list]):
+        self._times = times
+        self._columns = columns
+        self._index: Dict[datetime, int] = dict(zip(times, range(len(times))))
+        self._items: Dict[datetime, DataItem] = {}
+
+    def __getitem__(self, dt: datetime) -> DataItem:
+        item = self._items.get(dt)
+        if item is None:
+            i = self._index[dt]
+            item = self._items[dt] = DataItem().init_values([dt] + [column[i] for column in self._columns])
+        return item
+
+    def __contains__(self, dt) -> bool:
+        return dt in self._index
+
+    def __iter__(self):
+        return iter(self._times)
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def rows(self, begin: int = 0, end: Optional[int] = None) -> List[list]:
+        """第 begin 到 end 根K线的值([datetime, 开, 高, 低, 收, 量]), 不生成 DataItem"""
+        return [list(row) for row in zip(self._times[begin:end], *(column[begin:end] for column in self._columns))]
+
+
+def bar_rows(bars: Dict[datetime, DataItem], begin: int = 0, end: Optional[int] = None) -> List[list]:
+    """按顺序取第 begin 到 end 根K线的值, LazyBarDict 不生成 DataItem"""
+    if isinstance(bars, LazyBarDict):
+        return bars.rows(begin, end)
+    return list(bars.values())[begin:end]
+
+
+def join_bars(*parts: Dict[datetime, DataItem]) -> LazyBarDict:
+    """
+    按顺序拼接几段K线(向前翻页、盘中追加), 时间相同的K线以后一段为准(盘中最后一根K线的修正),
+    返回新的 LazyBarDict, 原来的几段不变(可能仍在界面中使用)
+    """
+    rows: Dict[datetime, list] = {}
+    for bars in parts:
+        for row in bar_rows(bars):
+            rows[row[0]] = row
+    columns = [list(column) for column in zip(*rows.values())][1:] if rows else [[] for _ in range(5)]
+    return LazyBarDict(list(rows), columns)
 
 
 BarList : List[DataItem] = {}
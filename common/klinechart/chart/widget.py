@@ -7,7 +7,7 @@ from PySide6.QtWidgets import QMessageBox
 showMessage = QMessageBox.question
 
 from PySide6 import QtGui, QtWidgets, QtCore
-from .object import PlotIndex, ItemIndex, PlotItemInfo
+from .object import PlotIndex, ItemIndex, PlotItemInfo, bar_rows
 from .manager import BarManager
 from .base import (
     GREY_COLOR, WHITE_COLOR, CURSOR_COLOR, BLACK_COLOR,
@@ -33,6 +33,8 @@ class ChartWidget(pg.PlotWidget):
     MIN_BAR_COUNT = 5   # 最小K线数
     NORMAL_BAR_COUNT = 100  # 默认显示的K线数
 
+    history_requested = QtCore.Signal()     # 已经移到最左边还在向左移: 请求加载更早的K线
+
     def __init__(self, parent: QtWidgets.QWidget = None):
         """"""
         super().__init__(None)
@@ -214,7 +216,7 @@ class ChartWidget(pg.PlotWidget):
         """
         设置历史数据
         """
-        self.manager.update_history_klines(datas[PlotIndex(0)][ItemIndex(0)].bars.values())
+        self.manager.update_history_klines(bar_rows(datas[PlotIndex(0)][ItemIndex(0)].bars))
         if funcs is not None:
             funcs(self.manager.klines, datas)
         for plot_index, charts in self._plot_charts_dict.items():
@@ -323,6 +325,8 @@ class ChartWidget(pg.PlotWidget):
         """
         Move chart to left.
         """
+        if self._right_ix <= self._bar_count:
+            self.history_requested.emit()
         self._right_ix -= 1
         self._right_ix = max(self._right_ix, self._bar_count)
 
@@ -361,6 +365,18 @@ class ChartWidget(pg.PlotWidget):
         self._update_x_range(align_type=EAlignType.center)
         self._cursor.update_lefttop_info()
 
+    def get_right_ix(self) -> float:
+        """最右边K线的数据索引"""
+        return self._right_ix
+
+    def move_to_ix(self, right_ix: float) -> None:
+        """
+        Move chart so that the bar at right_ix is the most right one.
+        """
+        self._right_ix = min(max(right_ix, self._bar_count), self.manager.get_count())
+        self._update_x_range()
+        self._cursor.update_lefttop_info()
+
     def move_to_right_most(self) -> None:
         """
         Move chart to the most right.
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+@file: kline_columns.py
+@desc: 缠论各步结果(独立K线、分型、笔、段、中枢)的列式容器
+每个字段是一个定长类型的 NumPy 数组, 比每个元素一个 __dict__ 对象省内存, 也可以直接保存为 npz.
+按下标取到的是只读的 __slots__ 视图, 属性名与 kline.py 中对应的类相同, 需要原来的对象时用 to_objects 转换.
+分型只保存顶和底, 不像 Cal_LOWER/Cal_UPPER 那样每根K线一个对象.
+"""
+import os
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from common.model.kline import stCombineK, stFxK, stBiK, Segment, Pivot, KSide, KExtreme
+
+
+def _column(name: str, cast: Callable):
+    """视图上的只读属性, 读取容器中 name 列的第 i 个值"""
+    def get(self):
+        return cast(getattr(self._cols, name)[self._i])
+    return property(get)
+
+
+def _side(v) -> KSide:
+    return KSide(int(v))
+
+
+def _extreme(v) -> KExtreme:
+    return KExtreme(int(v))
+
+
+class _View:
+    __slots__ = ("_cols", "_i")
+
+    def __init__(self, cols: "_Columns", i: int):
+        self._cols = cols
+        self._i = i
+
+    def __repr__(self):
+        return str(self.to_object())
+
+    def to_object(self):
+        return self._cols.to_objects(self._i, self._i + 1)[0]
+
+
+class _Columns:
+    """列式容器的基类, FIELDS 为 (列名, 类型) 的元组"""
+    FIELDS: Tuple[Tuple[str, str], ...] = ()
+    VIEW = _View
+
+    def __init__(self, **columns):
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.ascontiguousarray(columns.get(name, ()), dtype=dtype))
+
+    def __len__(self):
+        return len(getattr(self, self.FIELDS[0][0]))
+
+    def __getitem__(self, i: int):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return self.VIEW(self, i)
+
+    def __iter__(self):
+        return (self.VIEW(self, i) for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name, _ in self.FIELDS)
+
+    def to_dict(self, prefix: str = "") -> Dict[str, np.ndarray]:
+        return {prefix + name: getattr(self, name) for name, _ in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, arrays, prefix: str = ""):
+        return cls(**{name: arrays[prefix + name] for name, _ in cls.FIELDS})
+
+    @classmethod
+    def _from_rows(cls, rows: list):
+        """rows 为按 FIELDS 顺序排列的元组列表"""
+        cols = list(zip(*rows)) if rows else [()] * len(cls.FIELDS)
+        return cls(**{name: col for (name, _), col in zip(cls.FIELDS, cols)})
+
+    def _rows(self, begin: int, end: Optional[int]) -> zip:
+        return zip(*(getattr(self, name)[begin:end].tolist() for name, _ in self.FIELDS))
+
+    def to_objects(self, begin: int = 0, end: Optional[int] = None) -> list:
+        raise NotImplementedError
+
+
+class CombineView(_View):
+    __slots__ = ()
+    range_low = _column("low", float)
+    range_high = _column("high", float)
+    pos_begin = _column("begin", int)
+    pos_end = _column("end", int)
+    pos_extreme = _column("extreme", int)
+    isUp = _column("direction", _side)
+
+
+class MergedPrice(NamedTuple):
+    """合并后K线的高低点(只读), 属性名与 KLine 相同, 可以代替 KLine 传给 satisfy_the_number、_NCHDUAN 等"""
+    low: float
+    high: float
+
+
+class MergedBars(_Columns):
+    """独立K线, 第 i 个元素对应 _Cal_MERGE 返回的第 i 个 stCombineK"""
+    FIELDS = (("low", "f8"),        # range_low
+              ("high", "f8"),       # range_high
+              ("begin", "i4"),      # pos_begin
+              ("end", "i4"),        # pos_end
+              ("extreme", "i4"),    # pos_extreme
+              ("direction", "i1"))  # isUp 的值(1 向上, -1 向下)
+    VIEW = CombineView
+
+    @classmethod
+    def from_objects(cls, combs: List[stCombineK]) -> "MergedBars":
+        return cls._from_rows([(c.range_low, c.range_high, c.pos_begin, c.pos_end, c.pos_extreme, c.isUp.value)
+                               for c in combs])
+
+    def to_objects(self, begin: int = 0, end: Optional[int] = None) -> List[stCombineK]:
+        return [stCombineK(low, high, b, e, x, KSide(d)) for low, high, b, e, x, d in self._rows(begin, end)]
+
+    def to_combs(self) -> List[stCombineK]:
+        """转为 stCombineK 列表"""
+        return self.to_objects()
+
+    def independent_index(self) -> np.ndarray:
+        """
+        K线索引 -> 所在独立K线索引(int32), 长度为K线根数, 代替 get_independents 的字典.
+        它也是独立K线个数的前缀和减1: K线 b 到 e 之间的独立K线数为 index[e] - index[b] + 1.
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.end - self.begin + 1)
+
+    def merged_prices(self) -> List[MergedPrice]:
+        """
+        按K线索引的合并后高低点, 同一独立K线的K线共用一个只读的 MergedPrice.
+        代替把高低点写回输入K线的做法, 输入的K线不会被修改.
+        """
+        prices = [MergedPrice(low, high) for low, high in zip(self.low.tolist(), self.high.tolist())]
+        return [prices[i] for i in self.independent_index().tolist()]
+
+
+class FractalView(_View):
+    __slots__ = ()
+    index = _column("index", int)
+    side = _column("side", _extreme)
+    lowest = _column("low", float)
+    highest = _column("high", float)
+    invalid = _column("invalid", bool)
+    comb = _column("comb", int)
+
+
+class FractalColumns(_Columns):
+    """顶底分型(按K线索引排序), 不保存非顶非底的K线"""
+    FIELDS = (("index", "i4"),      # K线索引
+              ("side", "i1"),       # KExtreme 的值(1 顶, -1 底)
+              ("low", "f8"),        # lowest
+              ("high", "f8"),       # highest
+              ("invalid", "?"),     # 是否还不完整
+              ("comb", "i4"))       # 所在独立K线的索引, 由对象转换时未知, 为-1
+    VIEW = FractalView
+
+    @classmethod
+    def from_objects(cls, fractals: List[stFxK]) -> "FractalColumns":
+        """由按K线索引的分型列表(例如 Cal_Fx 的结果)生成, 只保留顶和底"""
+        return cls._from_rows([(f.index, f.side.value, f.lowest, f.highest, f.invalid, -1)
+                               for f in fractals if f.side != KExtreme.NORMAL])
+
+    @classmethod
+    def from_lower_upper(cls, lower: List[stFxK], upper: List[stFxK]) -> "FractalColumns":
+        """由 Cal_LOWER 和 Cal_UPPER 的结果生成, 同一根K线以顶分型为准(与 Cal_Fx 一致)"""
+        return cls.from_objects([u if u.side != KExtreme.NORMAL else low for low, u in zip(lower, upper)])
+
+    def to_objects(self, begin: int = 0, end: Optional[int] = None) -> List[stFxK]:
+        result = []
+        for index, side, low, high, invalid, _ in self._rows(begin, end):
+            fx = stFxK(index=index, side=KExtreme(side), low=low, high=high)
+            fx.invalid = invalid
+            result.append(fx)
+        return result
+
+    def to_dense(self, size: int) -> List[stFxK]:
+        """转为每根K线一个 stFxK 的列表(非顶非底的为 NORMAL), 与 Cal_Fx 的结果格式相同"""
+        dense = [stFxK(index=i, side=KExtreme.NORMAL, low=0.0, high=0.0) for i in range(size)]
+        for fx in self.to_objects():
+            dense[fx.index] = fx
+        return dense
+
+    def find(self, index: int) -> int:
+        """K线索引为 index 的分型的序号, 没有时返回-1"""
+        pos = int(np.searchsorted(self.index, index))
+        return pos if pos < len(self) and self.index[pos] == index else -1
+
+
+class BiView(_View):
+    __slots__ = ()
+    pos_begin = _column("pos_begin", int)
+    pos_end = _column("pos_end", int)
+    side = _column("side", _side)
+    lowest = _column("lowest", float)
+    highest = _column("highest", float)
+    top_index = _column("top", int)
+    bottom_index = _column("bottom", int)
+
+
+class BiColumns(_Columns):
+    """笔"""
+    FIELDS = (("pos_begin", "i4"),
+              ("pos_end", "i4"),
+              ("side", "i1"),       # KSide 的值
+              ("lowest", "f8"),
+              ("highest", "f8"),
+              ("top", "i4"),        # 顶分型的K线索引
+              ("bottom", "i4"))     # 底分型的K线索引
+    VIEW = BiView
+
+    @classmethod
+    def from_objects(cls, bis: List[stBiK]) -> "BiColumns":
+        return cls._from_rows([(b.pos_begin, b.pos_end, b.side.value, b.lowest, b.highest,
+                                b.top.index if b.top is not None else -1,
+                                b.bottom.index if b.bottom is not None else -1) for b in bis])
+
+    def to_objects(self, begin: int = 0, end: Optional[int] = None,
+                   fractals: Optional[FractalColumns] = None) -> List[stBiK]:
+        """fractals 不为空时, 由其中的分型还原笔的 top/bottom"""
+        result = []
+        for pos_begin, pos_end, side, lowest, highest, top, bottom in self._rows(begin, end):
+            bi = stBiK()
+            bi.pos_begin, bi.pos_end, bi.side = pos_begin, pos_end, KSide(side)
+            bi.lowest, bi.highest = lowest, highest
+            if fractals is not None:
+                bi.top, bi.bottom = self._fractal(fractals, top), self._fractal(fractals, bottom)
+            result.append(bi)
+        return result
+
+    @staticmethod
+    def _fractal(fractals: FractalColumns, index: int) -> Optional[stFxK]:
+        pos = fractals.find(index)
+        return fractals.to_objects(pos, pos + 1)[0] if pos >= 0 else None
+
+
+class SegmentView(_View):
+    __slots__ = ()
+    pos_begin = _column("pos_begin", int)
+    pos_end = _column("pos_end", int)
+    start_index = _column("start_index", int)
+    end_index = _column("end_index", int)
+    highest = _column("highest", float)
+    lowest = _column("lowest", float)
+    side = _column("side", _side)
+    up = _column("up", bool)
+    is_sure = _column("is_sure", bool)
+
+
+class SegmentColumns(_Columns):
+    """段"""
+    FIELDS = (("pos_begin", "i4"),
+              ("pos_end", "i4"),
+              ("start_index", "i4"),
+              ("end_index", "i4"),
+              ("highest", "f8"),
+              ("lowest", "f8"),
+              ("side", "i1"),       # KSide 的值
+              ("up", "?"),
+              ("is_sure", "?"))
+    VIEW = SegmentView
+
+    @classmethod
+    def from_objects(cls, segs: List[Segment]) -> "SegmentColumns":
+        return cls._from_rows([(s.pos_begin, s.pos_end, s.start_index, s.end_index, s.highest, s.lowest,
+                                s.side.value, getattr(s, "up", False), s.is_sure) for s in segs])
+
+    def to_objects(self, begin: int = 0, end: Optional[int] = None) -> List[Segment]:
+        result = []
+        for pos_begin, pos_end, start_index, end_index, highest, lowest, side, up, is_sure in self._rows(begin, end):
+            seg = Segment()
+            seg.pos_begin, seg.pos_end, seg.start_index, seg.end_index = pos_begin, pos_end, start_index, end_index
+            seg.highest, seg.lowest, seg.side, seg.is_sure = highest, lowest, KSide(side), is_sure
+            seg.up = up
+            result.append(seg)
+        return result
+
+
+class PivotView(_View):
+    __slots__ = ()
+    up = _column("up", bool)
+    bg_pos_index = _column("bg_pos_index", int)
+    ed_pos_index = _column("ed_pos_index", int)
+    highly_value = _column("highly_value", float)
+    lowly_value = _column("lowly_value", float)
+
+
+class PivotColumns(_Columns):
+    """中枢"""
+    FIELDS = (("up", "?"),
+              ("bg_pos_index", "i4"),
+              ("ed_pos_index", "i4"),
+              ("highly_value", "f8"),
+              ("lowly_value", "f8"))
+    VIEW = PivotView
+
+    @classmethod
+    def from_objects(cls, pivots: List[Pivot]) -> "PivotColumns":
+        return cls._from_rows([(p.up, p.bg_pos_index, p.ed_pos_index, p.highly_value, p.lowly_value)
+                               for p in pivots])
+
+    def to_objects(self, begin: int = 0, end: Optional[int] = None) -> List[Pivot]:
+        result = []
+        for up, bg_pos_index, ed_pos_index, highly_value, lowly_value in self._rows(begin, end):
+            pivot = Pivot()
+            pivot.up, pivot.bg_pos_index, pivot.ed_pos_index = up, bg_pos_index, ed_pos_index
+            pivot.highly_value, pivot.lowly_value = highly_value, lowly_value
+            result.append(pivot)
+        return result
+
+
+_CLASSES = {cls.__name__: cls for cls in (MergedBars, FractalColumns, BiColumns, SegmentColumns, PivotColumns)}
+
+
+def save_columns(file_path: str, stages: Dict[str, _Columns]):
+    """把多个容器保存到一个 npz 文件中, 键为 "阶段名/列名"(先写临时文件再替换)"""
+    arrays = {}
+    for stage, cols in stages.items():
+        arrays[f"{stage}/__class__"] = np.array(type(cols).__name__)
+        arrays.update(cols.to_dict(f"{stage}/"))
+    # 临时文件按进程和线程区分, 线程池中可能同时保存同一个文件
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, file_path)
+
+
+def load_columns(file_path: str) -> Dict[str, _Columns]:
+    """读取 save_columns 保存的文件"""
+    stages = {}
+    with np.load(file_path, allow_pickle=False) as data:
+        for key in data.files:
+            if key.endswith("/__class__"):
+                stage = key[:-len("/__class__")]
+                stages[stage] = _CLASSES[str(data[key])].from_dict(data, f"{stage}/")
+    return stages
@@ -4,12 +4,24 @@
 算法服务层 - 负责所有算法计算
 将算法逻辑从UI层分离出来
 """
+import inspect
 import logging
 from typing import Dict, List, Any, Optional, Callable, Union
 from abc import ABC, abstractmethod
 from common.model.kline import KLine
 
 
+def call_algorithm(func: Callable, klines: List[KLine], eps: Optional[float] = None) -> Any:
+    """调用回调函数, 只给有 eps 参数的函数(缠论结构的回调)传入价格比较的容差"""
+    if eps is not None:
+        try:
+            if "eps" in inspect.signature(func).parameters:
+                return func(klines, eps=eps)
+        except (TypeError, ValueError):     # 取不到签名的内置函数
+            pass
+    return func(klines)
+
+
 class AlgorithmInterface(ABC):
     """算法接口"""
     
@@ -111,13 +123,14 @@ class AlgorithmService:
             self.logger.error(f"算法 {algorithm_name} 计算失败: {str(e)}")
             raise
     
-    def calculate_by_function_name(self, func_name: str, data: List[KLine]) -> Any:
+    def calculate_by_function_name(self, func_name: str, data: List[KLine], eps: Optional[float] = None) -> Any:
         """
         通过函数名计算算法（兼容旧代码）
         
         Args:
             func_name: 函数名称
             data: 输入数据
+            eps: 价格比较的容差(见 chart_service.price_epsilon), None 时用函数的默认值
             
         Returns:
             算法计算结果
@@ -133,7 +146,7 @@ class AlgorithmService:
                 raise ValueError(f"未找到函数: {func_name}")
         
         try:
-            result = func(data)
+            result = call_algorithm(func, data, eps)
             self.logger.debug(f"函数 {func_name} 计算完成")
             return result
         except Exception as e:
@@ -167,6 +180,14 @@ class AlgorithmService:
             except ImportError:
                 pass
             
+            # 尝试从图表回调模块导入(配置中 func_name 指向的 fn_calc_* 函数)
+            try:
+                module = importlib.import_module('common.callback.call_back')
+                if hasattr(module, func_name):
+                    return getattr(module, func_name)
+            except ImportError:
+                pass
+            
             # 可以添加更多的导入路径
             return None
             
@@ -4,13 +4,49 @@
 图表服务层 - 负责图表数据处理和管理
 将图表逻辑从UI层分离出来
 """
+import copy
 import logging
-from typing import Dict, List, Any, Optional
+import re
+import threading
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from datetime import datetime
 from common.services.data_service import DataService
 from common.services.algorithm_service import AlgorithmService
-from common.klinechart.chart.object import ChartItemInfo, PlotIndex, ItemIndex, PlotItemInfo
+from common.klinechart.chart.object import ChartItemInfo, PlotIndex, ItemIndex, PlotItemInfo, bar_rows, join_bars
 from common.model.kline import KLine
+from common.chanlun.c_pipeline import bind_stream
+from common.chanlun.c_stream import ChanStream
+from common.chanlun.float_compare import tick_epsilon
+from common.utils.kline_resample import parse_period
+
+PRODUCT_PATTERN = re.compile(r'^(?:\d+#)?([A-Za-z]+?)L\d*\.txt$')    # 28#SRL9.txt、SRL9.txt -> SR
+
+
+def product_code(file_name: str) -> str:
+    """由通达信导出的文件名取品种代码(大写), 取不到时为空串"""
+    match = PRODUCT_PATTERN.match(file_name or "")
+    return match.group(1).upper() if match else ""
+
+
+def price_epsilon(conf: Dict[str, Any], file_name: str) -> float:
+    """
+    价格比较的容差: 配置中按品种代码的最小变动价位(tick_sizes)优先, 其次为 tick_size,
+    都没有时为 EPSINON(见 float_compare.tick_epsilon)
+    """
+    tick_sizes = {str(code).upper(): size for code, size in (conf.get("tick_sizes") or {}).items()}
+    tick_size = tick_sizes.get(product_code(file_name), conf.get("tick_size"))
+    return tick_epsilon(float(tick_size) if tick_size else None)
+
+
+def bars_to_klines(bars) -> List[KLine]:
+    """由K线的 Bar 字典值([datetime, 开, 高, 低, 收, 量, ...])生成算法使用的KLine列表, 与 BarManager.update_history_klines 一致"""
+    klines: List[KLine] = []
+    for v in bars:
+        k = KLine()
+        k.time = v[0].timestamp()
+        k.open, k.high, k.low, k.close, k.volume = v[1], v[2], v[3], v[4], v[5]
+        klines.append(k)
+    return klines
 
 
 class ChartDataProcessor:
@@ -77,7 +113,13 @@ class ChartDataProcessor:
             
             # 使用数据服务加载数据
             file_path = f'{base_path}/{file_name}'
-            data_list = self.data_service.load_kline_data(file_path, kline_count, start_dt, end_dt)
+            period = item.get("period")
+            if period:
+                # 由源文件合成的周期(如 15、"60m"、"day"), 多个窗格不必各自导出
+                data_list = self.data_service.load_timeframe(file_path, parse_period(period), kline_count,
+                                                             start_dt, end_dt)
+            else:
+                data_list = self.data_service.load_kline_data(file_path, kline_count, start_dt, end_dt)
             
             # 转换为Bar字典
             item_info.bars = self.data_service.convert_to_bars(data_list, item_info.data_type)
@@ -86,13 +128,16 @@ class ChartDataProcessor:
         
         return item_info
     
-    def apply_algorithms(self, klines: List[KLine], data: Dict[PlotIndex, PlotItemInfo]):
+    def apply_algorithms(self, klines: List[KLine], data: Dict[PlotIndex, PlotItemInfo],
+                         is_cancelled: Optional[Callable[[], bool]] = None, eps: Optional[float] = None):
         """
         应用算法到图表数据
         
         Args:
             klines: K线数据
             data: 图表数据
+            is_cancelled: 在后台线程计算时, 每个算法前检查是否已被取消
+            eps: 价格比较的容差(见 price_epsilon), 传给缠论结构的回调
         """
         # 首先计算基础算法（如zigzag）
         self._calculate_base_algorithms(klines)
@@ -103,7 +148,9 @@ class ChartDataProcessor:
             for item_index in plot_item_info:
                 info: ChartItemInfo = plot_item_info[item_index]
                 if not info.bars and info.func_name:
-                    self._apply_item_algorithm(info, klines)
+                    if is_cancelled and is_cancelled():
+                        return
+                    self._apply_item_algorithm(info, klines, eps)
     
     def _calculate_base_algorithms(self, klines: List[KLine]):
         """计算基础算法"""
@@ -113,22 +160,23 @@ class ChartDataProcessor:
         except Exception as e:
             self.logger.warning(f"基础算法计算失败: {str(e)}")
     
-    def _apply_item_algorithm(self, info: ChartItemInfo, klines: List[KLine]):
+    def _apply_item_algorithm(self, info: ChartItemInfo, klines: List[KLine], eps: Optional[float] = None):
         """
         为单个图表项应用算法
         
         Args:
             info: 图表项信息
             klines: K线数据
+            eps: 价格比较的容差
         """
         try:
             if info.type == "Straight":
                 # 直线类型使用discrete_list
-                result = self.algorithm_service.calculate_by_function_name(info.func_name, klines)
+                result = self.algorithm_service.calculate_by_function_name(info.func_name, klines, eps)
                 info.discrete_list = result
             else:
                 # 其他类型使用bars
-                result = self.algorithm_service.calculate_by_function_name(info.func_name, klines)
+                result = self.algorithm_service.calculate_by_function_name(info.func_name, klines, eps)
                 info.bars = result
                 
         except Exception as e:
@@ -143,6 +191,9 @@ class ChartService:
         self.algorithm_service = algorithm_service
         self.processor = ChartDataProcessor(data_service, algorithm_service)
         self.logger = logging.getLogger(__name__)
+        # 盘中跟读: 主图文件路径 -> 增量计算笔、段、中枢的 ChanStream, 每次只输入新追加的K线
+        self._streams: Dict[str, ChanStream] = {}
+        self._stream_lock = threading.Lock()    # 预取、后台加载的线程也会调用 apply_algorithms_to_data
     
     def load_chart_data(self, config: Dict[str, Any]) -> Dict[PlotIndex, PlotItemInfo]:
         """
@@ -161,19 +212,187 @@ class ChartService:
             return {}
     
     def apply_algorithms_to_data(self, klines: List[KLine], 
-                                data: Dict[PlotIndex, PlotItemInfo]):
+                                data: Dict[PlotIndex, PlotItemInfo],
+                                is_cancelled: Optional[Callable[[], bool]] = None,
+                                eps: Optional[float] = None):
         """
         对图表数据应用算法
         
         Args:
             klines: K线数据
             data: 图表数据
+            is_cancelled: 是否已被取消(后台计算时使用)
+            eps: 价格比较的容差(见 chart_epsilon)
         """
         try:
-            self.processor.apply_algorithms(klines, data)
+            with self._stream_lock:
+                # 盘中跟读的K线: 笔、段、中枢的回调(get_pipeline)取 ChanStream 的结果
+                for stream in self._streams.values():
+                    if bind_stream(klines, stream):
+                        break
+            self.processor.apply_algorithms(klines, data, is_cancelled, eps)
         except Exception as e:
             self.logger.error(f"应用算法失败: {str(e)}")
     
+    def chart_epsilon(self, config: Dict[str, Any]) -> float:
+        """主图K线品种的价格比较容差(见 price_epsilon)"""
+        try:
+            file_name = config["plots"][0]["chart_item"][0].get("file_name", "")
+        except (KeyError, IndexError, TypeError):
+            file_name = ""
+        return price_epsilon(config.get("conf") or {}, file_name)
+    
+    def build_klines(self, data: Dict[PlotIndex, PlotItemInfo]) -> List[KLine]:
+        """
+        由主图第一个图表项(K线)生成算法使用的KLine列表
+        
+        Args:
+            data: 图表数据
+            
+        Returns:
+            K线列表
+        """
+        if not data or not data.get(PlotIndex(0)) or ItemIndex(0) not in data[PlotIndex(0)]:
+            return []
+        return bars_to_klines(bar_rows(data[PlotIndex(0)][ItemIndex(0)].bars))
+    
+    def clone_chart_data(self, data: Dict[PlotIndex, PlotItemInfo]) -> Dict[PlotIndex, PlotItemInfo]:
+        """
+        复制图表数据的结构(每个 ChartItemInfo 浅拷贝, bars 共享),
+        后台线程在副本上写算法结果, 不会改动已经交给界面的对象
+        """
+        return {plot_index: {item_index: copy.copy(info) for item_index, info in items.items()}
+                for plot_index, items in data.items()}
+    
+    def extend_chart_data(self, data: Dict[PlotIndex, PlotItemInfo],
+                          bars: Dict[Tuple[PlotIndex, ItemIndex], Dict]) -> Dict[PlotIndex, PlotItemInfo]:
+        """
+        替换部分图表项的K线(向前翻页、盘中追加后的K线), 返回新的图表数据, 原数据不变.
+        有 func_name 的图表项清空, 由 apply_algorithms_to_data 按新的K线重新计算
+        
+        Args:
+            data: 图表数据
+            bars: {(plot_index, item_index): 新的K线}
+            
+        Returns:
+            新的图表数据
+        """
+        result = self.clone_chart_data(data)
+        for plot_index, items in result.items():
+            for item_index, info in items.items():
+                if (plot_index, item_index) in bars:
+                    info.bars = bars[(plot_index, item_index)]
+                elif info.func_name:
+                    info.bars, info.discrete_list = {}, []
+        return result
+    
+    def load_history(self, config: Dict[str, Any],
+                     data: Dict[PlotIndex, PlotItemInfo]) -> Tuple[Optional[Dict[PlotIndex, PlotItemInfo]], int]:
+        """
+        向前翻页: 在主图K线左边再加载 kline_count 根更早的K线(只读需要的行, 见 file_txt.read_bars_before)
+        
+        Args:
+            config: 图表配置
+            data: 当前图表数据
+            
+        Returns:
+            (新的图表数据, 新加载的K线数), 没有更早的K线时为 (None, 0)
+        """
+        conf = config.get("conf", {})
+        item = config["plots"][0]["chart_item"][0]
+        bars = data[PlotIndex(0)][ItemIndex(0)].bars if data and data.get(PlotIndex(0)) else None
+        if not bars or not item.get("file_name") or item.get("period"):   # 合成的周期没有对应的文本行
+            return None, 0
+        file_path = f'{conf.get("base_path", "")}/{item["file_name"]}'
+        data_list = self.data_service.load_more_kline_data(file_path, next(iter(bars)),
+                                                           conf.get("kline_count") or 1000)
+        older = self.data_service.convert_to_bars(data_list, item.get("data_type", []))
+        if not older:
+            return None, 0
+        joined = join_bars(older, bars)
+        return self.extend_chart_data(data, {(PlotIndex(0), ItemIndex(0)): joined}), len(joined) - len(bars)
+    
+    def _followed_items(self, config: Dict[str, Any]) -> List[Tuple[Tuple[PlotIndex, ItemIndex], str, Dict[str, Any]]]:
+        """盘中跟读的图表项: [((plot_index, item_index), 文件路径, 图表项配置)], 为主图K线和由源文件合成周期的图表项"""
+        base_path = config.get("conf", {}).get("base_path", "")
+        items = []
+        for plot_index, plot in enumerate(config.get("plots", [])):
+            for item_index, item in enumerate(plot.get("chart_item", [])):
+                if not item.get("file_name") or not (item.get("period") or plot_index == item_index == 0):
+                    continue
+                items.append(((PlotIndex(plot_index), ItemIndex(item_index)), f'{base_path}/{item["file_name"]}', item))
+        return items
+    
+    def start_follow(self, config: Dict[str, Any]):
+        """
+        开始盘中跟读图表的文件(跟读位置放到当前文件尾), 须在加载图表数据之前调用
+        
+        Args:
+            config: 图表配置(已经设置好文件名)
+        """
+        for file_path in dict.fromkeys(file_path for _, file_path, _ in self._followed_items(config)):
+            self.data_service.follow_kline_data(file_path)
+        with self._stream_lock:
+            self._streams.clear()   # 换了品种, 第一次跟读到新K线时重新输入
+    
+    def poll_chart_data(self, config: Dict[str, Any],
+                        data: Dict[PlotIndex, PlotItemInfo]) -> Optional[Dict[PlotIndex, PlotItemInfo]]:
+        """
+        盘中增量: 读取跟读的文件新追加的K线(只读新增的字节), 拼接到对应图表项的末尾;
+        合成周期的图表项由 DataService.update_timeframes 更新最后一根或新增合成K线;
+        主图K线同时输入该文件的 ChanStream(见 _feed_stream)
+        
+        Args:
+            config: 图表配置
+            data: 当前图表数据
+            
+        Returns:
+            新的图表数据(算法结果已清空), 没有新K线时为None
+        """
+        lines: Dict[str, List[str]] = {}
+        changed: Dict[str, Dict[int, Any]] = {}     # 文件路径 -> {周期: 有变化的合成K线}
+        bars = {}
+        for (plot_index, item_index), file_path, item in self._followed_items(config):
+            if file_path not in lines:
+                lines[file_path] = self.data_service.poll_kline_data(file_path)
+            if not lines[file_path]:
+                continue
+            period = item.get("period")
+            if period:
+                # 新的1分钟K线输入合成器, 只重算各周期的最后一根; 每个文件只输入一次
+                if file_path not in changed:
+                    changed[file_path] = self.data_service.update_timeframes(file_path, lines[file_path])
+                rows = changed[file_path].get(parse_period(period))
+                if rows is None or not len(rows):
+                    continue
+                newer = self.data_service.convert_to_bars(rows, [])
+            else:
+                newer = self.data_service.convert_to_bars(lines[file_path], item.get("data_type", []))
+            older = data[plot_index][item_index].bars
+            bars[(plot_index, item_index)] = join_bars(older, newer)
+            if plot_index == item_index == 0:
+                self._feed_stream(file_path, older, newer, bars[(plot_index, item_index)], self.chart_epsilon(config))
+        if not bars:
+            return None
+        self.logger.info(f"盘中新增K线: {sum(len(v) for v in lines.values())} 行")
+        return self.extend_chart_data(data, bars)
+    
+    def _feed_stream(self, file_path: str, older, newer, joined, eps: float):
+        """
+        主图K线输入该文件的 ChanStream: 只在末尾追加了K线时输入新的K线;
+        第一次跟读到新K线、修正了最后一根、向前翻页过或容差变化时重新输入全部K线
+        """
+        with self._stream_lock:
+            stream = self._streams.get(file_path)
+            appended = len(joined) - len(older) == len(newer)
+            if (stream is None or stream.eps != eps or not appended or not older or len(stream.klines) != len(older)
+                    or stream.klines[0].time != next(iter(older)).timestamp()):
+                stream = self._streams[file_path] = ChanStream(eps)
+                stream.extend(bars_to_klines(bar_rows(joined)))
+                self.logger.info(f"盘中增量计算缠论结构: {file_path}, K线 {len(stream.klines)} 根")
+            else:
+                stream.extend(bars_to_klines(bar_rows(joined, len(older))))
+    
     def update_chart_file(self, config: Dict[str, Any], file_name: str) -> Dict[PlotIndex, PlotItemInfo]:
         """
         更新图表文件数据
@@ -186,10 +405,7 @@ class ChartService:
             更新后的图表数据
         """
         try:
-            # 更新配置中的文件名
-            if "plots" in config and len(config["plots"]) > 0:
-                if "chart_item" in config["plots"][0] and len(config["plots"][0]["chart_item"]) > 0:
-                    config["plots"][0]["chart_item"][0]["file_name"] = file_name
+            self.set_chart_file(config, file_name)
             
             # 重新加载数据
             return self.load_chart_data(config)
@@ -198,6 +414,27 @@ class ChartService:
             self.logger.error(f"更新图表文件失败: {file_name}, 错误: {str(e)}")
             return {}
     
+    def set_chart_file(self, config: Dict[str, Any], file_name: str):
+        """更新配置中主图K线的文件名"""
+        if "plots" in config and len(config["plots"]) > 0:
+            if "chart_item" in config["plots"][0] and len(config["plots"][0]["chart_item"]) > 0:
+                config["plots"][0]["chart_item"][0]["file_name"] = file_name
+    
+    def load_chart_with_algorithms(self, config: Dict[str, Any], file_name: str) -> Dict[PlotIndex, PlotItemInfo]:
+        """
+        加载文件并计算全部算法, 返回可以直接显示的图表数据(预取使用)
+        
+        Args:
+            config: 图表配置(会改写其中的文件名, 调用方传入副本)
+            file_name: 文件名
+            
+        Returns:
+            图表数据
+        """
+        chart_data = self.update_chart_file(config, file_name)
+        self.apply_algorithms_to_data(self.build_klines(chart_data), chart_data, eps=self.chart_epsilon(config))
+        return chart_data
+    
     def get_chart_types(self) -> List[str]:
         """获取支持的图表类型"""
         return [
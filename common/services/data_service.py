@@ -5,14 +5,19 @@
 将数据加载逻辑从UI层分离出来
 """
 import os
-import re
 import logging
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Union, Tuple
 from datetime import datetime
-from common.utils import file_txt
+import numpy as np
+from common.utils import file_txt, kline_cache, kline_parser, symbol_catalog
+from common.utils.kline_resample import BarResampler, DEFAULT_PERIODS
 from common.utils.pinyin_util import get_pinyin_first_letters
+from common.utils.stock_search import StockSearchIndex, DEFAULT_LIMIT
 from common.model.kline import KLine
-from common.klinechart.chart.object import DataItem
+from common.klinechart.chart.object import DataItem, LazyBarDict
 
 
 class StockInfo:
@@ -24,16 +29,44 @@ class StockInfo:
         self.file_name = file_name
 
 
+@dataclass
+class BatchLoadResult:
+    """批量加载结果, 单个文件失败不影响其他文件"""
+    stocks: List[StockInfo] = field(default_factory=list)      # 表头解析成功的股票(按文件名排序)
+    klines: Dict[str, Union[List[str], np.ndarray]] = field(default_factory=dict)  # 文件名 -> K线数据
+    errors: Dict[str, str] = field(default_factory=dict)       # 文件名 -> 错误信息
+
+
 class DataService:
     """数据服务 - 负责数据加载和管理"""
     
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         self.logger = logging.getLogger(__name__)
+        self._follower = file_txt.KLineFollower()
+        # 批量加载的线程数上限, 默认与 ThreadPoolExecutor 相同
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._search_index: Optional[StockSearchIndex] = None
+        # 多周期合成: 源文件路径 -> (源K线数组, BarResampler), 同一文件的各周期窗格共用
+        self._resamplers: Dict[str, Tuple[np.ndarray, BarResampler]] = {}
+        self._resample_lock = threading.Lock()
+    
+    def _load_kline(self, file_path: str, count: int, start_dt: str, end_dt: str) -> Union[List[str], np.ndarray]:
+        """优先从二进制缓存取数, 缓存不可用时读取文本; 读取文本失败时抛出异常"""
+        try:
+            data_array = kline_cache.tail_kline_array(file_path, count, start_dt, end_dt)
+            if data_array is not None:
+                self.logger.info(f"从缓存加载K线数据: {file_path}, 数量: {len(data_array)}")
+                return data_array
+        except Exception as e:
+            self.logger.warning(f"K线缓存不可用: {file_path}, 错误: {str(e)}")
+        data_list = file_txt.tail_kline(file_path, count, start_dt, end_dt)
+        self.logger.info(f"成功加载K线数据: {file_path}, 数量: {len(data_list)}")
+        return data_list
     
     def load_kline_data(self, file_path: str, count: int = 1000, 
-                       start_dt: str = "", end_dt: str = "") -> List[str]:
+                       start_dt: str = "", end_dt: str = "") -> Union[List[str], np.ndarray]:
         """
-        加载K线数据
+        加载K线数据, 优先使用二进制缓存(kline_cache), 缓存不可用时读取文本
         
         Args:
             file_path: 文件路径
@@ -42,28 +75,195 @@ class DataService:
             end_dt: 结束时间
             
         Returns:
-            K线数据列表
+            K线数据列表(文本行), 缓存命中时为结构化数组
         """
         try:
-            data_list = file_txt.tail_kline(file_path, count, start_dt, end_dt)
-            self.logger.info(f"成功加载K线数据: {file_path}, 数量: {len(data_list)}")
-            return data_list
+            return self._load_kline(file_path, count, start_dt, end_dt)
         except Exception as e:
             self.logger.error(f"加载K线数据失败: {file_path}, 错误: {str(e)}")
             return []
     
-    def convert_to_bars(self, data_list: List[str], data_type: List[str]) -> Dict[datetime, DataItem]:
+    def load_stocks_batch(self, base_path: str, count: int = 1000, start_dt: str = "", end_dt: str = "",
+                          file_names: Optional[List[str]] = None) -> BatchLoadResult:
+        """
+        批量加载: 在线程池中并行读取多个品种的表头和K线, 工作线程数不超过 max_workers
+        
+        Args:
+            base_path: 数据目录路径
+            count: 每个品种加载的K线数量, 为0时只读表头
+            start_dt: 开始时间
+            end_dt: 结束时间
+            file_names: 要加载的文件名, 为空时加载目录下全部品种文件
+            
+        Returns:
+            批量加载结果, 失败的文件记录在 errors 中
+        """
+        result = BatchLoadResult()
+        if file_names is None:
+            try:
+                file_names = self._list_stock_files(base_path)
+            except OSError as e:
+                result.errors[base_path] = str(e)
+                return result
+        
+        def load_one(file_name: str) -> Tuple[StockInfo, Union[List[str], np.ndarray]]:
+            file_path = os.path.join(base_path, file_name)
+            stock_info = self._read_stock_header(file_path, file_name)
+            data = self._load_kline(file_path, count, start_dt, end_dt) if count else []
+            return stock_info, data
+        
+        stocks: Dict[str, StockInfo] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="load") as pool:
+            futures = {pool.submit(load_one, name): name for name in dict.fromkeys(file_names)}
+            for future in as_completed(futures):
+                file_name = futures[future]
+                try:
+                    stock_info, data = future.result()
+                except Exception as e:
+                    result.errors[file_name] = str(e)
+                    self.logger.warning(f"批量加载失败: {file_name}, 错误: {str(e)}")
+                    continue
+                if stock_info:
+                    stocks[file_name] = stock_info
+                if count:
+                    result.klines[file_name] = data
+        result.stocks = [stocks[name] for name in sorted(stocks)]
+        self.logger.info(f"批量加载完成，成功 {len(stocks)} 个，失败 {len(result.errors)} 个")
+        return result
+    
+    def load_more_kline_data(self, file_path: str, before_dt: Union[str, datetime], count: int = 1800) -> List[str]:
+        """
+        向前翻页: 加载早于 before_dt(当前图表最左边K线的时间) 的 count 根K线
+        
+        Args:
+            file_path: 文件路径
+            before_dt: 已加载数据中最早的时间
+            count: 加载数量
+            
+        Returns:
+            K线数据列表(按时间顺序)
+        """
+        if isinstance(before_dt, datetime):
+            before_dt = before_dt.strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            data_list = file_txt.read_bars_before(file_path, before_dt, count)
+            self.logger.info(f"向前加载K线数据: {file_path}, {before_dt} 之前 {len(data_list)} 根")
+            return data_list
+        except Exception as e:
+            self.logger.error(f"向前加载K线数据失败: {file_path}, 错误: {str(e)}")
+            return []
+    
+    def follow_kline_data(self, file_path: str):
+        """
+        开始盘中跟读: 跟读位置放到当前文件尾. 在加载历史数据之前调用, 之后追加的K线由 poll_kline_data 读取
+        
+        Args:
+            file_path: 文件路径
+        """
+        try:
+            self._follower.prime(file_path, 0)
+        except Exception as e:
+            self.logger.error(f"跟读K线数据失败: {file_path}, 错误: {str(e)}")
+    
+    def poll_kline_data(self, file_path: str) -> List[str]:
+        """
+        盘中增量读取: 返回上次调用以来导出文件新追加的K线行
+        没有 follow_kline_data 过的文件第一次调用只定位到文件尾, 返回空列表
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            新增的K线数据列表
+        """
+        try:
+            return self._follower.poll(file_path)
+        except Exception as e:
+            self.logger.error(f"增量读取K线数据失败: {file_path}, 错误: {str(e)}")
+            return []
+    
+    def _get_resampler(self, file_path: str, period: int) -> Optional[BarResampler]:
+        """源文件的多周期合成器; 源文件重新导出(缓存数组变化)或需要新的周期时重新合成"""
+        source = kline_cache.load_kline_array(file_path)
+        if source is None:
+            return None
+        with self._resample_lock:
+            entry = self._resamplers.get(file_path)
+            if entry is None or entry[0] is not source or period not in entry[1].periods:
+                periods = set(DEFAULT_PERIODS) | set(entry[1].periods if entry else ()) | {period}
+                entry = (source, BarResampler(source, sorted(periods)))
+                self._resamplers[file_path] = entry
+                self.logger.info(f"合成多周期K线: {file_path}, 源K线 {len(source)} 根")
+            return entry[1]
+
+    def load_timeframe(self, file_path: str, period: int, count: int = 1000,
+                       start_dt: str = "", end_dt: str = "") -> np.ndarray:
+        """
+        由源文件(1分钟K线)合成 period 周期的K线, 取数规则与 load_kline_data 相同.
+        文件只读取一次, 同一文件的多个周期窗格共用一次合成的结果
+        
+        Args:
+            file_path: 源文件路径
+            period: 周期(分钟数, 日线为 kline_resample.PERIOD_DAY)
+            count: 加载数量
+            start_dt: 开始时间
+            end_dt: 结束时间
+            
+        Returns:
+            合成K线的结构化数组, 失败时为空数组
+        """
+        try:
+            resampler = self._get_resampler(file_path, period)
+            if resampler is None:
+                self.logger.warning(f"不是通达信格式, 无法合成多周期K线: {file_path}")
+                return np.empty(0, dtype=kline_parser.KLINE_DTYPE)
+            data_array = kline_cache.slice_kline_array(resampler.bars(period), count, start_dt, end_dt)
+            self.logger.info(f"加载 {period} 周期合成K线: {file_path}, 数量: {len(data_array)}")
+            return data_array
+        except Exception as e:
+            self.logger.error(f"合成多周期K线失败: {file_path}, 周期: {period}, 错误: {str(e)}")
+            return np.empty(0, dtype=kline_parser.KLINE_DTYPE)
+    
+    def update_timeframes(self, file_path: str, data_list: List[str]) -> Dict[int, np.ndarray]:
+        """
+        盘中增量: 把 poll_kline_data 读到的新K线行输入源文件的合成器, 只重算各周期的最后一根合成K线
+        
+        Args:
+            file_path: 源文件路径
+            data_list: 新增的K线数据列表
+            
+        Returns:
+            {周期: 从第一根有变化的合成K线起的数组}, 没有合成过该文件时为空字典
+        """
+        with self._resample_lock:
+            entry = self._resamplers.get(file_path)
+            if entry is None or not data_list:
+                return {}
+            try:
+                return entry[1].append(kline_parser.parse_tdx_lines(data_list))
+            except Exception as e:
+                self.logger.error(f"增量合成多周期K线失败: {file_path}, 错误: {str(e)}")
+                return {}
+    
+    def convert_to_bars(self, data_list: Union[List[str], np.ndarray], data_type: List[str]) -> Dict[datetime, DataItem]:
         """
         将原始数据转换为Bar字典
         
         Args:
-            data_list: 原始数据列表
+            data_list: 原始数据列表, 或缓存返回的结构化数组
             data_type: 数据类型定义
             
         Returns:
-            Bar字典
+            Bar字典, 通达信K线为 LazyBarDict(取某一根时才生成 DataItem)
         """
         bar_dict: Dict[datetime, DataItem] = {}
+        if not isinstance(data_list, np.ndarray) and not data_type:
+            # 通达信格式文本行, 整块批量解析
+            parsed = kline_parser.parse_tdx_lines(data_list)
+            if len(parsed) == len(data_list):
+                data_list = parsed
+        if isinstance(data_list, np.ndarray):
+            return LazyBarDict(*kline_parser.to_bar_columns(data_list))
         for data_index, txt in enumerate(data_list):
             bar = DataItem(txt, data_type)
             if bar:
@@ -80,46 +280,27 @@ class DataService:
         Returns:
             股票信息列表
         """
-        stock_list = []
-        pattern = re.compile(r'^\d+#[^#]*L9\.txt$')
-        
         try:
-            for file_name in os.listdir(base_path):
-                if pattern.match(file_name):
-                    file_path = os.path.join(base_path, file_name)
-                    stock_info = self._parse_stock_file(file_path, file_name)
-                    if stock_info:
-                        stock_list.append(stock_info)
-            
-            self.logger.info(f"加载股票列表完成，共 {len(stock_list)} 只股票")
-            return stock_list
-            
+            # 品种目录缓存: 只对新增或修改过的文件读取表头
+            catalog = symbol_catalog.load_catalog(base_path, self.max_workers)
         except Exception as e:
             self.logger.error(f"加载股票列表失败: {str(e)}")
             return []
-    
-    def _parse_stock_file(self, file_path: str, file_name: str) -> Optional[StockInfo]:
-        """
-        解析股票文件获取股票信息
         
-        Args:
-            file_path: 文件完整路径
-            file_name: 文件名
-            
-        Returns:
-            股票信息对象
-        """
-        try:
-            with open(file_path, 'r', encoding='gb2312') as f:
-                first_line = f.readline().strip()
-                fields = first_line.split()
-                if len(fields) >= 2:
-                    code = fields[0].strip()
-                    name = fields[1].strip()
-                    pinyin = get_pinyin_first_letters(name)
-                    return StockInfo(code, name, pinyin, file_name)
-        except Exception as e:
-            self.logger.warning(f"解析股票文件失败: {file_path}, 错误: {str(e)}")
+        stock_list = [StockInfo(e.code, e.name, e.pinyin, e.file_name) for e in catalog]
+        self.logger.info(f"加载股票列表完成，共 {len(stock_list)} 只股票")
+        return stock_list
+    
+    def _list_stock_files(self, base_path: str) -> List[str]:
+        """目录下的品种文件名(xx#xxL9.txt)"""
+        return sorted(f for f in os.listdir(base_path) if symbol_catalog.STOCK_FILE_PATTERN.match(f))
+    
+    def _read_stock_header(self, file_path: str, file_name: str) -> Optional[StockInfo]:
+        """读取文件第一行的 代码 名称, 读取失败时抛出异常, 格式不符时返回None"""
+        header = symbol_catalog.read_header(file_path)
+        if header:
+            code, name = header
+            return StockInfo(code, name, get_pinyin_first_letters(name), file_name)
         return None
     
     def find_stock_by_code(self, stock_list: List[StockInfo], code: str) -> Optional[StockInfo]:
@@ -138,26 +319,19 @@ class DataService:
                 return stock
         return None
     
-    def search_stocks(self, stock_list: List[StockInfo], keyword: str) -> List[StockInfo]:
+    def search_stocks(self, stock_list: List[StockInfo], keyword: str, limit: int = DEFAULT_LIMIT) -> List[StockInfo]:
         """
-        搜索股票
+        搜索股票(代码、拼音首字母、名称的前缀或子串), 结果按匹配程度排序
         
         Args:
             stock_list: 股票列表
             keyword: 搜索关键词
+            limit: 最多返回的数量, <=0 表示不限
             
         Returns:
             匹配的股票列表
         """
-        keyword_upper = keyword.strip().upper()
-        if not keyword_upper:
-            return []
-        
-        matching_stocks = []
-        for stock in stock_list:
-            if (keyword_upper in stock.code or 
-                keyword_upper in stock.pinyin.upper() or
-                keyword_upper in stock.name):
-                matching_stocks.append(stock)
-        
-        return matching_stocks
\ No newline at end of file
+        if self._search_index is None or self._search_index.items is not stock_list:
+            # 股票列表变化时重建索引
+            self._search_index = StockSearchIndex(stock_list)
+        return self._search_index.search(keyword, limit)
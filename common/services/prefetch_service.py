@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预取服务 - 键盘精灵翻看品种时, 在后台线程提前加载相邻候选的K线和算法结果
+结果放在按内存预算限制的LRU中, 回车切换到已预取的品种时直接从内存显示.
+配置(yaml 的 conf 段):
+  prefetch_depth: 当前品种前后各预取几个候选, 0 表示关闭
+  prefetch_memory_mb: 预取缓存的内存预算(估算值)
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_PREFETCH_DEPTH = 2
+DEFAULT_PREFETCH_MEMORY_MB = 256
+BYTES_PER_ROW = 320     # 估算: 一根K线(DataItem + datetime键 + 字典槽位)或一条算法结果大约占用的字节数
+
+
+def estimate_chart_bytes(chart_data: Dict[Any, Dict[Any, Any]]) -> int:
+    """估算图表数据(Dict[PlotIndex, PlotItemInfo])占用的内存"""
+    rows = 0
+    for items in chart_data.values():
+        for info in items.values():
+            rows += len(info.bars or {}) + len(info.discrete_list or [])
+    return rows * BYTES_PER_ROW
+
+
+class PrefetchService:
+    """相邻候选的预取和LRU缓存"""
+
+    def __init__(self, loader: Callable[[str], Any], depth: int = DEFAULT_PREFETCH_DEPTH,
+                 memory_mb: float = DEFAULT_PREFETCH_MEMORY_MB,
+                 sizer: Callable[[Any], int] = estimate_chart_bytes,
+                 stamp: Optional[Callable[[str], Any]] = None):
+        """
+        Args:
+            loader: 在后台线程中调用, 由键(文件名)加载并计算出可以直接显示的数据
+            depth: 前后各预取几个候选
+            memory_mb: 缓存的内存预算
+            sizer: 估算一条缓存占用的字节数
+            stamp: 由键取数据版本(例如文件mtime), 版本变化的缓存作废; 为空时不检查
+        """
+        self.logger = logging.getLogger(__name__)
+        self.loader = loader
+        self.depth = max(int(depth), 0)
+        self.budget = int(float(memory_mb) * 1024 * 1024)
+        self.sizer = sizer
+        self.stamp = stamp
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[Any, int, Any]]" = OrderedDict()    # 键 -> (数据, 字节数, 版本)
+        self._used = 0
+        self._pending: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+    @classmethod
+    def from_conf(cls, conf: Dict[str, Any], loader: Callable[[str], Any], **kwargs) -> "PrefetchService":
+        """由 yaml 的 conf 段创建"""
+        return cls(loader,
+                   depth=conf.get("prefetch_depth", DEFAULT_PREFETCH_DEPTH),
+                   memory_mb=conf.get("prefetch_memory_mb", DEFAULT_PREFETCH_MEMORY_MB),
+                   **kwargs)
+
+    def get(self, key: str) -> Optional[Any]:
+        """取缓存, 命中时移到最近使用; 未命中或已过期返回None"""
+        stamp = self._stamp(key)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[2] != stamp:
+                self._drop(key)
+                return None
+            self._cache.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, data: Any, stamp: Any = None):
+        """放入缓存, 超出预算时淘汰最久未用的; 单条超过预算时不缓存"""
+        size = self.sizer(data)
+        if size > self.budget:
+            return
+        with self._lock:
+            if key in self._cache:
+                self._drop(key)
+            self._cache[key] = (data, size, stamp)
+            self._used += size
+            while self._used > self.budget and self._cache:
+                self._drop(next(iter(self._cache)))
+
+    def neighbours(self, keys: List[str], current: str) -> List[str]:
+        """当前键在候选列表中前后 depth 个键, 按 +1, -1, +2, -2 ... 的顺序"""
+        if current not in keys:
+            return keys[:self.depth]
+        pos = keys.index(current)
+        result = []
+        for step in range(1, self.depth + 1):
+            for i in (pos + step, pos - step):
+                if 0 <= i < len(keys):
+                    result.append(keys[i])
+        return result
+
+    def prefetch(self, keys: List[str]):
+        """
+        在后台按顺序加载 keys 中还没有缓存的项;
+        不在 keys 中的排队任务会被取消(已经开始的任务会完成并进入缓存)
+        """
+        if not self.depth:
+            return
+        with self._lock:
+            for key in list(self._pending):
+                if key not in keys and self._pending[key].cancel():
+                    del self._pending[key]
+            wanted = [k for k in keys if k not in self._pending and k not in self._cache]
+            for key in wanted:
+                self._pending[key] = self._executor.submit(self._load, key)
+
+    def prefetch_around(self, keys: List[str], current: str):
+        """预取当前键的相邻候选"""
+        self.prefetch(self.neighbours(keys, current))
+
+    def clear(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._cache.clear()
+            self._used = 0
+
+    def shutdown(self):
+        """停止预取(窗口关闭时调用), 之后的 prefetch 不再提交任务"""
+        self.depth = 0
+        self.clear()
+        self._executor.shutdown(wait=False)
+
+    def _load(self, key: str):
+        try:
+            stamp = self._stamp(key)
+            data = self.loader(key)
+            if data:
+                self.put(key, data, stamp)
+                self.logger.info(f"预取完成: {key}, 缓存 {len(self._cache)} 项, 约 {self._used // 1024 // 1024}MB")
+        except Exception as e:
+            self.logger.warning(f"预取失败: {key}, 错误: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _stamp(self, key: str) -> Any:
+        if self.stamp is None:
+            return None
+        try:
+            return self.stamp(key)
+        except OSError:
+            return None
+
+    def _drop(self, key: str):
+        _, size, _ = self._cache.pop(key)
+        self._used -= size
@@ -68,6 +68,10 @@ class RefactoredMainWindow(QtWidgets.QMainWindow):
         """连接信号和槽"""
         # 主控制器信号
         self.main_controller.data_loaded.connect(self._on_data_loaded)
+        self.main_controller.candles_loaded.connect(self._on_partial_data_loaded)
+        self.main_controller.overlays_loaded.connect(self._on_partial_data_loaded)
+        self.main_controller.history_loaded.connect(self._on_history_loaded)
+        self.chart_widget.history_requested.connect(self.main_controller.load_history)
         self.main_controller.error_occurred.connect(self._on_error_occurred)
         
         # 图表控制器信号
@@ -142,6 +146,11 @@ class RefactoredMainWindow(QtWidgets.QMainWindow):
         super().resizeEvent(event)
         self._update_keyboard_genie_position()
     
+    def closeEvent(self, event):
+        """窗口关闭事件: 停止后台预取"""
+        self.main_controller.shutdown()
+        super().closeEvent(event)
+    
     # 键盘精灵相关方法
     def _show_keyboard_genie(self, initial_text: str = ""):
         """显示键盘精灵"""
@@ -175,7 +184,16 @@ class RefactoredMainWindow(QtWidgets.QMainWindow):
     # 信号处理方法
     def _on_data_loaded(self, chart_data: Dict[PlotIndex, PlotItemInfo]):
         """数据加载完成处理"""
-        self.chart_controller.update_chart_data(chart_data)
+        self.chart_controller.update_chart_data(chart_data, eps=self.main_controller.price_epsilon())
+    
+    def _on_history_loaded(self, chart_data: Dict[PlotIndex, PlotItemInfo], count: int):
+        """向前翻页: 左边加了 count 根K线, 重新计算算法, 保持原来的显示位置"""
+        self.chart_controller.update_chart_data(chart_data, eps=self.main_controller.price_epsilon(),
+                                                prepended=count)
+    
+    def _on_partial_data_loaded(self, chart_data: Dict[PlotIndex, PlotItemInfo]):
+        """后台切换品种: 先K线后算法结果, 算法已在后台计算, 这里只刷新"""
+        self.chart_controller.update_chart_data(chart_data, apply_algorithms=False)
     
     def _on_error_occurred(self, error_message: str):
         """错误处理"""
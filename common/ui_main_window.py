@@ -1,18 +1,23 @@
-import os, sys, re
+import os, sys, copy, functools
+import numpy as np
+from typing import Optional
 from PySide6 import QtCore, QtWidgets
 if "PyQt5" in sys.modules:
     del sys.modules["PyQt5"]
 
 from common.klinechart.chart import ChartWidget, ChartVolume, ChartCandle, ChartMacd,\
     ChartArrow, ChartLine, ChartStraight, ChartSignal, ItemIndex, ChartShadow
-from common.klinechart.chart.object import DataItem
+from common.klinechart.chart.object import DataItem, LazyBarDict, bar_rows
 from common.klinechart.chart import PlotIndex, BarDict, PlotItemInfo, ChartItemInfo
-from common.utils import file_txt
+from common.utils import file_txt, kline_cache, kline_parser, symbol_catalog
 from common.algo.zigzag import OnCalculate
 from common.algo.weibi import get_weibi_list
 from common.callback.call_back import *
 from common.klinechart.chart.keyboard_genie_window import KeyboardGenieWindow
-from common.utils.pinyin_util import get_pinyin_first_letters
+from common.utils.stock_search import StockSearchIndex
+from common.services.chart_service import bars_to_klines, price_epsilon
+from common.services.algorithm_service import call_algorithm
+from common.services.prefetch_service import PrefetchService
 
 
 def calc_zig_zag(klines: List[KLine]):
@@ -20,7 +25,8 @@ def calc_zig_zag(klines: List[KLine]):
     return zig_zag
 
 
-def obtain_data_from_algo(klines: list[KLine], data: Dict[PlotIndex, PlotItemInfo]):
+def obtain_data_from_algo(klines: list[KLine], data: Dict[PlotIndex, PlotItemInfo], eps: Optional[float] = None):
+    """计算各图表项的回调, eps 为价格比较的容差(见 chart_service.price_epsilon), 只传给缠论结构的回调"""
     calc_zig_zag(klines)
     for plot_index in data.keys():
         plot_item_info:PlotItemInfo = data[plot_index]
@@ -28,9 +34,9 @@ def obtain_data_from_algo(klines: list[KLine], data: Dict[PlotIndex, PlotItemInf
             info: ChartItemInfo = plot_item_info[item_index]
             if not info.bars and info.func_name:
                 if info.type == "Straight":
-                    info.discrete_list = globals()[info.func_name](klines)
+                    info.discrete_list = call_algorithm(globals()[info.func_name], klines, eps)
                 else:
-                    info.bars = globals()[info.func_name](klines)
+                    info.bars = call_algorithm(globals()[info.func_name], klines, eps)
 
 
 def load_data_from_conf(conf: Dict[str, any]) -> Dict[PlotIndex, PlotItemInfo]:  # 从文件中读取数据
@@ -55,7 +61,9 @@ def load_data_from_conf(conf: Dict[str, any]) -> Dict[PlotIndex, PlotItemInfo]:
                 file_name = file_txt.find_first_file(file_name, file_list)
                 start_dt = conf["conf"]["start_dt"] if "start_dt" in conf["conf"] else ""
                 end_dt = conf["conf"]["end_dt"] if "end_dt" in conf["conf"] else ""
-                data_list = file_txt.tail_kline(f'{base_path}/{file_name}', kline_count, start_dt, end_dt)
+                data_list = kline_cache.tail_kline_array(f'{base_path}/{file_name}', kline_count, start_dt, end_dt)
+                if data_list is None:   # 不是通达信9列格式, 读取文本
+                    data_list = file_txt.tail_kline(f'{base_path}/{file_name}', kline_count, start_dt, end_dt)
             else:
                 data_list = []  # 否则直接返回空列表
             bar_dict: BarDict = calc_bars(data_list, item_info.data_type)
@@ -68,8 +76,27 @@ def load_data_from_conf(conf: Dict[str, any]) -> Dict[PlotIndex, PlotItemInfo]:
     return local_data
 
 
+def load_data_with_algo(conf: Dict[str, any]) -> Dict[PlotIndex, PlotItemInfo]:
+    """读取数据并计算全部算法, 返回可以直接显示的数据(预取线程中使用)"""
+    datas = load_data_from_conf(conf)
+    obtain_data_from_algo(bars_to_klines(bar_rows(datas[PlotIndex(0)][ItemIndex(0)].bars)), datas,
+                          conf_epsilon(conf))
+    return datas
+
+
+def conf_epsilon(conf: Dict[str, any]) -> float:
+    """主图K线品种的价格比较容差"""
+    return price_epsilon(conf.get("conf") or {}, conf["plots"][0]["chart_item"][0]["file_name"])
+
+
 def calc_bars(data_list, data_type: List[str]) -> BarDict:
     bar_dict: BarDict = {}
+    if not isinstance(data_list, np.ndarray) and not data_type:
+        parsed = kline_parser.parse_tdx_lines(data_list)   # 通达信格式, 整块批量解析
+        if len(parsed) == len(data_list):
+            data_list = parsed
+    if isinstance(data_list, np.ndarray):   # 来自二进制缓存或批量解析
+        return LazyBarDict(*kline_parser.to_bar_columns(data_list))     # 取某一根时才生成 DataItem
     for data_index, txt in enumerate(data_list):
         # logging.info(F"txt:{txt}")
         bar = DataItem(txt, data_type)
@@ -88,6 +115,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.widget.add_cursor()
 
+        # 预取键盘精灵中相邻候选的数据
+        self.prefetch = PrefetchService.from_conf(conf.get("conf", {}), self._prefetch_load, stamp=self._file_stamp)
+
         # datas: Dict[PlotIndex, PlotItemInfo] = load_data_from_conf(self.conf)
         # self.widget.update_all_history_data(datas, obtain_data_from_algo)
         self.load_data_from_file_name()
@@ -96,6 +126,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # 加载股票代码和名称列表
         self.code_name_list, self.code_file_dic = self.load_keyboard_sprite_data()
+        self.search_index = StockSearchIndex(self.code_name_list, lambda s: (s['code'], s['pinyin'], s['name']))
 
         # 创建键盘精灵窗口
 
@@ -109,9 +140,20 @@ class MainWindow(QtWidgets.QMainWindow):
             file_name = self.code_file_dic[code]
             # print(self.conf["plots"])
             self.conf["plots"][0]["chart_item"][0]["file_name"] = file_name
-        datas: Dict[PlotIndex, PlotItemInfo] = load_data_from_conf(self.conf)
-        self.widget.update_all_history_data(datas, obtain_data_from_algo)
         file_name = self.conf["plots"][0]["chart_item"][0]["file_name"]
+        datas = self.prefetch.get(file_name) if code else None
+        if datas:
+            # 已预取, 算法结果也已算好
+            self.widget.update_all_history_data(datas)
+        else:
+            datas: Dict[PlotIndex, PlotItemInfo] = load_data_from_conf(self.conf)
+            self.widget.update_all_history_data(datas, functools.partial(obtain_data_from_algo,
+                                                                         eps=conf_epsilon(self.conf)))
+            if code:
+                try:
+                    self.prefetch.put(file_name, datas, self._file_stamp(file_name))  # 翻回来时直接显示
+                except OSError:
+                    pass
         print("file_name: ", file_name)
         # 将 file_name 设置到窗口标题中
         if code:
@@ -123,6 +165,24 @@ class MainWindow(QtWidgets.QMainWindow):
         self.widget._update_y_range()
         self.widget.scene().update()  # 请求QGraphicsScene更新绘制
         self.widget.viewport().update()  # 请求QGraphicsView更新
+        if code:
+            self.prefetch_neighbours(code)
+
+    def prefetch_neighbours(self, code: str):
+        """预取键盘精灵列表中当前品种前后的候选"""
+        list_widget = self.keyboard_genie.matching_list_widget
+        codes = [list_widget.item(i).data(QtCore.Qt.UserRole) for i in range(list_widget.count())]
+        file_names = [self.code_file_dic[c] for c in codes if c in self.code_file_dic]
+        self.prefetch.prefetch_around(file_names, self.code_file_dic[code])
+
+    def _prefetch_load(self, file_name: str) -> Dict[PlotIndex, PlotItemInfo]:
+        conf = copy.deepcopy(self.conf)
+        conf["plots"][0]["chart_item"][0]["file_name"] = file_name
+        return load_data_with_algo(conf)
+
+    def _file_stamp(self, file_name: str) -> int:
+        """文件的mtime, 文件被重新导出后预取的数据作废"""
+        return os.stat(os.path.join(self.conf["conf"]["base_path"], file_name)).st_mtime_ns
 
     def add_chart_item(self, plots: List[Any], widget: ChartWidget):
         for plot_index, plot in enumerate(plots):
@@ -162,21 +222,12 @@ class MainWindow(QtWidgets.QMainWindow):
         # .* 表示任意字符（中间部分可有多种形式）
         # L9\.txt$ 以 L9.txt 结尾
 
-        pattern = re.compile(r'^\d+#[^#]*L9\.txt$')
+        # 品种目录缓存: 只对新增或修改过的文件读取表头和转换拼音
         items = []
         dic: Dict[str, str] = {}
-        for file_name in os.listdir(base_path):
-            if pattern.match(file_name):
-                file_path = os.path.join(base_path, file_name)
-                with open(file_path, 'r', encoding='gb2312') as f:
-                    first_line = f.readline().strip()
-                    fields = first_line.split()
-                    if len(fields) >= 2:
-                        code = fields[0].strip()
-                        name = fields[1].strip()
-                        pinyin = get_pinyin_first_letters(name)
-                        items.append({'code': code, 'name': name, 'pinyin': pinyin})
-                        dic[code] = file_name
+        for entry in symbol_catalog.load_catalog(base_path):
+            items.append({'code': entry.code, 'name': entry.name, 'pinyin': entry.pinyin})
+            dic[entry.code] = entry.file_name
         return items, dic
         #
         # items = [
@@ -224,6 +275,10 @@ class MainWindow(QtWidgets.QMainWindow):
         super().resizeEvent(event)
         self.update_keyboard_genie_position()
 
+    def closeEvent(self, event):
+        self.prefetch.shutdown()    # 停止预取线程
+        super().closeEvent(event)
+
     def update_keyboard_genie_position(self):
         if self.keyboard_genie.isVisible():
             # 获取主窗口的全局位置
@@ -244,12 +299,7 @@ class MainWindow(QtWidgets.QMainWindow):
     #     self.keyboard_genie.close()
 
     def update_matching_list(self, input_text):
-        matching_stocks = []
-        input_upper = input_text.strip().upper()
-        if input_upper:
-            for stock in self.code_name_list:
-                if input_upper in stock['code'] or input_upper in stock['pinyin'].upper():
-                    matching_stocks.append(stock)
+        matching_stocks = self.search_index.search(input_text)
 
         self.keyboard_genie.matching_list_widget.clear()
         for stock in matching_stocks:
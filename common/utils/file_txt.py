@@ -2,7 +2,9 @@ import os
 from typing import List
 import logging
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from common.utils.kline_index import load_index, parse_line_dt, trading_dt, to_seconds
 
 import copy
 def read_file(file_name) -> List[str]:
@@ -218,45 +220,122 @@ def _read_in_reverse(file_path: str, block_size: int, n: int, end_dt) -> list[st
     return items
 
 
-def _read_between_dates(file_path, block_size, dt_start, dt_end):
+_SEEK_LINEAR_BYTES = 64 * 1024    # 二分到剩余区间小于该值后改为顺序读
+
+
+def _seek_line_at_or_after(f, file_size: int, dt_target: datetime, encoding: str = 'gb2312') -> int:
+    """
+    导出文件按时间排序, 在字节偏移上二分查找:
+    每次 seek 到中点后丢弃半行, 重新对齐到下一行行首, 解析该行时间.
+    返回一个行首偏移, 保证其之前的数据行时间都 < dt_target, 只需 O(log n) 次读取.
+    """
+    lo, hi = 0, file_size
+    while hi - lo > _SEEK_LINEAR_BYTES:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        f.readline()    # 丢弃半行, 对齐到行首
+        line_dt = None
+        while f.tell() < hi:
+            line_dt = parse_line_dt(f.readline().decode(encoding, errors='ignore').strip())
+            if line_dt:
+                break
+        if line_dt is None or trading_dt(line_dt) >= dt_target:
+            hi = mid
+        else:
+            lo = f.tell()   # 该行及之前都早于目标时间
+    return lo
+
+
+def _seek_start(file, file_path, dt_start, encoding='gb2312') -> int:
+    """
+    返回顺序读取的起点: 有稀疏索引时直接查索引, 否则在字节偏移上二分
+    """
+    index = load_index(file_path, encoding)
+    if index:
+        return index.locate_time(to_seconds(dt_start))[0]
+    return _seek_line_at_or_after(file, _init_file_pos(file), dt_start, encoding)
+
+
+def _read_between_dates(file_path, block_size, dt_start, dt_end, encoding='gb2312'):
     lines_in_range = []
-    with open(file_path, 'r', encoding='gb2312') as file:
-        # 跳过文件的头两行
-        next(file)
-        next(file)
-        for line in file:
-            arr = line.split(',')
-            line_dt_str = arr[0] + ' ' + arr[1]
-            line_dt = datetime.strptime(line_dt_str, '%Y/%m/%d %H%M')
-            if line_dt.hour > 17 or line_dt.hour < 7:
-                line_dt -= timedelta(days=1)
+    with open(file_path, 'rb') as file:
+        file.seek(_seek_start(file, file_path, dt_start, encoding))
+        for raw in file:
+            line = raw.decode(encoding, errors='ignore').strip()
+            line_dt = parse_line_dt(line)
+            if line_dt is None:     # 表头、说明行
+                continue
+            line_dt = trading_dt(line_dt)
             if dt_start <= line_dt <= dt_end:
-                lines_in_range.append(line.strip())
+                lines_in_range.append(line)
             elif line_dt > dt_end:
                 break
 
     return lines_in_range
 
 
-def _read_from_start(file_path, block_size, dt_start, n):
+def _read_from_start(file_path, block_size, dt_start, n, encoding='gb2312'):
     lines_from_start = []
-    with open(file_path, 'r', encoding='gb2312') as file:
-        # 跳过文件的头两行
-        next(file)
-        next(file)
-        for line in file:
-            line_dt_str = line.split(',')[0]
-            line_dt = datetime.strptime(line_dt_str, '%Y-%m-%d %H:%M:%S')
-            if line_dt.hour > 17 or line_dt.hour < 7:
-                line_dt -= timedelta(days=1)
-            if line_dt >= dt_start:
-                lines_from_start.append(line.strip())
+    with open(file_path, 'rb') as file:
+        file.seek(_seek_start(file, file_path, dt_start, encoding))
+        for raw in file:
+            line = raw.decode(encoding, errors='ignore').strip()
+            line_dt = parse_line_dt(line)
+            if line_dt is None:
+                continue
+            if trading_dt(line_dt) >= dt_start:
+                lines_from_start.append(line)
                 if len(lines_from_start) >= n:
                     break
 
     return lines_from_start
 
 
+def _read_data_lines(file, offset: int, skip: int, n: int, encoding='gb2312') -> list[str]:
+    """从行首偏移 offset 开始, 跳过 skip 根K线后读取 n 根(表头、说明行不计数)"""
+    lines = []
+    file.seek(offset)
+    for raw in file:
+        line = raw.decode(encoding, errors='ignore').strip()
+        if parse_line_dt(line) is None:
+            continue
+        if skip > 0:
+            skip -= 1
+            continue
+        if len(lines) >= n:
+            break
+        lines.append(line)
+    return lines
+
+
+def read_bars_before(file_path: str, before_dt: str, n: int = 1800, encoding: str = 'gb2312') -> list[str]:
+    """
+    向前翻页: 返回时间(按夜盘规则比较)早于 before_dt 的最后 n 根K线,
+    用于图表左边缘再加载更早的数据, 已经加载的部分不会重读.
+    借助稀疏索引先定位 before_dt 的序号, 再按序号定位起点, 只读需要的行.
+    """
+    if not _check_file_validity(file_path):
+        return []
+    index = load_index(file_path, encoding)
+    if index is None:
+        return []
+    dt_before = trading_dt(datetime.strptime(before_dt, '%Y-%m-%d %H:%M:%S'))
+    offset, ordinal = index.locate_time(to_seconds(dt_before))
+    with open(file_path, 'rb') as file:
+        # 从索引点向后数出 before_dt 对应的序号
+        file.seek(offset)
+        for raw in file:
+            line_dt = parse_line_dt(raw.decode(encoding, errors='ignore').strip())
+            if line_dt is None:
+                continue
+            if trading_dt(line_dt) >= dt_before:
+                break
+            ordinal += 1
+        first = max(ordinal - n, 0)
+        offset, base = index.locate_ordinal(first)
+        return _read_data_lines(file, offset, first - base, ordinal - first, encoding)
+
+
 def _decode_last_n_lines(raw_lines: list[bytes], n: int, encoding: str) -> list[str]:
     """
     对原始字节行进行解码并截取最后n行，过滤空行。
@@ -318,11 +397,11 @@ def tail_kline(file_path: str, n: int = 1000, start_dt="", end_dt="", encoding:
 
     # 根据不同情况调用读取逻辑
     if dt_start and dt_end:
-        # 同时存在start和end，忽略n，取两个时间之间的数据
-        decoded_lines = _read_between_dates(file_path, block_size, dt_start, dt_end)
+        # 同时存在start和end，忽略n，取两个时间之间的数据(二分定位起点)
+        decoded_lines = _read_between_dates(file_path, block_size, dt_start, dt_end, encoding)
     elif dt_start:
-        # 只有start，取start开始的n条数据
-        decoded_lines = _read_from_start(file_path, block_size, dt_start, n)
+        # 只有start，取start开始的n条数据(二分定位起点)
+        decoded_lines = _read_from_start(file_path, block_size, dt_start, n, encoding)
     else:
         # 原逻辑：以end_dt为终点，向前取n条数据
         decoded_lines = _read_in_reverse(file_path, block_size, n, end_dt)
@@ -340,6 +419,104 @@ def tail_kline(file_path: str, n: int = 1000, start_dt="", end_dt="", encoding:
     return filtered
 
 
+@dataclass
+class FollowState:
+    """单个导出文件的跟读状态"""
+    offset: int = 0             # 已经读过的字节位置(总在某一行的开头)
+    partial_line: bytes = b''   # offset之后、还没有换行符的半行
+    size: int = 0               # 上次读取时的文件大小
+
+
+class KLineFollower:
+    """
+    增量跟读正在增长的通达信导出文件.
+    每个文件记住已读到的字节位置和末尾的半行, poll时只读取新追加的字节, 返回新增的完整K线行.
+    通达信每次导出会把"数据来源:通达信"写在文件尾, 因此读到该行时不越过它,
+    下次导出在它的位置写入新数据时可以接着读.
+    """
+
+    def __init__(self, encoding: str = 'gb2312'):
+        self.encoding = encoding
+        self._states: dict[str, FollowState] = {}
+
+    def prime(self, file_path: str, n: int = 1000, start_dt="", end_dt="") -> list[str]:
+        """
+        首次打开: 先把跟读位置放到当前文件尾, 再用 tail_kline 读取历史数据(n 为0时不读).
+        两步之间追加的K线在下一次 poll 时还会返回(调用方按时间去重), 不会丢失
+        """
+        state = self._state_at_end(file_path)
+        lines = tail_kline(file_path, n, start_dt, end_dt, self.encoding) if n > 0 else []
+        self._states[file_path] = state
+        return lines
+
+    def forget(self, file_path: str):
+        self._states.pop(file_path, None)
+
+    def _state_at_end(self, file_path: str) -> FollowState:
+        """定位到文件尾最后一个完整数据行之后(跳过尾部的空行、说明行和未写完的半行)"""
+        state = FollowState()
+        if not _check_file_validity(file_path):
+            return state
+        with open(file_path, 'rb') as f:
+            file_size = _init_file_pos(f)
+            chunk, read_start = _read_block(f, file_size, 4096)
+        state.size = file_size
+        state.offset = file_size
+        lines = chunk.split(b'\n')
+        pos = file_size
+        for i, raw in enumerate(reversed(lines)):
+            pos -= len(raw) + (1 if i > 0 else 0)    # 该行的起始位置
+            if i == 0:      # 最后一段没有换行符: 空或者是未写完的半行
+                state.offset = pos
+                continue
+            if i == len(lines) - 1 and read_start > 0:  # 块的第一段可能不完整
+                break
+            line = raw.decode(self.encoding, errors='ignore').strip()
+            if line and "通达信" not in line:
+                break
+            state.offset = pos
+        return state
+
+    def poll(self, file_path: str) -> list[str]:
+        """
+        返回自上次poll以来新追加的完整K线行(已解码、去空行和说明行).
+        未prime过的文件从当前文件尾开始跟读, 本次返回空列表.
+        文件变小(被重写或截断)时重新定位到文件尾.
+        """
+        state = self._states.get(file_path)
+        if state is None:
+            self._states[file_path] = self._state_at_end(file_path)
+            return []
+        if not _check_file_validity(file_path):
+            return []
+        file_size = os.path.getsize(file_path)
+        if file_size < state.offset + len(state.partial_line):
+            logging.warning(f"文件被截断或重写, 重新定位到文件尾: {file_path}")
+            self._states[file_path] = self._state_at_end(file_path)
+            return []
+        if file_size == state.size:
+            return []
+
+        with open(file_path, 'rb') as f:
+            f.seek(state.offset + len(state.partial_line))
+            chunk = f.read(file_size - state.offset - len(state.partial_line))
+        state.size = file_size
+
+        raw_lines = (state.partial_line + chunk).split(b'\n')
+        state.partial_line = raw_lines.pop()     # 最后一段没有换行符, 留到下次
+        new_lines = []
+        for raw in raw_lines:
+            line = raw.decode(self.encoding, errors='ignore').strip()
+            if "通达信" in line:
+                # 文件尾的说明行: 停在该行之前, 丢弃其后的内容, 下次从这里重读
+                state.partial_line = b''
+                break
+            state.offset += len(raw) + 1
+            if line:
+                new_lines.append(line)
+        return new_lines
+
+
 def write_file(file_name, lines: List[str], append: bool):
     """
     写文件， append为True表示追加，否则重新创新
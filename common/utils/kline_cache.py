@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+@file: kline_cache.py
+@desc: 通达信导出K线的二进制列式缓存
+每个导出文件对应一个 .npy 文件(结构化数组, 以内存映射方式打开), 旁边放一个 .json 记录
+源文件的 路径 + mtime + size, 只有源文件发生变化时才重新解析txt.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from common.config import KLINE_CACHE_PATH
+from common.utils.kline_parser import parse_tdx_file
+
+CACHE_VERSION = 1   # 缓存格式版本, 格式变化时加1, 旧缓存自动失效
+
+# 已打开的缓存: 源文件绝对路径 -> (校验键, 内存映射数组); 不是通达信格式的文件数组为None, 文件不变时不再解析
+_opened: Dict[str, Tuple[tuple, Optional[np.ndarray]]] = {}
+
+
+def _source_key(file_path: str) -> Optional[tuple]:
+    """源文件的校验键: (绝对路径, mtime_ns, size)"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return os.path.abspath(file_path), st.st_mtime_ns, st.st_size
+
+
+def cache_file_path(abs_path: str, suffix: str) -> str:
+    """缓存目录下的文件路径, 文件名带上源路径的哈希, 避免不同目录下的同名导出互相覆盖"""
+    digest = hashlib.md5(abs_path.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(KLINE_CACHE_PATH, f"{os.path.basename(abs_path)}.{digest}{suffix}")
+
+
+def temp_file_path(path: str) -> str:
+    """写缓存用的临时文件名, 按进程和线程区分: 同一进程的线程池中可能有多个线程同时生成同一个缓存"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _cache_paths(abs_path: str) -> Tuple[str, str]:
+    return cache_file_path(abs_path, ".npy"), cache_file_path(abs_path, ".json")
+
+
+def _read_meta(meta_path: str) -> Optional[dict]:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(npy_path: str, meta_path: str, arr: np.ndarray, key: tuple):
+    """先写临时文件再替换, 避免多进程/中断时读到半个文件"""
+    os.makedirs(KLINE_CACHE_PATH, exist_ok=True)
+    tmp_npy = temp_file_path(npy_path)
+    with open(tmp_npy, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp_npy, npy_path)
+    meta = {"version": CACHE_VERSION, "source": key[0], "mtime_ns": key[1], "size": key[2], "count": len(arr)}
+    tmp_meta = temp_file_path(meta_path)
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_meta, meta_path)
+
+
+def load_kline_array(file_path: str) -> Optional[np.ndarray]:
+    """
+    返回导出文件的全部K线(只读内存映射的结构化数组).
+    缓存命中直接mmap; 源文件变化或缓存不存在时重新解析并写缓存;
+    文件不存在或不是通达信9列格式时返回None, 由调用方退回文本读取.
+    """
+    key = _source_key(file_path)
+    if key is None:
+        return None
+    abs_path = key[0]
+    opened = _opened.get(abs_path)
+    if opened and opened[0] == key:
+        return opened[1]
+
+    npy_path, meta_path = _cache_paths(abs_path)
+    meta = _read_meta(meta_path)
+    if meta and meta.get("version") == CACHE_VERSION and \
+            (meta.get("source"), meta.get("mtime_ns"), meta.get("size")) == key and os.path.exists(npy_path):
+        try:
+            arr = np.load(npy_path, mmap_mode="r")
+            _opened[abs_path] = (key, arr)
+            return arr
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取K线缓存失败, 重新生成: {npy_path}, {str(e)}")
+
+    arr = parse_tdx_file(file_path)
+    if not len(arr):    # 不是通达信9列格式
+        _opened[abs_path] = (key, None)
+        return None
+    try:
+        _write_cache(npy_path, meta_path, arr, key)
+        arr = np.load(npy_path, mmap_mode="r")
+        logging.info(f"生成K线缓存: {npy_path}, 数量: {len(arr)}")
+    except OSError as e:
+        logging.warning(f"写K线缓存失败, 本次直接使用内存数据: {npy_path}, {str(e)}")
+    _opened[abs_path] = (key, arr)
+    return arr
+
+
+def trading_seconds(times: np.ndarray) -> np.ndarray:
+    """
+    与 file_txt._read_between_dates 相同的夜盘规则: 小时>17 或 <7 的K线减去一天,
+    得到可以按时间顺序比较的秒数
+    """
+    hours = (times // 3600) % 24
+    return times - 86400 * ((hours > 17) | (hours < 7))
+
+
+def _to_seconds(dt_str: str) -> int:
+    dt = datetime.strptime(dt_str, '%Y-%m-%d %H:%M:%S')
+    return int(np.datetime64(dt, "s").astype(np.int64))
+
+
+def tail_kline_array(file_path: str, n: int = 1000, start_dt="", end_dt="") -> Optional[np.ndarray]:
+    """
+    与 file_txt.tail_kline 取数规则一致, 但从二进制缓存中切片:
+      1) start_dt 和 end_dt 都有: 取两者之间的数据(按夜盘规则比较)
+      2) 只有 start_dt: 取 start_dt 开始的 n 条
+      3) 否则: 取 <= end_dt(无则到文件尾) 的最后 n 条
+    返回None表示无法使用缓存
+    """
+    arr = load_kline_array(file_path)
+    if arr is None:
+        return None
+    return slice_kline_array(arr, n, start_dt, end_dt)
+
+
+def slice_kline_array(arr: np.ndarray, n: int = 1000, start_dt="", end_dt="") -> np.ndarray:
+    """按 tail_kline_array 的规则从K线数组中切片(也用于合成的多周期K线)"""
+    times = arr["time"]
+    if start_dt and end_dt:
+        adj = trading_seconds(times)
+        over = np.flatnonzero(adj > _to_seconds(end_dt))
+        stop = over[0] if over.size else len(arr)
+        return arr[:stop][adj[:stop] >= _to_seconds(start_dt)]
+    if start_dt:
+        begin = np.flatnonzero(trading_seconds(times) >= _to_seconds(start_dt))
+        if not begin.size:
+            return arr[:0]
+        return arr[begin[0]:begin[0] + n]
+    stop = len(arr)
+    if end_dt:
+        hit = np.flatnonzero(times <= _to_seconds(end_dt))
+        stop = hit[-1] + 1 if hit.size else 0
+    return arr[max(stop - n, 0):stop]
+
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+@file: kline_index.py
+@desc: 通达信导出文本的稀疏时间索引
+每个导出文件在缓存目录下对应一个 .idx.npz, 记录 每K根K线 以及 每个交易日第一根K线 的
+(序号, 行首字节偏移, 按夜盘规则调整后的时间). 按日期或按序号定位时只需查索引再顺序读几行,
+不必从文件头扫描. 文件增长(盘中重新导出)时从上次索引的末尾继续扫描, 不重建.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from common.utils.kline_cache import cache_file_path, temp_file_path
+
+INDEX_VERSION = 1
+INDEX_STEP = 256    # 每隔多少根K线记录一个索引点
+
+_EPOCH = datetime(1970, 1, 1)
+
+# 已加载的索引: 源文件绝对路径 -> KLineIndex
+_indexes: Dict[str, "KLineIndex"] = {}
+
+
+def parse_line_dt(line: str) -> Optional[datetime]:
+    """
+    解析一行K线的时间, 支持两种导出格式:
+      通达信: '2024/08/16,0905,...'(日期分隔符也可能是'-')
+      csv:    '2024-08-16 09:05:00,...'
+    表头、说明行等无法解析时返回 None
+    """
+    parts = line.split(',', 2)
+    if len(parts) < 2:
+        return None
+    d = parts[0]
+    try:
+        if len(d) == 10:
+            hhmm = int(parts[1])
+            return datetime(int(d[0:4]), int(d[5:7]), int(d[8:10]), hhmm // 100, hhmm % 100)
+        if len(d) == 19:
+            return datetime.strptime(d, '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    return None
+
+
+def trading_dt(line_dt: datetime) -> datetime:
+    """夜盘规则: 小时>17 或 <7 的K线减去一天, 得到可以按顺序比较的时间"""
+    if line_dt.hour > 17 or line_dt.hour < 7:
+        line_dt -= timedelta(days=1)
+    return line_dt
+
+
+def to_seconds(dt: datetime) -> int:
+    """datetime(不带时区) 转为距1970-01-01的秒数, 与 kline_parser 的时间列一致"""
+    return (dt - _EPOCH) // timedelta(seconds=1)
+
+
+class KLineIndex:
+    """单个导出文件的稀疏索引"""
+
+    def __init__(self, key: tuple):
+        self._reset(key)
+
+    def _reset(self, key: tuple):
+        self.key = key                      # (绝对路径, mtime_ns, size)
+        self.ordinal = np.empty(0, np.int64)    # 索引点的K线序号(从0开始, 只计数据行)
+        self.offset = np.empty(0, np.int64)     # 索引点的行首字节偏移
+        self.time = np.empty(0, np.int64)       # 索引点按夜盘规则调整后的秒数
+        self.count = 0          # 已索引的K线数量
+        self.end = 0            # 最后一根K线行尾之后的偏移, 文件增长时从这里继续
+        self.tail_offset = 0    # 最后一根K线的行首偏移
+        self.tail_line = b''    # 最后一根K线的原始字节, 用来确认文件只是在尾部追加
+
+    def locate_time(self, t: int) -> Tuple[int, int]:
+        """
+        返回 (行首偏移, 序号), 该位置之前的K线调整后时间都 < t, 从这里顺序读即可找到 >= t 的第一根
+        """
+        j = int(np.searchsorted(self.time, t, side='left')) - 1
+        j = max(j, 0)
+        return int(self.offset[j]), int(self.ordinal[j])
+
+    def locate_ordinal(self, k: int) -> Tuple[int, int]:
+        """返回序号 <= k 的最近一个索引点 (行首偏移, 序号)"""
+        j = int(np.searchsorted(self.ordinal, k, side='right')) - 1
+        j = max(j, 0)
+        return int(self.offset[j]), int(self.ordinal[j])
+
+    def _scan(self, f, start: int, encoding: str):
+        """从 start 开始向后扫描完整的行, 追加索引点(最后一段没有换行符的半行不处理)"""
+        f.seek(start)
+        buf = f.read()
+        ordinals, offsets, times = [], [], []
+        prev_day = None
+        if self.tail_line:
+            prev = parse_line_dt(self.tail_line.decode(encoding, errors='ignore').strip())
+            prev_day = prev.date() if prev else None
+        pos = start
+        for raw in buf.split(b'\n')[:-1]:
+            line_dt = parse_line_dt(raw.decode(encoding, errors='ignore').strip())
+            if line_dt:
+                day = line_dt.date()    # 通达信夜盘K线的日期就是所属交易日
+                if self.count % INDEX_STEP == 0 or day != prev_day:
+                    ordinals.append(self.count)
+                    offsets.append(pos)
+                    times.append(to_seconds(trading_dt(line_dt)))
+                prev_day = day
+                self.count += 1
+                self.tail_offset, self.tail_line = pos, raw
+                self.end = pos + len(raw) + 1
+            pos += len(raw) + 1
+        if ordinals:
+            self.ordinal = np.concatenate([self.ordinal, np.array(ordinals, np.int64)])
+            self.offset = np.concatenate([self.offset, np.array(offsets, np.int64)])
+            self.time = np.concatenate([self.time, np.array(times, np.int64)])
+
+    def _is_appended(self, f) -> bool:
+        """文件是否只是在尾部追加了内容(最后一根已索引的K线原样还在)"""
+        if not self.tail_line or self.key[2] < self.end:
+            return False
+        f.seek(self.tail_offset)
+        return f.read(len(self.tail_line)) == self.tail_line
+
+    def refresh(self, key: tuple, encoding: str) -> bool:
+        """源文件变化后更新索引, 返回是否是增量更新"""
+        with open(key[0], 'rb') as f:
+            self.key = key
+            if self._is_appended(f):
+                self._scan(f, self.end, encoding)
+                return True
+            self._reset(key)
+            self._scan(f, 0, encoding)
+            return False
+
+    def save(self, path: str):
+        """先写临时文件再替换"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = temp_file_path(path)
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=INDEX_VERSION, mtime_ns=self.key[1], size=self.key[2],
+                     ordinal=self.ordinal, offset=self.offset, time=self.time,
+                     count=self.count, end=self.end, tail_offset=self.tail_offset,
+                     tail_line=np.frombuffer(self.tail_line, np.uint8))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, abs_path: str) -> Optional["KLineIndex"]:
+        try:
+            with np.load(path) as z:
+                if int(z['version']) != INDEX_VERSION:
+                    return None
+                index = cls((abs_path, int(z['mtime_ns']), int(z['size'])))
+                index.ordinal, index.offset, index.time = z['ordinal'], z['offset'], z['time']
+                index.count, index.end = int(z['count']), int(z['end'])
+                index.tail_offset, index.tail_line = int(z['tail_offset']), z['tail_line'].tobytes()
+                return index
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def load_index(file_path: str, encoding: str = 'gb2312') -> Optional[KLineIndex]:
+    """
+    返回导出文件的稀疏索引: 内存中有且源文件未变直接返回; 否则读取 .idx.npz,
+    再按源文件的变化增量更新或重建后写回. 文件不存在或没有可解析的K线时返回None.
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    abs_path = os.path.abspath(file_path)
+    key = (abs_path, st.st_mtime_ns, st.st_size)
+    index = _indexes.get(abs_path)
+    if index and index.key == key:
+        return index
+
+    path = cache_file_path(abs_path, ".idx.npz")
+    if index is None:
+        index = KLineIndex.load(path, abs_path)
+    if index is None or index.key != key:
+        index = index or KLineIndex(key)
+        appended = index.refresh(key, encoding)
+        logging.info(f"{'更新' if appended else '生成'}K线索引: {file_path}, 数量: {index.count}")
+        if index.count:
+            try:
+                index.save(path)
+            except OSError as e:
+                logging.warning(f"写K线索引失败, 本次只在内存中使用: {path}, {str(e)}")
+    if not index.count:
+        return None
+    _indexes[abs_path] = index
+    return index
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+@file: kline_parser.py
+@desc: 通达信导出K线的批量解析
+一次把一整块文本行解析为列式的 NumPy 结构化数组(int64时间 + float64 OHLCV),
+代替逐行 split + datetime.strptime 的 DataItem.init_txt. 需要 DataItem 时再由 LazyBarDict 按需生成(to_bar_columns).
+"""
+import io
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+KLINE_DTYPE = np.dtype([
+    ("time", "i8"),     # 时间, 文件中的墙上时间(不带时区)距1970-01-01的秒数
+    ("open", "f8"),     # 开
+    ("high", "f8"),     # 高
+    ("low", "f8"),      # 低
+    ("close", "f8"),    # 收
+    ("volume", "f8"),   # 成交量
+    ("hold", "f8"),     # 持仓量
+    ("settle", "f8"),   # 结算价
+])
+
+TDX_COLUMNS = 9     # 日期,时间,开,高,低,收,量,持仓,结算
+
+
+def is_tdx_line(line: str) -> bool:
+    """是否是通达信9列数据行(日期的格式在批量转换时再校验)"""
+    return line.count(",") == TDX_COLUMNS - 1
+
+
+def _to_floats(row: str) -> list:
+    try:
+        vals = [float(x) for x in row.split(",")]
+    except ValueError:
+        return []
+    return vals if len(vals) == 11 else []
+
+
+def parse_tdx_lines(lines: Iterable[str]) -> np.ndarray:
+    """
+    批量解析通达信数据行, 例如 '2024/08/16,0905,5588,5589,5577,5584,10795,391246,0'.
+    非数据行(表头、"数据来源:通达信")会被跳过, 返回按原顺序排列的结构化数组.
+    """
+    rows: List[str] = [line for line in lines if is_tdx_line(line)]
+    arr = np.empty(len(rows), dtype=KLINE_DTYPE)
+    if not rows:
+        return arr
+    text = "\n".join(rows).replace("/", ",").replace("-", ",")  # 日期分隔符换成逗号, 一行变为11个数字
+    try:
+        cols = np.loadtxt(io.StringIO(text), delimiter=",", dtype=np.float64, ndmin=2)
+    except ValueError:
+        # 混有无法解析的行时, 逐行剔除后再转换(很少发生)
+        cols = np.array([vals for vals in map(_to_floats, text.split("\n")) if vals], dtype=np.float64).reshape(-1, 11)
+        arr = np.empty(len(cols), dtype=KLINE_DTYPE)
+
+    ymd = cols[:, :4].astype(np.int64)
+    months = (ymd[:, 0] - 1970) * 12 + (ymd[:, 1] - 1)
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (ymd[:, 2] - 1)
+    arr["time"] = days.astype("datetime64[s]").astype(np.int64) + (ymd[:, 3] // 100) * 3600 + (ymd[:, 3] % 100) * 60
+    for i, name in enumerate(KLINE_DTYPE.names[1:]):
+        arr[name] = cols[:, 4 + i]
+    return arr
+
+
+def parse_tdx_file(file_path: str, encoding: str = "gb2312") -> np.ndarray:
+    """解析整个通达信导出文件"""
+    with open(file_path, "rb") as f:
+        text = f.read().decode(encoding, errors="ignore")
+    return parse_tdx_lines(line.strip() for line in text.splitlines())
+
+
+def to_datetimes(times: np.ndarray) -> list:
+    """秒数转为 datetime 列表(不带时区, 与文件中的时间一致)"""
+    return times.astype("datetime64[s]").astype(datetime).tolist()
+
+
+def to_bar_columns(arr: np.ndarray) -> Tuple[list, List[list]]:
+    """
+    转为图表使用的列: (时间, [开, 高, 低, 收, 量]), 用于 LazyBarDict,
+    每一行与 DataItem 解析通达信文本行(不带data_type)的结果一致
+    """
+    return to_datetimes(arr["time"]), [arr[name].tolist() for name in ("open", "high", "low", "close", "volume")]
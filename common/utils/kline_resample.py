@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+@file: kline_resample.py
+@desc: 由1分钟(或更小周期)的通达信K线合成 5/15/30/60分钟、日线
+一次向量化计算: 每根K线算出所属周期的键, 相邻键相同的K线为一组, 用 reduceat 求高低点和成交量.
+  分钟周期: 通达信K线的时间是结束时间, 键取向上对齐到周期整点的时间, 即合成K线的结束时间(按钟点对齐,
+            10:15休市、11:30收盘等不单独切分)
+  日线: 通达信导出的夜盘K线(小时>17 或 <7)已经标为下一交易日的日期, 所以文件中的日期就是交易日,
+        日线的时间取交易日的 15:00
+BarResampler 保存各周期的结果和最后一根(未走完的)合成K线的源K线, 新的1分钟K线到达时只重算最后一根.
+K线按到达的顺序处理, 不按时间排序: 跨过0点的夜盘(如 AU、SC)文件中的时间在0点后变小.
+"""
+import logging
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from common.utils.kline_parser import KLINE_DTYPE
+
+PERIOD_DAY = 1440       # 日线, 其余周期为分钟数
+DEFAULT_PERIODS = (5, 15, 30, 60, PERIOD_DAY)
+DAY_CLOSE = 15 * 3600   # 日线K线的时间: 交易日的 15:00
+RECENT_COUNT = 256      # 记住最近输入的源K线时间的根数, 用于跳过重复送达的K线
+
+
+def parse_period(value: Union[int, str]) -> int:
+    """配置中的周期: 分钟数(5、"15"、"60m") 或 日线("day"、"d")"""
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("day", "d", "1d"):
+            return PERIOD_DAY
+        value = text[:-1] if text.endswith("m") else text
+    period = int(value)
+    if period <= 0:
+        raise ValueError(f"周期必须大于0: {value}")
+    return period
+
+
+def bucket_keys(times: np.ndarray, period: int) -> np.ndarray:
+    """每根K线所属的合成K线的时间"""
+    if period == PERIOD_DAY:
+        return times // 86400 * 86400 + DAY_CLOSE
+    step = period * 60
+    return -(-times // step) * step
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    """相邻键相同的K线为一组, 返回每组的起始位置"""
+    if not len(keys):
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def _aggregate(arr: np.ndarray, keys: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    out = np.empty(len(starts), dtype=KLINE_DTYPE)
+    if not len(starts):
+        return out
+    lasts = np.r_[starts[1:], len(arr)] - 1
+    out["time"] = keys[starts]
+    out["open"] = arr["open"][starts]
+    out["high"] = np.maximum.reduceat(arr["high"], starts)
+    out["low"] = np.minimum.reduceat(arr["low"], starts)
+    out["close"] = arr["close"][lasts]
+    out["volume"] = np.add.reduceat(arr["volume"], starts)
+    out["hold"] = arr["hold"][lasts]     # 持仓量、结算价取最后一根
+    out["settle"] = arr["settle"][lasts]
+    return out
+
+
+def resample_bars(arr: np.ndarray, period: int) -> np.ndarray:
+    """把按时间顺序的K线数组合成为 period 周期的K线(KLINE_DTYPE)"""
+    keys = bucket_keys(arr["time"], period)
+    return _aggregate(arr, keys, _group_starts(keys))
+
+
+class _Frame:
+    """一个周期的合成结果, 容量不够时加倍, 追加不用每次复制全部K线"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.buf = np.empty(0, dtype=KLINE_DTYPE)
+        self.size = 0
+        self.pending = np.empty(0, dtype=KLINE_DTYPE)  # 最后一根合成K线的源K线
+
+    @property
+    def bars(self) -> np.ndarray:
+        view = self.buf[:self.size]
+        view.flags.writeable = False
+        return view
+
+    def replace_tail(self, first: int, rows: np.ndarray):
+        """从 first 开始的合成K线替换为 rows"""
+        size = first + len(rows)
+        if size > len(self.buf):
+            buf = np.empty(max(size, 2 * len(self.buf), 64), dtype=KLINE_DTYPE)
+            buf[:first] = self.buf[:first]
+            self.buf = buf
+        self.buf[first:size] = rows
+        self.size = size
+
+    def update(self, source: np.ndarray) -> int:
+        """
+        合成 source(接在 pending 之后到达的新K线), 返回第一根有变化的合成K线的位置.
+        source 的第一根与最后一根源K线的时间相同时是对它的修正(盘中未走完的K线), 替换它; 否则追加.
+        """
+        pending, first = self.pending, self.size
+        if len(pending):
+            first -= 1      # 最后一根合成K线重算
+            if source["time"][0] == pending["time"][-1]:
+                pending = pending[:-1]
+            source = np.concatenate((pending, source))
+        keys = bucket_keys(source["time"], self.period)
+        starts = _group_starts(keys)
+        self.replace_tail(first, _aggregate(source, keys, starts))
+        self.pending = source[starts[-1]:].copy()
+        return first
+
+
+class BarResampler:
+    """
+    多周期合成, 同一个源文件的各周期窗格共用一个:
+        resampler = BarResampler(kline_cache.load_kline_array(file_path))
+        resampler.bars(15)
+        changed = resampler.append(kline_parser.parse_tdx_lines(new_lines))    # {周期: 从第一根变化的K线起的数组}
+    """
+
+    def __init__(self, source: Optional[np.ndarray] = None, periods: Iterable[int] = DEFAULT_PERIODS):
+        self._frames: Dict[int, _Frame] = {period: _Frame(period) for period in periods}
+        self._recent = np.empty(0, dtype=np.int64)     # 最近输入的源K线的时间(按到达顺序)
+        if source is not None:
+            self.append(source)
+
+    @property
+    def periods(self) -> tuple:
+        return tuple(self._frames)
+
+    def bars(self, period: int) -> np.ndarray:
+        """period 周期的全部合成K线(只读)"""
+        return self._frames[period].bars
+
+    def append(self, bars: np.ndarray) -> Dict[int, np.ndarray]:
+        """
+        输入新到达的源K线(第一根可以是对最后一根的修正), 更新各周期的最后一根或新增合成K线.
+        开头是已经输入过的K线(跟读位置早于读取源文件的时刻, 会重复送达几根)时跳过, 最后一根除外.
+        返回 {周期: 从第一根有变化的合成K线到末尾的数组}
+        """
+        bars = np.asarray(bars, dtype=KLINE_DTYPE)
+        if len(self._recent) > 1:
+            seen = set(self._recent[:-1].tolist())
+            skip = 0
+            while skip < len(bars) and int(bars["time"][skip]) in seen:
+                skip += 1
+            if skip:
+                logging.debug(f"跳过 {skip} 根已经输入过的源K线")
+                bars = bars[skip:]
+        if not len(bars):
+            return {}
+        recent = self._recent
+        if len(recent) and bars["time"][0] == recent[-1]:
+            recent = recent[:-1]
+        self._recent = np.concatenate((recent, bars["time"]))[-RECENT_COUNT:]
+        changed: Dict[int, np.ndarray] = {}
+        for period, frame in self._frames.items():
+            first = frame.update(bars)
+            changed[period] = frame.bars[first:].copy()
+        return changed
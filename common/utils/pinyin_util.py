@@ -1,10 +1,14 @@
+from functools import lru_cache
+
 from pypinyin import pinyin, Style
 
 
+@lru_cache(maxsize=4096)
 def get_pinyin_first_letters(text: str) -> str:
     """
     将一段中文文本转换为拼音首字母。例如:
     "菜籽指数" -> "CZZS"
+    同一名称只转换一次(结果缓存)
     """
     # pinyin函数会返回嵌套列表，如 [["cài"], ["zǐ"], ["zhǐ"], ["shù"]]
     # 我们只取 style=Style.FIRST_LETTER 来获取首字母
@@ -14,5 +18,5 @@ def get_pinyin_first_letters(text: str) -> str:
     return "".join(item[0] for item in result).upper()
 
 
-
-print(get_pinyin_first_letters("菜籽指数"))
\ No newline at end of file
+if __name__ == '__main__':
+    print(get_pinyin_first_letters("菜籽指数"))
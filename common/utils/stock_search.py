@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+@file: stock_search.py
+@desc: 键盘精灵的品种搜索索引
+对 代码、拼音首字母、名称 三个字段建立:
+  1) 排序后的键列表, 前缀查询用 bisect 定位
+  2) 1~3 字符的 n-gram 倒排表, 子串查询先取候选集合再逐个确认
+结果按匹配类型排序并截断; 连续输入(新关键字包含上一次的关键字)时只在上一次的结果里过滤.
+"""
+import heapq
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+NGRAM = 3               # 倒排表的最长 n-gram
+DEFAULT_LIMIT = 50      # 默认最多返回的结果数
+
+# 匹配类型的排序: 代码完全相同 > 代码前缀 > 拼音前缀 > 名称前缀 > 代码子串 > 拼音子串 > 名称子串
+_RANK_EXACT, _RANK_PREFIX, _RANK_SUBSTR = 0, 1, 4
+
+
+def _attr_fields(item) -> Tuple[str, str, str]:
+    return item.code, item.pinyin, item.name
+
+
+class StockSearchIndex:
+    """
+    品种搜索索引, items 可以是 StockInfo 这样有 code/pinyin/name 属性的对象,
+    也可以通过 fields 指定字段的取法, 例如 lambda s: (s['code'], s['pinyin'], s['name'])
+    """
+
+    def __init__(self, items: Sequence[Any], fields: Callable[[Any], Tuple[str, str, str]] = _attr_fields):
+        self.items = items
+        self._keys: List[Tuple[str, str, str]] = [tuple(f.upper() for f in fields(item)) for item in items]
+        # 每个字段一个排序列表 [(键, 序号)], 用于前缀查询
+        self._sorted: List[List[Tuple[str, int]]] = [
+            sorted((keys[f], i) for i, keys in enumerate(self._keys)) for f in range(3)]
+        # n-gram -> 包含它的品种序号
+        self._grams: Dict[str, Set[int]] = {}
+        for i, keys in enumerate(self._keys):
+            for key in keys:
+                for n in range(1, NGRAM + 1):
+                    for j in range(len(key) - n + 1):
+                        self._grams.setdefault(key[j:j + n], set()).add(i)
+        self._last_query = ""
+        self._last_matches: Optional[Set[int]] = None     # 上一次未截断的匹配集合
+
+    def _prefix_ids(self, field: int, query: str) -> List[int]:
+        keys = self._sorted[field]
+        ids = []
+        for pos in range(bisect_left(keys, (query, -1)), len(keys)):
+            key, i = keys[pos]
+            if not key.startswith(query):
+                break
+            ids.append(i)
+        return ids
+
+    def _candidates(self, query: str) -> Set[int]:
+        """子串候选: query 所有长度为 min(len, NGRAM) 的 n-gram 倒排表的交集"""
+        if self._last_matches is not None and self._last_query and self._last_query in query:
+            return self._last_matches   # 新关键字包含上一次的关键字, 结果只会变少
+        n = min(len(query), NGRAM)
+        result: Optional[Set[int]] = None
+        for j in range(len(query) - n + 1):
+            ids = self._grams.get(query[j:j + n])
+            if not ids:
+                return set()
+            result = set(ids) if result is None else result & ids
+        return result or set()
+
+    def _rank(self, i: int, query: str) -> Optional[tuple]:
+        best = None
+        for field, key in enumerate(self._keys[i]):
+            if key == query and field == 0:
+                rank = _RANK_EXACT
+            elif key.startswith(query):
+                rank = _RANK_PREFIX + field
+            elif query in key:
+                rank = _RANK_SUBSTR + field
+            else:
+                continue
+            if best is None or rank < best:
+                best = rank
+        return None if best is None else (best, len(self._keys[i][0]), self._keys[i][0], i)
+
+    def search(self, keyword: str, limit: int = DEFAULT_LIMIT) -> List[Any]:
+        """返回匹配的品种(按匹配类型、代码长度、代码排序), 最多 limit 个, limit<=0 表示不限"""
+        query = keyword.strip().upper()
+        if not query:
+            self._last_query, self._last_matches = "", None
+            return []
+        candidates = self._candidates(query)
+        # 排在前面的一定是前缀匹配, 前缀匹配已经够 limit 个时不必再确认全部子串候选
+        prefix_ids = set()
+        for field in range(3):
+            prefix_ids.update(self._prefix_ids(field, query))
+        if 0 < limit <= len(prefix_ids):
+            ranked = heapq.nsmallest(limit, (self._rank(i, query) for i in prefix_ids))
+            self._last_query, self._last_matches = query, candidates   # 候选集合是匹配集合的超集, 下次仍会逐个确认
+            return [self.items[r[-1]] for r in ranked]
+
+        ranked = []
+        matches: Set[int] = set()
+        for i in candidates:
+            rank = self._rank(i, query)
+            if rank:
+                matches.add(i)
+                ranked.append(rank)
+        self._last_query, self._last_matches = query, matches
+        if 0 < limit < len(ranked):
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [self.items[r[-1]] for r in ranked]
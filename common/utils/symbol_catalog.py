@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+@file: symbol_catalog.py
+@desc: 品种目录缓存(键盘精灵、股票列表使用)
+导出目录下每个 xx#xxL9.txt 的 代码、名称、拼音首字母、文件名、mtime 保存在缓存目录的 .catalog.json 中.
+启动时只做 listdir + stat, mtime 没变的文件不再打开, 也不再做拼音转换.
+"""
+import os
+import re
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from common.utils.kline_cache import cache_file_path, temp_file_path
+from common.utils.pinyin_util import get_pinyin_first_letters
+
+CATALOG_VERSION = 1
+STOCK_FILE_PATTERN = re.compile(r'^\d+#[^#]*L9\.txt$')    # 数字开头, 一个井号, L9.txt 结尾
+
+
+@dataclass
+class CatalogEntry:
+    code: str
+    name: str
+    pinyin: str
+    file_name: str
+    mtime_ns: int
+
+
+def read_header(file_path: str) -> Optional[Tuple[str, str]]:
+    """读取导出文件第一行的 (代码, 名称), 格式不符时返回None, 读取失败时抛出异常"""
+    with open(file_path, 'r', encoding='gb2312') as f:
+        fields = f.readline().strip().split()
+    if len(fields) >= 2:
+        return fields[0].strip(), fields[1].strip()
+    return None
+
+
+def _load_saved(catalog_path: str) -> Dict[str, CatalogEntry]:
+    try:
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get("version") != CATALOG_VERSION:
+            return {}
+        return {e["file_name"]: CatalogEntry(**e) for e in saved.get("entries", [])}
+    except (OSError, ValueError, TypeError, KeyError):
+        return {}
+
+
+def _save(catalog_path: str, entries: List[CatalogEntry]):
+    os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+    tmp_path = temp_file_path(catalog_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": CATALOG_VERSION, "entries": [asdict(e) for e in entries]}, f, ensure_ascii=False)
+    os.replace(tmp_path, catalog_path)
+
+
+def load_catalog(base_path: str, max_workers: Optional[int] = None) -> List[CatalogEntry]:
+    """
+    返回导出目录下的品种目录(按文件名排序).
+    新增或 mtime 变化的文件重新读取表头(线程池并行), 名称未变时沿用原来的拼音; 删除的文件移出目录.
+    """
+    abs_path = os.path.abspath(base_path)
+    catalog_path = cache_file_path(abs_path, ".catalog.json")
+    saved = _load_saved(catalog_path)
+
+    entries: Dict[str, CatalogEntry] = {}
+    stale: Dict[str, int] = {}
+    for file_name in sorted(os.listdir(abs_path)):
+        if not STOCK_FILE_PATTERN.match(file_name):
+            continue
+        try:
+            mtime_ns = os.stat(os.path.join(abs_path, file_name)).st_mtime_ns
+        except OSError:
+            continue
+        entry = saved.get(file_name)
+        if entry and entry.mtime_ns == mtime_ns:
+            entries[file_name] = entry
+        else:
+            stale[file_name] = mtime_ns
+
+    def read_one(file_name: str) -> Optional[Tuple[str, str]]:
+        try:
+            return read_header(os.path.join(abs_path, file_name))
+        except Exception as e:
+            logging.warning(f"读取品种表头失败: {file_name}, {str(e)}")
+            return None
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            headers = dict(zip(stale, pool.map(read_one, stale)))
+        for file_name, header in headers.items():
+            if header is None:
+                continue
+            code, name = header
+            old = saved.get(file_name)
+            pinyin = old.pinyin if old and old.name == name else get_pinyin_first_letters(name)
+            entries[file_name] = CatalogEntry(code, name, pinyin, file_name, stale[file_name])
+
+    result = [entries[name] for name in sorted(entries)]
+    if stale or len(entries) != len(saved):
+        try:
+            _save(catalog_path, result)
+        except OSError as e:
+            logging.warning(f"写品种目录缓存失败: {catalog_path}, {str(e)}")
+        logging.info(f"更新品种目录: {base_path}, 共 {len(result)} 个, 重新读取 {len(stale)} 个")
+    return result
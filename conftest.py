@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""pytest 从仓库根目录导入 common 包(本文件所在目录会加入 sys.path)"""
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+@file: test_c_merge.py
+@desc: 包含合并的回归测试: merge_bars / merge_klines 与 c_bi._Cal_MERGE 在 data 目录下每个K线文件上的结果完全一致
+运行(仓库根目录): python -m pytest tests
+"""
+import glob
+import os
+import unittest
+from typing import Optional, Tuple
+
+import numpy as np
+
+from common.model.kline import KLine
+from common.chanlun.c_bi import _Cal_MERGE
+from common.chanlun.c_merge import merge_bars, merge_klines
+from common.utils.kline_parser import parse_tdx_file
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+
+def read_high_low(path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """通达信9列文件或 dt,open,high,low,... 格式的文件的最高价、最低价, 没有这两列时返回None"""
+    arr = parse_tdx_file(path)
+    if len(arr):
+        return arr["high"], arr["low"]
+    try:
+        table = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+        return np.atleast_1d(table["high"]).astype(float), np.atleast_1d(table["low"]).astype(float)
+    except (ValueError, KeyError, IndexError, UnicodeDecodeError):
+        return None
+
+
+def comb_key(c) -> tuple:
+    return c.range_low, c.range_high, c.pos_begin, c.pos_end, c.pos_extreme, c.isUp
+
+
+class MergeRegressionTest(unittest.TestCase):
+
+    def test_data_files(self):
+        paths = sorted(glob.glob(os.path.join(DATA_DIR, "*.txt")))
+        self.assertTrue(paths, DATA_DIR)
+        checked = 0
+        for path in paths:
+            with self.subTest(file=os.path.basename(path)):
+                columns = read_high_low(path)
+                if columns is None:     # 成交量、MACD 等没有高低价的文件
+                    continue
+                highs, lows = columns
+                klines = [KLine(high=h, low=low) for h, low in zip(highs.tolist(), lows.tolist())]
+                expected = [comb_key(c) for c in _Cal_MERGE(klines)]
+                self.assertEqual([comb_key(c) for c in merge_bars(highs, lows).to_combs()], expected)
+                self.assertEqual([comb_key(c) for c in merge_klines(klines).to_combs()], expected)
+                checked += 1
+        self.assertGreater(checked, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+@file: test_c_segment.py
+@desc: 笔、段、中枢的回归测试, 在 data 目录下每个K线文件上与 c_bi 中的实现逐字段比较:
+       cal_fractals 与 Cal_LOWER/Cal_UPPER, calculate_bi_sparse 与 calculate_bi,
+       calculate_segments 与 _NCHDUAN, PivotEngine 与 compute_bi_pivots/compute_duan_pivots,
+       ChanStream 逐根输入时每一根K线上与从头计算(ChanPipeline)的结果
+运行(仓库根目录): python -m pytest tests
+"""
+import copy
+import glob
+import os
+import unittest
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from common.model.kline import KLine
+from common.chanlun.c_bi import (Cal_LOWER, Cal_UPPER, calculate_bi, cal_independent_klines, _NCHDUAN,
+                                 compute_bi_pivots, compute_duan_pivots)
+from common.chanlun.c_fractal import cal_fractals
+from common.chanlun.c_merge import merge_klines
+from common.chanlun.c_pipeline import ChanPipeline
+from common.chanlun.c_pivot import PivotEngine
+from common.chanlun.c_segment import calculate_segments
+from common.chanlun.c_sparse import calculate_bi_sparse
+from common.chanlun.c_stream import ChanStream
+from common.model.kline_columns import FractalColumns
+from common.utils.kline_parser import parse_tdx_file
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+STREAM_BARS = 400   # ChanStream 逐根比较的K线根数(每一根都从头计算一次)
+
+
+def read_high_low(path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """通达信9列文件或 dt,open,high,low,... 格式的文件的最高价、最低价, 没有这两列时返回None"""
+    arr = parse_tdx_file(path)
+    if len(arr):
+        return arr["high"], arr["low"]
+    try:
+        table = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+        return np.atleast_1d(table["high"]).astype(float), np.atleast_1d(table["low"]).astype(float)
+    except (ValueError, KeyError, IndexError, UnicodeDecodeError):
+        return None
+
+
+def read_klines(path: str) -> Optional[List[KLine]]:
+    columns = read_high_low(path)
+    if columns is None:     # 成交量、MACD 等没有高低价的文件
+        return None
+    highs, lows = columns
+    return [KLine(high=h, low=low) for h, low in zip(highs.tolist(), lows.tolist())]
+
+
+def dense_bi(klines: List[KLine]):
+    """c_bi 中的笔: 每根K线一个分型对象, 合并后的高低点写在K线的副本上"""
+    combs = cal_independent_klines(klines)
+    lower, upper = Cal_LOWER(klines, combs), Cal_UPPER(klines, combs)
+    merges = [copy.copy(k) for k in klines]
+    independents = [0] * len(klines)
+    for i, comb in enumerate(combs):
+        for j in range(comb.pos_begin, comb.pos_end + 1):
+            merges[j].low, merges[j].high = comb.range_low, comb.range_high
+            independents[j] = i
+    return lower, upper, calculate_bi(lower, upper, merges, independents)
+
+
+def bi_key(b) -> tuple:
+    return (b.pos_begin, b.pos_end, b.side, b.lowest, b.highest, b.top.index, b.bottom.index,
+            b.top.extremal.pos_begin)
+
+
+def seg_key(s) -> tuple:
+    return s.pos_begin, s.pos_end, s.start_index, s.end_index, s.lowest, s.highest, s.is_sure, s.up
+
+
+def pivot_key(p) -> tuple:
+    return p.up, p.bg_pos_index, p.ed_pos_index, p.lowly_value, p.highly_value
+
+
+def engine_pivots(items) -> list:
+    engine = PivotEngine()
+    for item in items:
+        engine.push(item)
+    return engine.pivots
+
+
+class SegmentRegressionTest(unittest.TestCase):
+
+    def data_files(self) -> List[Tuple[str, List[KLine]]]:
+        paths = sorted(glob.glob(os.path.join(DATA_DIR, "*.txt")))
+        self.assertTrue(paths, DATA_DIR)
+        files = [(os.path.basename(path), read_klines(path)) for path in paths]
+        return [(name, klines) for name, klines in files if klines is not None]
+
+    def test_data_files(self):
+        checked = 0
+        for name, klines in self.data_files():
+            with self.subTest(file=name):
+                self.check_file(klines)
+                checked += 1
+        self.assertGreater(checked, 0)
+
+    def check_file(self, klines: List[KLine]):
+        lower, upper, expected_bis = dense_bi(klines)
+        merged = merge_klines(klines)
+        fractals = cal_fractals(merged)
+        expected = FractalColumns.from_lower_upper(lower, upper)
+        for name in ("index", "side", "low", "high"):
+            np.testing.assert_array_equal(getattr(fractals, name), getattr(expected, name), name)
+
+        bis = calculate_bi_sparse(fractals, merged)
+        self.assertEqual([bi_key(b) for b in bis], [bi_key(b) for b in expected_bis])
+
+        merges = merged.merged_prices()
+        sides = [b.side for b in bis]
+        expected_segs = _NCHDUAN(copy.deepcopy(bis), merges)     # _NCHDUAN 会翻转输入笔的方向
+        segs = calculate_segments(bis, merges)
+        self.assertEqual([b.side for b in bis], sides)
+        self.assertEqual([seg_key(s) for s in segs], [seg_key(s) for s in expected_segs])
+
+        self.assertEqual([pivot_key(p) for p in engine_pivots(bis)],
+                         [pivot_key(p) for p in compute_bi_pivots(bis)])
+        self.assertEqual([pivot_key(p) for p in engine_pivots(segs)],
+                         [pivot_key(p) for p in compute_duan_pivots(segs)])
+
+    def test_stream(self):
+        checked = 0
+        for name, klines in self.data_files():
+            with self.subTest(file=name):
+                self.check_stream(klines[:STREAM_BARS])
+                checked += 1
+        self.assertGreater(checked, 0)
+
+    def check_stream(self, klines: List[KLine]):
+        stream = ChanStream()
+        for n, kline in enumerate(klines, 1):
+            stream.input(kline)
+            pipeline = ChanPipeline(klines[:n])
+            self.assertEqual([bi_key(b) for b in stream.bi_list], [bi_key(b) for b in pipeline.bi_list], n)
+            self.assertEqual([seg_key(s) for s in stream.seg_list], [seg_key(s) for s in pipeline.seg_list], n)
+            self.assertEqual([pivot_key(p) for p in stream.bi_pivots],
+                             [pivot_key(p) for p in pipeline.bi_pivots], n)
+            self.assertEqual([pivot_key(p) for p in stream.duan_pivots],
+                             [pivot_key(p) for p in pipeline.duan_pivots], n)
+
+
+if __name__ == '__main__':
+    unittest.main()
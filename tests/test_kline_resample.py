@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+@file: test_kline_resample.py
+@desc: 多周期合成的回归测试: BarResampler 逐根输入与 resample_bars 一次合成的结果完全一致,
+       包括跨过0点的夜盘(文件中的时间在0点后变小)、对最后一根的修正、重复送达的K线
+运行(仓库根目录): python -m pytest tests
+"""
+import unittest
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+
+from common.utils.kline_parser import KLINE_DTYPE
+from common.utils.kline_resample import BarResampler, DEFAULT_PERIODS, resample_bars
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def minute_range(begin: datetime, end: datetime) -> List[datetime]:
+    """begin 到 end(都包含)的每一分钟"""
+    count = int((end - begin).total_seconds() // 60) + 1
+    return [begin + timedelta(minutes=i) for i in range(count)]
+
+
+def session_times(day: datetime, night: bool) -> List[datetime]:
+    """
+    一个交易日按文件顺序的1分钟K线时间(结束时间). 夜盘标为交易日的日期:
+    21:01..23:59、00:00..02:30, 然后是日盘
+    """
+    times = []
+    if night:
+        times += minute_range(day.replace(hour=21, minute=1), day.replace(hour=23, minute=59))
+        times += minute_range(day, day.replace(hour=2, minute=30))
+    times += minute_range(day.replace(hour=9, minute=1), day.replace(hour=10, minute=15))
+    times += minute_range(day.replace(hour=10, minute=31), day.replace(hour=11, minute=30))
+    times += minute_range(day.replace(hour=13, minute=31), day.replace(hour=15))
+    return times
+
+
+def make_bars(times: List[datetime]) -> np.ndarray:
+    arr = np.zeros(len(times), dtype=KLINE_DTYPE)
+    arr["time"] = [int((t - EPOCH).total_seconds()) for t in times]
+    rng = np.random.default_rng(len(times))
+    close = 500 + np.cumsum(rng.normal(0, 1, len(times)))
+    arr["open"] = close + rng.normal(0, 0.5, len(times))
+    arr["high"] = np.maximum(arr["open"], close) + rng.random(len(times))
+    arr["low"] = np.minimum(arr["open"], close) - rng.random(len(times))
+    arr["close"] = close
+    arr["volume"] = rng.integers(1, 100, len(times))
+    arr["hold"] = 10000 + np.arange(len(times))
+    arr["settle"] = close
+    return arr
+
+
+def sessions(night: bool) -> np.ndarray:
+    days = [datetime(2024, 3, 4), datetime(2024, 3, 5), datetime(2024, 3, 6)]
+    return make_bars([t for day in days for t in session_times(day, night)])
+
+
+class ResampleRegressionTest(unittest.TestCase):
+
+    def assert_same(self, resampler: BarResampler, source: np.ndarray):
+        for period in DEFAULT_PERIODS:
+            with self.subTest(period=period):
+                np.testing.assert_array_equal(resampler.bars(period), resample_bars(source, period))
+
+    def check_one_by_one(self, source: np.ndarray):
+        resampler = BarResampler()
+        for i in range(len(source)):
+            resampler.append(source[i:i + 1])
+        self.assert_same(resampler, source)
+
+    def test_day_session(self):
+        self.check_one_by_one(sessions(night=False))
+
+    def test_night_session_past_midnight(self):
+        source = sessions(night=True)
+        self.assertTrue(np.any(np.diff(source["time"]) < 0))     # 0点后时间变小
+        self.check_one_by_one(source)
+
+    def test_initial_source_then_append(self):
+        source = sessions(night=True)
+        resampler = BarResampler(source[:700])
+        changed = resampler.append(source[700:])
+        self.assert_same(resampler, source)
+        for period, tail in changed.items():
+            np.testing.assert_array_equal(tail, resampler.bars(period)[-len(tail):])
+
+    def test_revise_last_bar(self):
+        source = sessions(night=True)
+        resampler = BarResampler()
+        for i in range(len(source)):
+            partial = source[i:i + 1].copy()    # 盘中先到未走完的K线, 再到走完的
+            partial["high"] = partial["low"] = partial["close"] = partial["open"]
+            partial["volume"] = 1
+            resampler.append(partial)
+            resampler.append(source[i:i + 1])
+        self.assert_same(resampler, source)
+
+    def test_redelivered_bars(self):
+        source = sessions(night=True)
+        resampler = BarResampler(source[:400])
+        resampler.append(source[395:])      # 跟读位置早于读取源文件的时刻, 开头几根重复送达
+        self.assert_same(resampler, source)
+
+
+if __name__ == '__main__':
+    unittest.main()